@@ -1,30 +1,147 @@
+"""Gera o banco de demonstração ou um corpus sintético para testes de carga.
+
+Sem argumentos, recria o banco demo (kb_data.db) como antes: admin, 3 categorias,
+3 artigos modelo, buscas e interações para os gráficos.
+
+Corpus grande (inserção em lote, semente determinística, acumulável):
+    python gerar_demo_db.py --articles 100000 --categories 40 --tags 2000 \\
+        --search-logs 10000000 --interactions 2000000 --chats 500000 \\
+        --start 2025-01-01 --end 2026-01-01 --seed 42 --db bench.db
+    python gerar_demo_db.py --append --search-logs 1000000   # acrescenta sem apagar
+"""
 import os
-from datetime import datetime, timedelta
+import sys
+import math
+import time
 import random
+import argparse
+from datetime import datetime, timedelta
+
+
+def database_url_from_args(argv):
+    """--db aceita um caminho de arquivo SQLite ou uma URL do SQLAlchemy."""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--db', default='kb_data.db')
+    known, _ = parser.parse_known_args(argv)
+    return known.db if '://' in known.db else f"sqlite:///{known.db}"
+
+
+# Forçar uso do banco na pasta demo (ou o informado em --db) antes de importar kb_database
+os.environ['DATABASE_URL'] = database_url_from_args(sys.argv[1:])
 
-# Forçar uso do banco na pasta demo
-os.environ['DATABASE_URL'] = 'sqlite:///kb_data.db'
+from sqlalchemy import func, insert, text
 
-from kb_database import init_db, get_db, User, Category, Article, SearchLog, ChatHistory, InteractionLog, Tag
+from kb_database import init_db, get_db, engine, User, Category, Article, ArticleNeighbor, SearchLog, ChatHistory, InteractionLog, Tag, article_tags
 from werkzeug.security import generate_password_hash
 
-def populate_fake_data():
+BATCH_SIZE = 20000
+
+# Vocabulário para textos sintéticos em português corporativo
+SUBJECTS = ['o colaborador', 'a equipe', 'o gestor', 'o cliente', 'o time de suporte', 'o analista', 'o usuário',
+            'o departamento financeiro', 'a área de RH', 'o fornecedor', 'o coordenador', 'o estagiário']
+VERBS = ['deve solicitar', 'precisa registrar', 'pode consultar', 'deve aprovar', 'precisa atualizar', 'deve enviar',
+         'pode acessar', 'deve validar', 'precisa configurar', 'deve revisar', 'pode cancelar', 'deve informar']
+OBJECTS = ['o formulário', 'a senha', 'o acesso à VPN', 'o reembolso', 'as férias', 'o contrato', 'o chamado',
+           'a nota fiscal', 'o relatório mensal', 'o cadastro', 'a política de segurança', 'o orçamento',
+           'o certificado digital', 'a escala de plantão', 'o pedido de compra', 'o e-mail corporativo']
+COMPLEMENTS = ['no portal interno', 'com 30 dias de antecedência', 'até o quinto dia útil', 'pelo sistema de chamados',
+               'junto ao gestor imediato', 'conforme a política vigente', 'antes do fechamento do mês',
+               'utilizando a credencial corporativa', 'com a aprovação da diretoria', 'no prazo de 48 horas',
+               'através do aplicativo', 'seguindo o manual de procedimentos']
+CONNECTORS = ['Além disso,', 'Em seguida,', 'Caso contrário,', 'Importante:', 'Observação:', 'Por fim,', 'Também', 'Após isso,']
+TITLE_PATTERNS = ['Como {verb} {obj}', 'Procedimento para {obj}', 'Guia: {obj} {comp}', 'Dúvidas sobre {obj}',
+                  'Política de {obj}', 'Passo a passo: {obj}', 'Regras para {obj} {comp}']
+TITLE_VERBS = ['solicitar', 'configurar', 'atualizar', 'cancelar', 'consultar', 'aprovar', 'renovar', 'registrar']
+CATEGORY_NAMES = ['Recursos Humanos', 'Tecnologia da Informação', 'Vendas', 'Financeiro', 'Jurídico', 'Compras',
+                  'Marketing', 'Logística', 'Suporte', 'Segurança da Informação', 'Infraestrutura', 'Qualidade',
+                  'Atendimento', 'Facilities', 'Treinamento', 'Comercial', 'Contabilidade', 'Operações']
+TAG_WORDS = ['ferias', 'vpn', 'rede', 'senha', 'reembolso', 'contrato', 'nota', 'chamado', 'acesso', 'email',
+             'cadastro', 'orcamento', 'certificado', 'plantao', 'compras', 'seguranca', 'beneficios', 'folha',
+             'ponto', 'viagem', 'treinamento', 'impressora', 'wifi', 'backup', 'licenca', 'portal', 'cliente']
+QUESTION_PATTERNS = ['Como faço para {verb} {obj}?', 'Qual o prazo para {obj}?', 'Onde encontro {obj}?',
+                     'Quem aprova {obj}?', 'Posso {verb} {obj} {comp}?']
+
+
+def sentence(rng):
+    text = f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(OBJECTS)} {rng.choice(COMPLEMENTS)}."
+    if rng.random() < 0.3:
+        text = f"{rng.choice(CONNECTORS)} {text}"
+    return text[0].upper() + text[1:]
+
+
+def article_content(rng, median_words=150):
+    """Texto com comprimento log-normal (maioria curta, cauda de artigos longos)."""
+    target = int(min(2500, max(20, rng.lognormvariate(math.log(median_words), 0.7))))
+    words = 0
+    paragraphs = []
+    while words < target:
+        paragraph = ' '.join(sentence(rng) for _ in range(rng.randint(2, 5)))
+        words += len(paragraph.split())
+        paragraphs.append(paragraph)
+    return '\n\n'.join(paragraphs)
+
+
+def article_title(rng, number):
+    pattern = rng.choice(TITLE_PATTERNS)
+    title = pattern.format(verb=rng.choice(TITLE_VERBS), obj=rng.choice(OBJECTS), comp=rng.choice(COMPLEMENTS))
+    return f"{title[0].upper()}{title[1:]} #{number}"[:200]
+
+
+def random_datetime(rng, start, span_seconds):
+    return start + timedelta(seconds=rng.random() * span_seconds)
+
+
+def zipf_index(rng, n, skew=1.1):
+    """Índice em [0, n) com distribuição aproximadamente Zipf (poucos itens muito populares)."""
+    return min(n - 1, int(n * rng.random() ** (skew * 2)))
+
+
+def bulk_insert(conn, table, rows, batch_size=BATCH_SIZE, label=None):
+    """Insere ``rows`` (iterável de dicts) em lotes com executemany."""
+    batch = []
+    total = 0
+    started = time.time()
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            conn.execute(insert(table), batch)
+            total += len(batch)
+            batch = []
+            if label and total % (batch_size * 25) == 0:
+                print(f"   … {label}: {total:,} linhas ({total / (time.time() - started):,.0f}/s)")
+    if batch:
+        conn.execute(insert(table), batch)
+        total += len(batch)
+    return total
+
+
+def next_id(conn, table):
+    return (conn.execute(func.max(table.c.id).select()).scalar() or 0) + 1
+
+
+def sync_sequences(conn, tables):
+    """PostgreSQL: ids explícitos não avançam as sequences; ajusta para o próximo insert normal."""
+    if conn.dialect.name != 'postgresql':
+        return
+    for table in tables:
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), COALESCE((SELECT MAX(id) FROM {table.name}), 1))"
+        ))
+
+
+def populate_fake_data(seed=None):
+    """Banco demo padrão: apaga tudo e cria admin, categorias, artigos modelo e analytics."""
     print("🚀 Iniciando criação do banco de dados de demonstração (kb_data.db)...")
-    
+    rng = random.Random(seed)
+
     # Inicializa o banco (cria as tabelas)
     init_db()
     db = get_db()
-    
+
     try:
         # 1. Limpar banco se já existir algo
-        db.query(InteractionLog).delete()
-        db.query(ChatHistory).delete()
-        db.query(SearchLog).delete()
-        db.query(Article).delete()
-        db.query(Category).delete()
-        db.query(User).delete()
-        db.query(Tag).delete()
-        
+        wipe_database(db)
+
         # 2. Criar Usuário Admin Padrão
         admin = User(
             username='admin',
@@ -81,13 +198,13 @@ def populate_fake_data():
                 tags='prospeccao,script'
             )
         ]
-        
+
         # Associa tags via relacionamento (SQLAlchemy Many-to-Many)
         artigos[0].tags_rel.append(tag_ferias)
         artigos[1].tags_rel.append(tag_vpn)
         artigos[1].tags_rel.append(tag_rede)
         artigos[2].tags_rel.append(tag_prospeccao)
-        
+
         db.add_all(artigos)
         db.commit()
         print("✅ Artigos Fictícios inseridos.")
@@ -95,32 +212,209 @@ def populate_fake_data():
         # 6. Gerar histórico falso pro Analytics (Pesquisas)
         print("✅ Gerando tráfego falso pro Analytics...")
         termos = ['vpn', 'senha', 'férias', 'vpn', 'wifi', 'férias', 'vpn', 'vendas', 'email']
-        for i in range(50): # 50 pesquisas simuladas
-            log = SearchLog(
-                term=random.choice(termos),
-                source='search_bar',
-                results_count=random.randint(0, 3),
-                created_at=now - timedelta(days=random.randint(0, 7), hours=random.randint(0, 23))
-            )
-            db.add(log)
-            
+        db.execute(insert(SearchLog), [
+            {
+                'term': rng.choice(termos),
+                'source': 'search_bar',
+                'results_count': rng.randint(0, 3),
+                'created_at': now - timedelta(days=rng.randint(0, 7), hours=rng.randint(0, 23))
+            }
+            for _ in range(50) # 50 pesquisas simuladas
+        ])
+
         # 7. Gerar interações falsas (Views e Likes)
+        interactions = []
         for artigo in artigos:
             # Views
-            for _ in range(random.randint(5, 20)):
-                db.add(InteractionLog(event_type='view', article_id=artigo.id, created_at=now - timedelta(days=random.randint(0, 7))))
+            for _ in range(rng.randint(5, 20)):
+                interactions.append({'event_type': 'view', 'article_id': artigo.id, 'created_at': now - timedelta(days=rng.randint(0, 7))})
             # Likes
-            for _ in range(random.randint(0, 10)):
-                db.add(InteractionLog(event_type='like', article_id=artigo.id, created_at=now - timedelta(days=random.randint(0, 7))))
-                
+            for _ in range(rng.randint(0, 10)):
+                interactions.append({'event_type': 'like', 'article_id': artigo.id, 'created_at': now - timedelta(days=rng.randint(0, 7))})
+        db.execute(insert(InteractionLog), interactions)
+
         db.commit()
         print("🎉 Banco de dados Fake populado com sucesso em 'kb_data.db'!")
-        
+
     except Exception as e:
         db.rollback()
         print(f"❌ Erro ao popular banco: {e}")
     finally:
         db.close()
 
+
+def wipe_database(db):
+    db.query(InteractionLog).delete()
+    db.query(ChatHistory).delete()
+    db.query(SearchLog).delete()
+    db.execute(article_tags.delete())
+    db.query(ArticleNeighbor).delete()
+    db.query(Article).delete()
+    db.query(Category).delete()
+    db.query(User).delete()
+    db.query(Tag).delete()
+
+
+def generate_corpus(args):
+    """Corpus sintético em lote (para 100k artigos / 10M logs em minutos)."""
+    rng = random.Random(args.seed)
+    start = datetime.fromisoformat(args.start) if args.start else datetime.utcnow() - timedelta(days=365)
+    end = datetime.fromisoformat(args.end) if args.end else datetime.utcnow()
+    span = max(1.0, (end - start).total_seconds())
+    started = time.time()
+
+    init_db()
+    if not args.append:
+        db = get_db()
+        try:
+            wipe_database(db)
+            db.add(User(username='admin', password_hash=generate_password_hash('admin123'), role='super_admin'))
+            db.commit()
+            print("🧹 Banco limpo. Usuário 'admin' (senha: admin123) criado.")
+        finally:
+            db.close()
+
+    with engine.begin() as conn:
+        if conn.dialect.name == 'sqlite':
+            # Carga em massa: sem fsync por transação (o arquivo é descartável se a carga falhar)
+            conn.exec_driver_sql('PRAGMA synchronous=OFF')
+
+        # Categorias (reaproveita as existentes pelo nome)
+        categories = Category.__table__
+        existing = {name: cid for cid, name in conn.execute(categories.select().with_only_columns(categories.c.id, categories.c.name))}
+        rows = []
+        for i in range(args.categories):
+            name = CATEGORY_NAMES[i] if i < len(CATEGORY_NAMES) else f"{CATEGORY_NAMES[i % len(CATEGORY_NAMES)]} {i // len(CATEGORY_NAMES) + 1}"
+            if name not in existing:
+                rows.append({'name': name, 'description': f'Categoria sintética ({name})', 'created_at': start})
+        if rows:
+            conn.execute(insert(categories), rows)
+        category_ids = [cid for cid, in conn.execute(categories.select().with_only_columns(categories.c.id))]
+        print(f"✅ {len(rows)} categorias criadas ({len(category_ids)} no total)")
+
+        # Tags
+        tags = Tag.__table__
+        existing_tags = {name for name, in conn.execute(tags.select().with_only_columns(tags.c.name))}
+        tag_names = []
+        i = 0
+        while len(tag_names) < args.tags:
+            base = TAG_WORDS[i % len(TAG_WORDS)]
+            name = base if i < len(TAG_WORDS) else f"{base}-{i // len(TAG_WORDS)}"
+            if name not in existing_tags:
+                tag_names.append(name)
+            i += 1
+        first_tag_id = next_id(conn, tags)
+        bulk_insert(conn, tags, ({'id': first_tag_id + n, 'name': name, 'created_at': start} for n, name in enumerate(tag_names)))
+        all_tags = list(conn.execute(tags.select().with_only_columns(tags.c.id, tags.c.name)))
+        print(f"✅ {len(tag_names)} tags criadas ({len(all_tags)} no total)")
+
+        # Artigos (+ associação com tags)
+        articles = Article.__table__
+        first_article_id = next_id(conn, articles)
+        links = []
+
+        def article_rows():
+            for n in range(args.articles):
+                article_id = first_article_id + n
+                chosen = rng.sample(all_tags, k=min(len(all_tags), rng.randint(1, 5))) if all_tags else []
+                links.extend({'article_id': article_id, 'tag_id': tag_id} for tag_id, _ in chosen)
+                created = random_datetime(rng, start, span)
+                yield {
+                    'id': article_id,
+                    'title': article_title(rng, article_id),
+                    'content': article_content(rng, args.median_words),
+                    'category_id': rng.choice(category_ids) if category_ids else None,
+                    'tags': ','.join(name for _, name in chosen),
+                    'status': 'approved' if rng.random() < 0.9 else rng.choice(['pending', 'rejected']),
+                    'created_at': created,
+                    'updated_at': created,
+                }
+
+        total = bulk_insert(conn, articles, article_rows(), batch_size=min(args.batch_size, 5000), label='artigos')
+        bulk_insert(conn, article_tags, links, batch_size=args.batch_size)
+        print(f"✅ {total:,} artigos criados ({len(links):,} associações com tags)")
+
+        article_ids = [aid for aid, in conn.execute(articles.select().with_only_columns(articles.c.id))]
+        search_terms = [name for _, name in all_tags] + [w for o in OBJECTS for w in o.split()[1:] if len(w) > 3]
+
+        # Logs de busca (termos com popularidade Zipf; ~15% sem resultado)
+        total = bulk_insert(conn, SearchLog.__table__, (
+            {
+                'term': search_terms[zipf_index(rng, len(search_terms))],
+                'source': 'search_bar' if rng.random() < 0.7 else 'chat',
+                'results_count': 0 if rng.random() < 0.15 else rng.randint(1, 10),
+                'created_at': random_datetime(rng, start, span),
+            }
+            for _ in range(args.search_logs)
+        ), batch_size=args.batch_size, label='buscas')
+        print(f"✅ {total:,} buscas registradas")
+
+        # Interações (artigos populares recebem a maior parte das views)
+        events = ['view'] * 8 + ['like'] * 3 + ['dislike']
+        if article_ids:
+            total = bulk_insert(conn, InteractionLog.__table__, (
+                {
+                    'event_type': rng.choice(events),
+                    'article_id': article_ids[zipf_index(rng, len(article_ids))],
+                    'created_at': random_datetime(rng, start, span),
+                }
+                for _ in range(args.interactions)
+            ), batch_size=args.batch_size, label='interações')
+            print(f"✅ {total:,} interações registradas")
+
+        # Histórico de chat (sessões com 1-6 turnos)
+        def chat_rows():
+            produced = 0
+            while produced < args.chats:
+                session_id = f"{rng.getrandbits(64):016x}"
+                moment = random_datetime(rng, start, span)
+                for _ in range(min(rng.randint(1, 6), args.chats - produced)):
+                    moment += timedelta(seconds=rng.randint(10, 600))
+                    question = rng.choice(QUESTION_PATTERNS).format(verb=rng.choice(TITLE_VERBS), obj=rng.choice(OBJECTS), comp=rng.choice(COMPLEMENTS))
+                    sources = rng.sample(article_ids, k=min(len(article_ids), rng.randint(0, 3))) if article_ids else []
+                    produced += 1
+                    yield {
+                        'session_id': session_id,
+                        'question': question,
+                        'answer': ' '.join(sentence(rng) for _ in range(rng.randint(1, 4))),
+                        'relevant_articles': ','.join(str(s) for s in sources),
+                        'created_at': moment,
+                    }
+
+        total = bulk_insert(conn, ChatHistory.__table__, chat_rows(), batch_size=args.batch_size, label='chat')
+        print(f"✅ {total:,} turnos de chat registrados")
+
+        sync_sequences(conn, [tags, articles])
+
+    print(f"🎉 Corpus gerado em {time.time() - started:.1f}s ({os.environ['DATABASE_URL']})")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Gerador do banco demo / corpus sintético para testes de carga')
+    parser.add_argument('--db', default='kb_data.db', help='arquivo SQLite ou URL do SQLAlchemy (padrão: kb_data.db)')
+    parser.add_argument('--articles', type=int, default=0, help='artigos sintéticos')
+    parser.add_argument('--categories', type=int, help='categorias (padrão: 10; 0 com --append)')
+    parser.add_argument('--tags', type=int, help='tags novas (padrão: 200; 0 com --append)')
+    parser.add_argument('--search-logs', type=int, default=0)
+    parser.add_argument('--interactions', type=int, default=0)
+    parser.add_argument('--chats', type=int, default=0, help='turnos de chat')
+    parser.add_argument('--median-words', type=int, default=150, help='mediana de palavras por artigo')
+    parser.add_argument('--start', help='início do período (ISO, padrão: há 1 ano)')
+    parser.add_argument('--end', help='fim do período (ISO, padrão: agora)')
+    parser.add_argument('--seed', type=int, help='semente (mesma semente = mesmo corpus)')
+    parser.add_argument('--append', action='store_true', help='acrescenta ao banco sem apagar')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+    if args.categories is None:
+        args.categories = 0 if args.append else 10
+    if args.tags is None:
+        args.tags = 0 if args.append else 200
+    return args
+
+
 if __name__ == "__main__":
-    populate_fake_data()
+    args = parse_args()
+    if any([args.articles, args.search_logs, args.interactions, args.chats, args.append]):
+        generate_corpus(args)
+    else:
+        populate_fake_data(seed=args.seed)
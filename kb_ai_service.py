@@ -1,17 +1,70 @@
-from ai_engine.orchestrator import AIService
+import os
+import threading
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from ai_engine.orchestrator import AIService
 
 # Instância global (será inicializada sob demanda)
+# O import de ai_engine.orchestrator (torch, sentence-transformers, groq, gemini...)
+# também é adiado até o primeiro uso, para o import de kb_app ser rápido.
 _ai_service_instance = None
+_ai_service_lock = threading.Lock()
+
+# Memo de embeddings por hash do texto (evita re-encodar conteúdo já visto)
+EMBEDDING_CACHE_ENABLED = os.getenv('EMBEDDING_CACHE', 'true').lower() in ('true', '1', 't')
+EMBEDDING_CACHE_DB = os.getenv('EMBEDDING_CACHE_DB', os.path.join(os.path.abspath(os.path.dirname(__file__)), 'embedding_cache.db'))
+embedding_cache = None
 
-def get_ai_service() -> AIService:
-    global _ai_service_instance
+def get_ai_service() -> 'AIService':
+    global _ai_service_instance, embedding_cache
     if _ai_service_instance is None:
-        _ai_service_instance = AIService()
+        with _ai_service_lock:
+            if _ai_service_instance is None:
+                if os.getenv('KB_LLM_PROVIDER', '').lower() == 'fake':
+                    # Benchmarks/testes de carga: sem modelos nem rede
+                    from kb_fake_ai import FakeAIService
+                    _ai_service_instance = FakeAIService()
+                    return _ai_service_instance
+                from ai_engine.orchestrator import AIService
+                _instrument_encoder()
+                if EMBEDDING_CACHE_ENABLED and embedding_cache is None:
+                    # Instalado antes de criar o serviço: os encodes da inicialização já usam o memo
+                    from kb_embedding_cache import EmbeddingCache, install_embedding_cache
+                    embedding_cache = EmbeddingCache(EMBEDDING_CACHE_DB)
+                    install_embedding_cache(embedding_cache)
+                _ai_service_instance = AIService()
     return _ai_service_instance
 
+def _instrument_encoder():
+    """Tempo real do modelo de embeddings como estágio 'embedding' (acertos do memo não contam)."""
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        return
+    if not getattr(SentenceTransformer.encode, '_kb_timed', False):
+        from kb_metrics import timed_stage
+        SentenceTransformer.encode = timed_stage('embedding')(SentenceTransformer.encode)
+        SentenceTransformer.encode._kb_timed = True
+
+def get_embedding_cache_stats():
+    """Acertos/erros do memo de embeddings (None se desativado ou ainda não carregado)."""
+    return embedding_cache.stats() if embedding_cache is not None else None
+
+def is_ai_service_loaded() -> bool:
+    """Indica se o AIService (e seus modelos) já foi carregado neste processo."""
+    return _ai_service_instance is not None
+
+def __getattr__(name):
+    # Compatibilidade: `from kb_ai_service import AIService` continua funcionando (import tardio)
+    if name == 'AIService':
+        from ai_engine.orchestrator import AIService
+        return AIService
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 # Expose AIService class if needed for type hinting elsewhere, 
 # though usually get_ai_service() is enough
-__all__ = ['get_ai_service', 'AIService', 'ai_service']
+__all__ = ['get_ai_service', 'is_ai_service_loaded', 'get_embedding_cache_stats', 'AIService', 'ai_service']
 
 # Helper para compatibilidade legada (testes antigos importam ai_service)
 class AIServiceProxy:
@@ -21,4 +74,3 @@ class AIServiceProxy:
         return repr(get_ai_service())
 
 ai_service = AIServiceProxy()
-
@@ -7,9 +7,11 @@ from dotenv import load_dotenv
 from flask import Flask, request, jsonify, send_from_directory, session, redirect, render_template
 from flask_cors import CORS
 from werkzeug.security import check_password_hash
-from sqlalchemy import text, func
+from sqlalchemy import text, func, bindparam, select
+from sqlalchemy.orm import joinedload, selectinload, undefer
 import logging
 import json
+import time
 
 # Configuração de Logs
 # Configuração de Logs
@@ -34,8 +36,28 @@ else:
 
 print(f"DEBUG: SECRET_KEY status: {'Set' if os.getenv('SECRET_KEY') else 'MISSING'}")
 
-from kb_database import init_db, get_db, Article, Category, ChatHistory, User, Tag
-from kb_ai_service import get_ai_service
+from kb_database import engine, init_db, get_db, Article, ArticleNeighbor, Category, ChatHistory, User, Tag, SearchLog, article_tags, ARTICLE_COMPRESSION, compress_text, decompress_text
+from kb_ai_service import get_ai_service, is_ai_service_loaded, get_embedding_cache_stats
+from kb_feedback_store import FeedbackStore
+from kb_rate_limit import create_login_limiter
+from kb_cache import TTLCache
+from kb_chat_memory import ConversationMemory
+from kb_write_behind import create_write_queue
+from kb_jobs import create_job_runner
+from kb_indexes import register_index, notify_article_saved, notify_article_deleted, notify_articles_reset, build_all_indexes
+from kb_spelling import SpellingIndex
+from kb_vectors import TfidfArticleIndex
+from kb_tag_suggester import TagSuggester, TAG_SUGGEST_MIN_CONFIDENCE
+from kb_classifier import CategoryClassifier, CLASSIFIER_MIN_CONFIDENCE, FEEDBACK_TEXT_MAX_CHARS, content_shape_predictions, is_learnable_feedback
+from kb_dedup import NearDuplicateIndex
+from kb_insights import InsightsCache, build_analytics_summary, call_insights_generator, normalize_window
+from kb_startup import run_warmup, start_background_warmup, readiness, launcher_setting
+from kb_metrics import init_metrics, metrics, stage
+from kb_profiler import init_profiler, ProfileStore
+from kb_sql_trace import init_sql_tracing
+from kb_graph import KnowledgeGraph, GRAPH_MAX_NODES
+from kb_related import RelatedArticles, delete_for_articles
+from kb_autocomplete import AutocompleteIndex, AUTOCOMPLETE_MAX_SEARCH_TERMS
 
 
 
@@ -50,10 +72,28 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-# Store failed login attempts for rate limiting
-login_attempts = {}
+# Rate limiting de login (token bucket com limite de memória; SQLite opcional entre workers)
 MAX_ATTEMPTS = 5
 LOCKOUT_TIME = timedelta(minutes=15)
+login_limiter = create_login_limiter(MAX_ATTEMPTS, LOCKOUT_TIME.total_seconds())
+
+# Cache de usuários da sessão (username -> to_dict), evita query a cada /api/me, /api/status...
+USER_CACHE = TTLCache(ttl=int(os.getenv('USER_CACHE_TTL', 30)), max_entries=4096)
+
+def get_session_user(username):
+    """Resolve o usuário pelo username usando o cache (TTL curto) ou o banco."""
+    user_info = USER_CACHE.get(username)
+    if user_info is not None:
+        return user_info
+
+    db = get_db()
+    try:
+        user = db.query(User).filter_by(username=username).first()
+        user_info = user.to_dict() if user else None
+    finally:
+        db.close()
+    USER_CACHE.set(username, user_info)
+    return user_info
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
 # Versão da Aplicação (Atualize isso para forçar o reload no frontend)
@@ -71,14 +111,31 @@ else:
     app.secret_key = os.getenv('SECRET_KEY')
 CORS(app)  # Permitir requisições do frontend
 
+# Latência por endpoint e estágio (histogramas em memória, ver /api/monitor/metrics)
+init_metrics(app)
+
+# Profiler de amostragem sob demanda (admin + header X-KB-Profile ou ?_profile=1)
+profile_store = init_profiler(app, ProfileStore(os.getenv('PROFILE_DIR', os.path.join(basedir, 'profiles'))))
+
+# Rastreamento de SQL por requisição (estágio "sql", log de consultas lentas e detecção de N+1)
+sql_tracer = init_sql_tracing(app, engine, metrics)
+
 # Configuração de Uploads
 UPLOAD_FOLDER = os.path.join(basedir, 'static', 'uploads')
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# Arquivos enviados aguardando processamento por um job (ex.: importação Word)
+JOB_FILES_FOLDER = os.getenv('JOB_FILES_DIR', os.path.join(basedir, 'job_files'))
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
+# Feedback de classificação híbrida (log append-only, JSONL)
+feedback_store = FeedbackStore(
+    os.path.join(basedir, 'training_data.jsonl'),
+    legacy_path=os.path.join(basedir, 'training_data.json')
+)
+
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -110,13 +167,13 @@ def api_login():
     password = data.get('password')
     ip = request.remote_addr
 
-    # Verificação de Rate Limit
-    now = datetime.now()
-    if ip in login_attempts:
-        attempts, last_time = login_attempts[ip]
-        if attempts >= MAX_ATTEMPTS and (now - last_time) < LOCKOUT_TIME:
-            wait_time = int((LOCKOUT_TIME - (now - last_time)).total_seconds() / 60)
-            return jsonify({'error': f'Muitas tentativas. Tente novamente em {wait_time} minutos.'}), 429
+    # Verificação de Rate Limit (antes de qualquer query ou hash de senha)
+    retry_after = login_limiter.retry_after(ip)
+    if retry_after > 0:
+        wait_time = max(1, int(-(-retry_after // 60)))
+        response = jsonify({'error': f'Muitas tentativas. Tente novamente em {wait_time} minutos.'})
+        response.headers['Retry-After'] = str(int(retry_after) + 1)
+        return response, 429
 
     db = get_db()
     try:
@@ -127,23 +184,22 @@ def api_login():
         
         if user and check_password_hash(user.password_hash, password):
             # Login bem-sucedido: Limpar tentativas
-            if ip in login_attempts:
-                del login_attempts[ip]
+            login_limiter.reset(ip)
                 
             # Configuração de Sessão: Expira ao fechar navegador
             session.permanent = False
             # app.permanent_session_lifetime = timedelta(minutes=30) # Desativado para exigir login ao reabrir
             session['user'] = user.username
             session['role'] = user.role
+            USER_CACHE.set(user.username, user.to_dict())
             
             return jsonify({
                 'message': 'Login realizado com sucesso',
                 'user': user.to_dict()
             }), 200
         
-        # Login falhou: Incrementar tentativas
-        attempts, _ = login_attempts.get(ip, (0, now))
-        login_attempts[ip] = (attempts + 1, now)
+        # Login falhou: Consumir um token
+        login_limiter.consume(ip)
         
         return jsonify({'error': 'Credenciais inválidas'}), 401
     finally:
@@ -163,23 +219,20 @@ def get_current_user():
     
     username = session.get('user')
     
-    # Refresh role from DB to handle updates
-    db = get_db()
+    # Refresh role (cache com TTL curto) to handle updates
     try:
-        user = db.query(User).filter_by(username=username).first()
+        user = get_session_user(username)
         if user:
             # Update session if role changed
-            if session.get('role') != user.role:
-                session['role'] = user.role
+            if session.get('role') != user['role']:
+                session['role'] = user['role']
                 
             return jsonify({
-                'username': user.username,
-                'role': user.role
+                'username': user['username'],
+                'role': user['role']
             })
     except:
         pass
-    finally:
-        db.close()
 
     return jsonify({
         'username': username,
@@ -224,6 +277,7 @@ def create_user():
         )
         db.add(new_user)
         db.commit()
+        USER_CACHE.invalidate(username)
         return jsonify({
             'message': 'Usuário criado com sucesso',
             'user': new_user.to_dict()
@@ -248,8 +302,10 @@ def delete_user(user_id):
         if user.username == session.get('user'):
              return jsonify({'error': 'Não é possível deletar o próprio usuário logado'}), 400
              
+        username = user.username
         db.delete(user)
         db.commit()
+        USER_CACHE.invalidate(username)
         return jsonify({'message': 'Usuário removido com sucesso'})
     except Exception as e:
         db.rollback()
@@ -359,6 +415,8 @@ def update_category(category_id):
         category.description = data.get('description', category.description)
         
         db.commit()
+        # Centróides são indexados pelo nome da categoria
+        category_classifier.reset()
         return jsonify(category.to_dict())
     except Exception as e:
         db.rollback()
@@ -388,6 +446,7 @@ def change_password():
         from werkzeug.security import generate_password_hash
         user.password_hash = generate_password_hash(new_password)
         db.commit()
+        USER_CACHE.invalidate(user.username)
         return jsonify({'message': 'Senha alterada com sucesso'})
     except Exception as e:
         db.rollback()
@@ -427,32 +486,58 @@ def get_articles():
     
     db = get_db()
     try:
-        query = db.query(Article)
-        
-        if category_id:
-            query = query.filter(Article.category_id == category_id)
-        
-        if search:
-            search_term = f"%{search}%"
-            query = query.filter(
-                (Article.title.ilike(search_term)) | 
-                (Article.content.ilike(search_term)) |
-                (Article.tags.ilike(search_term))
-            )
-        
-        # Filtro de Status (Padrão: Apenas aprovados, a menos que especificado)
-        # Filtro de Status (Padrão: Apenas aprovados, a menos que especificado)
-        status = request.args.get('status', 'approved')
-        if status != 'all':
-            query = query.filter(Article.status == status)
+        def run_query(search):
+            query = db.query(Article).options(undefer(Article.content))
+            
+            if category_id:
+                query = query.filter(Article.category_id == category_id)
+            
+            if search:
+                search_term = f"%{search}%"
+                content_match = Article.content.ilike(search_term)
+                if ARTICLE_COMPRESSION != 'off':
+                    # Corpo comprimido não casa com ILIKE: termos do índice TF-IDF
+                    article_vectors.ensure_built(load_articles_for_index)
+                    matched_ids = article_vectors.matching_articles(search)
+                    if matched_ids:
+                        content_match = content_match | Article.id.in_(matched_ids)
+                query = query.filter(
+                    (Article.title.ilike(search_term)) | 
+                    content_match |
+                    (Article.tags.ilike(search_term))
+                )
+            
+            # Filtro de Status (Padrão: Apenas aprovados, a menos que especificado)
+            status = request.args.get('status', 'approved')
+            if status != 'all':
+                query = query.filter(Article.status == status)
 
-        articles = query.order_by(Article.updated_at.desc()).all()
+            return query.order_by(Article.updated_at.desc()).all()
+
+        articles = run_query(search)
+        
+        # Correção ortográfica: sem resultados, tenta a busca corrigida
+        corrected_search = None
+        if search and not articles:
+            spelling_index.ensure_built(load_articles_for_index)
+            suggestion = spelling_index.correct(search)
+            if suggestion != search:
+                corrected_search = suggestion
+                articles = run_query(corrected_search)
         
         # Analytics: Log search terms from KB bar
+        # (o termo que produziu os resultados: o corrigido, senão o autocomplete sugeriria o erro de digitação)
         if search:
-            get_ai_service().analytics.log_search(search, source='search_bar', results_count=len(articles))
-
-        return jsonify([article.to_dict() for article in articles])
+            searched = corrected_search or search
+            get_ai_service().analytics.log_search(searched, source='search_bar', results_count=len(articles))
+            if articles:
+                autocomplete_index.record_search(searched)
+
+        response = jsonify([article.to_dict() for article in articles])
+        if corrected_search:
+            from urllib.parse import quote
+            response.headers['X-Corrected-Query'] = quote(corrected_search)
+        return response
     except Exception as e:
         print(f"❌ Erro em get_articles: {e}")
         return jsonify({'error': str(e)}), 500
@@ -464,24 +549,160 @@ def get_article(article_id):
     """Retorna um artigo específico"""
     db = get_db()
     try:
-        article = db.query(Article).filter(Article.id == article_id).first()
+        article = db.query(Article).options(undefer(Article.content)).filter(Article.id == article_id).first()
         if article:
             return jsonify(article.to_dict())
         return jsonify({'error': 'Artigo não encontrado'}), 404
     finally:
         db.close()
 
+@app.route('/api/autocomplete', methods=['GET'])
+def autocomplete():
+    """Sugestões para a barra de busca (?q=prefixo&limit=8)"""
+    prefix = request.args.get('q', '')
+    limit = request.args.get('limit', 8, type=int)
+    autocomplete_index.ensure_built(load_articles_for_index)
+    return jsonify({'query': prefix, 'suggestions': autocomplete_index.complete(prefix, limit=limit)})
+
+@app.route('/api/articles/<int:article_id>/related', methods=['GET'])
+def get_related_articles(article_id):
+    """Artigos relacionados (vizinhos pré-calculados em article_neighbors)"""
+    db = get_db()
+    try:
+        return jsonify(related_articles.related(db, article_id))
+    finally:
+        db.close()
+
+# Memória de conversa por sessão (contexto do chat sem query global a cada pergunta)
+CHAT_HISTORY_TURNS = 2
+chat_memory = ConversationMemory(
+    turns_per_session=CHAT_HISTORY_TURNS,
+    max_sessions=int(os.getenv('CHAT_MEMORY_MAX_SESSIONS', 5000))
+)
+
+def get_chat_session_id(data):
+    """Identifica a sessão de chat (payload do widget ou cookie de sessão)."""
+    session_id = data.get('session_id')
+    if session_id:
+        return str(session_id)[:64]
+    if 'chat_session_id' not in session:
+        import uuid
+        session['chat_session_id'] = uuid.uuid4().hex
+    return session['chat_session_id']
+
+def load_session_history(db, session_id):
+    """Cold start: últimos turnos da sessão (usa ix_chat_history_session_created)."""
+    recent = db.query(ChatHistory).filter(ChatHistory.session_id == session_id) \
+        .order_by(ChatHistory.created_at.desc()).limit(CHAT_HISTORY_TURNS).all()
+    return [{'question': h.question, 'answer': h.answer} for h in reversed(recent)]
+
 # Caching global simples para evitar query pesada no chat a cada request
 ARTICLES_CACHE = {
     'data': None,
     'last_update': None
 }
 
+def load_articles_for_index():
+    """Carrega todos os artigos (qualquer status) para construir índices em memória."""
+    db = get_db()
+    try:
+        articles = db.query(Article).options(undefer(Article.content), joinedload(Article.category), selectinload(Article.tags_rel)).all()
+        return [article.to_dict() for article in articles]
+    finally:
+        db.close()
+
+# Índice ortográfico (SymSpell) sobre o vocabulário da base + palavras aprendidas
+spelling_index = register_index(SpellingIndex(learned_words_loader=lambda: get_ai_service().get_learned_words()))
+
+# Vetores TF-IDF dos artigos (espaço vetorial local, sem chamada de modelo)
+article_vectors = register_index(TfidfArticleIndex())
+tag_suggester = TagSuggester(article_vectors)
+
+# Classificador de categorias por centróide (registrado depois de article_vectors: reutiliza seus vetores)
+category_classifier = register_index(CategoryClassifier(article_vectors, feedback_loader=lambda: feedback_store.iter_entries()))
+
+# Assinaturas MinHash/LSH para detectar quase-duplicados na entrada
+duplicate_index = register_index(NearDuplicateIndex())
+
+# Grafo de conhecimento com layout calculado no servidor (registrado depois de article_vectors: arestas de similaridade)
+knowledge_graph = register_index(KnowledgeGraph(article_vectors, layout_path=os.getenv('GRAPH_LAYOUT_FILE', os.path.join(basedir, 'graph_layout.json'))))
+
+def load_search_terms():
+    """Termos de busca com resultado e sua frequência (os mais populares) para o autocomplete."""
+    db = get_db()
+    try:
+        return db.query(SearchLog.term, func.count(SearchLog.id)) \
+            .filter(SearchLog.results_count > 0) \
+            .group_by(SearchLog.term) \
+            .order_by(func.count(SearchLog.id).desc()) \
+            .limit(AUTOCOMPLETE_MAX_SEARCH_TERMS).all()
+    finally:
+        db.close()
+
+# Autocomplete da barra de busca (trie compactada sobre títulos, tags, categorias e buscas populares)
+autocomplete_index = register_index(AutocompleteIndex(search_terms_loader=load_search_terms))
+
+# Artigos relacionados: top-N vizinhos pré-calculados em article_neighbors (a partir de article_vectors)
+related_articles = RelatedArticles(article_vectors)
+
+def update_article_embedding(article_dict):
+    """Embedding do artigo + vizinhos pré-calculados dele e de quem o tinha como vizinho"""
+    try:
+        get_ai_service().update_article_embedding(article_dict)
+    except Exception as e:
+        print(f"⚠️ Erro ao atualizar embedding: {e}")
+    db = get_db()
+    try:
+        article_vectors.ensure_built(load_articles_for_index)
+        related_articles.refresh(db, article_dict['id'])
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ Erro ao atualizar artigos relacionados: {e}")
+    finally:
+        db.close()
+
+def find_near_duplicates(title, content, exclude_id=None):
+    """Artigos quase-duplicados do texto informado (consulta O(1) no tamanho da base)."""
+    duplicate_index.ensure_built(load_articles_for_index)
+    return duplicate_index.find(title, content, exclude_id=exclude_id)
+
 def invalidate_article_cache():
     """Invalida o cache de artigos para forçar recarregamento."""
     ARTICLES_CACHE['data'] = None
     print("🧹 Cache de artigos invalidado.")
 
+class CachedArticle(dict):
+    """Artigo do ARTICLES_CACHE com o corpo guardado comprimido (ARTICLE_COMPRESSION).
+
+    ``['content']``, ``get``, ``items`` e cópias descomprimem na leitura, sem
+    guardar o texto: o cache ocupa o tamanho comprimido e cada chat só
+    descomprime os artigos que de fato lê.
+    """
+
+    def __init__(self, article):
+        super().__init__(article)
+        dict.__setitem__(self, 'content', compress_text(article.get('content')))
+
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+        return decompress_text(value) if key == 'content' else value
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    # Iteração própria: dict(artigo) e {**artigo} passam por __getitem__
+    def __iter__(self):
+        return dict.__iter__(self)
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+    def values(self):
+        return [self[key] for key in self]
+
+    def copy(self):
+        return dict(self.items())
+
 def get_cached_articles(db):
     """Retorna artigos do cache ou carrega do banco se expirado/vazio."""
     if ARTICLES_CACHE['data'] is not None:
@@ -489,8 +710,10 @@ def get_cached_articles(db):
     
     # Carregar do banco
     print("📦 Carregando artigos do banco para cache...")
-    articles = db.query(Article).filter(Article.status == 'approved').all()
+    articles = db.query(Article).options(undefer(Article.content)).filter(Article.status == 'approved').all()
     articles_dict = [article.to_dict() for article in articles]
+    if ARTICLE_COMPRESSION != 'off':
+        articles_dict = [CachedArticle(article) for article in articles_dict]
     ARTICLES_CACHE['data'] = articles_dict
     ARTICLES_CACHE['last_update'] = datetime.now()
     return articles_dict
@@ -580,13 +803,17 @@ def create_article():
         if article.status == 'approved':
              invalidate_article_cache()
 
-        # Atualizar embedding imediatamente
-        try:
-            get_ai_service().update_article_embedding(article.to_dict())
-        except Exception as e:
-            print(f"⚠️ Erro ao atualizar embedding: {e}")
+        article_dict = article.to_dict()
+        # Sinalizar quase-duplicados (antes de indexar o próprio artigo)
+        near_duplicates = find_near_duplicates(title, content, exclude_id=article.id)
+        notify_article_saved(article_dict)
+
+        # Atualizar embedding (e artigos relacionados) imediatamente
+        update_article_embedding(article_dict)
             
-        return jsonify(article.to_dict()), 201
+        if near_duplicates:
+            article_dict['near_duplicates'] = near_duplicates
+        return jsonify(article_dict), 201
     except Exception as e:
         db.rollback()
         return jsonify({'error': str(e)}), 400
@@ -630,13 +857,13 @@ def update_article(article_id):
         # Invalidar cache de artigos
         invalidate_article_cache()
         
-        # Atualizar embedding
-        try:
-            get_ai_service().update_article_embedding(article.to_dict())
-        except Exception as e:
-            print(f"⚠️ Erro ao atualizar embedding: {e}")
+        article_dict = article.to_dict()
+        notify_article_saved(article_dict)
+        
+        # Atualizar embedding (e artigos relacionados)
+        update_article_embedding(article_dict)
 
-        return jsonify(article.to_dict())
+        return jsonify(article_dict)
     except Exception as e:
         db.rollback()
         return jsonify({'error': str(e)}), 400
@@ -659,10 +886,16 @@ def delete_article(article_id):
         
         # 2. Clear tags (Many-to-Many)
         article.tags_rel = []
+
+        # 3. Related articles (linhas do artigo e de quem o tinha como vizinho)
+        referrers = related_articles.referrers(db, article_id)
+        delete_for_articles(db, [article_id])
         
         db.delete(article)
         db.commit()
         invalidate_article_cache()
+        notify_article_deleted(article_id)
+        related_articles.recompute(db, referrers)
         return jsonify({'message': 'Artigo e histórico deletados com sucesso'})
     except Exception as e:
         db.rollback()
@@ -692,17 +925,28 @@ def duplicate_article(article_id):
         db.add(new_article)
         db.commit()
         
-        try:
-            get_ai_service().update_article_embedding(new_article.to_dict())
-        except: pass
+        article_dict = new_article.to_dict()
+        near_duplicates = find_near_duplicates(new_article.title, new_article.content, exclude_id=new_article.id)
+        notify_article_saved(article_dict)
         
-        return jsonify(new_article.to_dict()), 201
+        update_article_embedding(article_dict)
+        
+        article_dict['near_duplicates'] = near_duplicates
+        return jsonify(article_dict), 201
     except Exception as e:
         db.rollback()
         return jsonify({'error': str(e)}), 400
     finally:
         db.close()
 
+@app.route('/api/articles/duplicates', methods=['GET'])
+@admin_required
+def scan_duplicate_articles():
+    """Relatório de grupos de artigos quase-duplicados (MinHash/LSH)"""
+    threshold = request.args.get('threshold', type=float)
+    duplicate_index.ensure_built(load_articles_for_index)
+    return jsonify(duplicate_index.scan(threshold=threshold))
+
 @app.route('/api/articles/<int:article_id>/approve', methods=['PUT'])
 @admin_required
 def approve_article(article_id):
@@ -717,11 +961,12 @@ def approve_article(article_id):
         db.commit()
         invalidate_article_cache()
         
-        try:
-            get_ai_service().update_article_embedding(article.to_dict())
-        except: pass
+        article_dict = article.to_dict()
+        notify_article_saved(article_dict)
+        
+        update_article_embedding(article_dict)
             
-        return jsonify(article.to_dict())
+        return jsonify(article_dict)
     except Exception as e:
         db.rollback()
         return jsonify({'error': str(e)}), 400
@@ -731,18 +976,37 @@ def approve_article(article_id):
 @app.route('/api/articles/delete-all', methods=['DELETE'])
 @admin_required
 def delete_all_articles():
-    """Deleta todos os artigos do banco de dados"""
+    """Deleta todos os artigos do banco de dados (job em background)"""
+    job_id = job_runner.submit('delete_all', created_by=session.get('user'), dedupe=True)
+    return jsonify({'message': 'Exclusão iniciada', 'job_id': job_id, 'job': job_runner.get(job_id)}), 202
+
+def run_delete_all_job(job, batch_size=500):
+    """Job: apaga os artigos em lotes (progresso/cancelamento entre lotes)"""
+    total = job.checkpoint.get('total')
+    deleted = job.checkpoint.get('deleted', 0)
     db = get_db()
     try:
-        db.query(Article).delete()
-        db.commit()
-        invalidate_article_cache()
-        return jsonify({'message': 'Todos os artigos foram deletados com sucesso'})
-    except Exception as e:
+        if total is None:
+            total = db.query(Article).count()
+        while True:
+            ids = [row.id for row in db.query(Article.id).limit(batch_size).all()]
+            if not ids:
+                break
+            db.execute(article_tags.delete().where(article_tags.c.article_id.in_(ids)))
+            delete_for_articles(db, ids)
+            db.query(Article).filter(Article.id.in_(ids)).delete(synchronize_session=False)
+            db.commit()
+            deleted += len(ids)
+            job.progress(deleted / max(total, deleted), f'{deleted} de {total} artigos excluídos',
+                         checkpoint={'total': total, 'deleted': deleted})
+    except Exception:
         db.rollback()
-        return jsonify({'error': str(e)}), 400
+        raise
     finally:
         db.close()
+        invalidate_article_cache()
+        notify_articles_reset()
+    return {'message': 'Todos os artigos foram deletados com sucesso', 'deleted': deleted}
 
 @app.route('/api/articles/reject-all-pending', methods=['DELETE'])
 @admin_required
@@ -750,8 +1014,10 @@ def reject_all_pending_articles():
     """Rejeita (deleta) todos os artigos pendentes"""
     db = get_db()
     try:
+        delete_for_articles(db, select(Article.id).where(Article.status == 'pending'))
         deleted_count = db.query(Article).filter(Article.status == 'pending').delete()
         db.commit()
+        notify_articles_reset()
         # Se rejeita pendentes, teoricamente não afeta a lista de APPROVED usada pelo chat,
         # mas por segurança invalidamos se status mudar
         return jsonify({'message': f'{deleted_count} artigos pendentes foram rejeitados/excluídos.'})
@@ -785,6 +1051,60 @@ def list_tags():
     finally:
         db.close()
 
+def ensure_knowledge_graph():
+    article_vectors.ensure_built(load_articles_for_index)
+    knowledge_graph.ensure_built(load_articles_for_index)
+    return knowledge_graph
+
+@app.route('/api/graph', methods=['GET'])
+def get_knowledge_graph():
+    """Grafo de conhecimento com posições prontas (level=auto|full|clusters, category=<nome>)"""
+    level = request.args.get('level', 'auto')
+    if level not in ('auto', 'full', 'clusters'):
+        return jsonify({'error': 'level deve ser auto, full ou clusters'}), 400
+    try:
+        max_nodes = min(int(request.args.get('max_nodes', GRAPH_MAX_NODES)), GRAPH_MAX_NODES)
+    except ValueError:
+        return jsonify({'error': 'max_nodes inválido'}), 400
+    category = request.args.get('category') or None
+
+    graph = ensure_knowledge_graph()
+    # Sem mudanças no grafo desde a última resposta: 304 sem serializar nada
+    # (hash do conteúdo: o contador de versão é por processo)
+    etag = f"g{graph.fingerprint()}-{level}-{max_nodes}-{category or ''}"
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        data = graph.snapshot(level=level, category=category, max_nodes=max_nodes)
+        if data is None:
+            return jsonify({'error': 'Categoria não encontrada'}), 404
+        response = jsonify(data)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/graph/positions', methods=['PUT'])
+def pin_graph_positions():
+    """Fixa posições arrastadas na interface (somente super_admin)"""
+    if session.get('role') != 'super_admin':
+        return jsonify({'error': 'Acesso negado: Requer privilégios de super administrador'}), 403
+    positions = (request.json or {}).get('positions')
+    if not isinstance(positions, dict):
+        return jsonify({'error': 'positions deve ser um objeto {id: {x, y}}'}), 400
+    try:
+        applied = ensure_knowledge_graph().pin(positions)
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'Posição inválida'}), 400
+    return jsonify({'success': True, 'applied': applied, 'version': knowledge_graph.version})
+
+@app.route('/api/graph/layout', methods=['POST'])
+@admin_required
+def relayout_knowledge_graph():
+    """Descarta as posições salvas e recalcula o layout do grafo"""
+    graph = ensure_knowledge_graph()
+    graph.relayout()
+    return jsonify({'success': True, 'version': graph.version})
+
 @app.route('/api/articles/<int:article_id>/suggest-tags', methods=['POST'])
 def suggest_tags_for_article(article_id):
     """Sugere tags para um artigo específico"""
@@ -795,9 +1115,9 @@ def suggest_tags_for_article(article_id):
             return jsonify({'error': 'Artigo não encontrado'}), 404
         
         existing = [t.name for t in article.tags_rel]
-        suggested = get_ai_service().suggest_tags(article.title, article.content, existing_tags=existing)
+        result = suggest_tags_hybrid(article.title, article.content, existing_tags=existing, exclude_id=article.id)
         
-        return jsonify({'suggested': suggested})
+        return jsonify(result)
     finally:
         db.close()
 
@@ -814,8 +1134,58 @@ def suggest_tags_generic():
     if not title and not content:
         return jsonify({'error': 'É necessário fornecer pelo menos um título ou conteúdo para sugestão de tags'}), 400
         
-    suggested = get_ai_service().suggest_tags(title, content)
-    return jsonify({'suggested': suggested})
+    return jsonify(suggest_tags_hybrid(title, content))
+
+@app.route('/api/tags/suggest/batch', methods=['POST'])
+def suggest_tags_batch():
+    """Sugere tags para vários artigos de uma vez (apenas sugestor local)"""
+    data = request.json or {}
+    article_ids = data.get('article_ids') or []
+    if not isinstance(article_ids, list) or not article_ids:
+        return jsonify({'error': 'Informe article_ids (lista)'}), 400
+    if len(article_ids) > 500:
+        return jsonify({'error': 'Máximo de 500 artigos por lote'}), 400
+    try:
+        limit = max(1, min(int(data.get('limit', 5)), 20))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'limit inválido'}), 400
+
+    db = get_db()
+    try:
+        articles = db.query(Article).options(undefer(Article.content), selectinload(Article.tags_rel)) \
+            .filter(Article.id.in_(article_ids)).all()
+        article_vectors.ensure_built(load_articles_for_index)
+        results = {}
+        for article in articles:
+            existing = [t.name for t in article.tags_rel]
+            suggested, confidence = tag_suggester.suggest(
+                article.title, article.content, existing_tags=existing, limit=limit, exclude_id=article.id
+            )
+            results[article.id] = {'suggested': suggested, 'confidence': confidence, 'source': 'local'}
+        return jsonify({'results': results})
+    finally:
+        db.close()
+
+def suggest_tags_hybrid(title, content, existing_tags=None, exclude_id=None):
+    """Sugestor local primeiro; LLM só quando a confiança local é baixa."""
+    result = suggest_tags_locally(title, content, existing_tags=existing_tags, exclude_id=exclude_id)
+    if result['confidence'] < TAG_SUGGEST_MIN_CONFIDENCE:
+        try:
+            kwargs = {} if existing_tags is None else {'existing_tags': existing_tags}
+            apply_llm_tags(result, get_ai_service().suggest_tags(title, content, **kwargs))
+        except Exception as e:
+            print(f"⚠️ Erro no LLM ao sugerir tags (usando sugestão local): {e}")
+    return result
+
+def suggest_tags_locally(title, content, existing_tags=None, exclude_id=None):
+    article_vectors.ensure_built(load_articles_for_index)
+    suggested, confidence = tag_suggester.suggest(title, content, existing_tags=existing_tags, exclude_id=exclude_id)
+    return {'suggested': suggested, 'confidence': confidence, 'source': 'local'}
+
+def apply_llm_tags(result, llm_suggested):
+    if llm_suggested:
+        result['suggested'], result['source'] = llm_suggested, 'llm'
+    return result
 
 # ==================== ROTAS DE CHAT/IA ====================
 
@@ -825,15 +1195,24 @@ def get_version():
     print(f"DEBUG: Version check requested. Current: {APP_VERSION}")
     return jsonify({'version': APP_VERSION})
 
+@app.route('/api/ready')
+def get_ready():
+    """Readiness: 200 somente após o warm-up (modelos e índices carregados)"""
+    state = readiness()
+    state['ai_loaded'] = is_ai_service_loaded()
+    return jsonify(state), (200 if state['status'] == 'ready' else 503)
+
 @app.route('/api/status')
 def get_status():
     """Retorna status do sistema e da IA"""
     ai_status = get_ai_service().get_active_model_name()
     db_status = "Online"
+    articles_count = 0
     db = get_db()
     try:
         # Test DB connection
         db.execute(text("SELECT 1"))
+        articles_count = db.query(Article).count()
         
         # Obter categorias e contagens
         categories = db.query(Category).all()
@@ -851,33 +1230,32 @@ def get_status():
         # Ordenar por contagem decrescente
         category_stats.sort(key=lambda x: x['count'], reverse=True)
         
-        # Refresh user role from DB if logged in
+        # Refresh user role (cache) if logged in
         user_info = None
         if 'user' in session:
-            username = session['user']
-            user = db.query(User).filter_by(username=username).first()
-            if user:
-                if session.get('role') != user.role:
-                    session['role'] = user.role
-                user_info = user.to_dict()
-        
-        db.close()
+            user_info = get_session_user(session['user'])
+            if user_info and session.get('role') != user_info['role']:
+                session['role'] = user_info['role']
     except Exception as e:
         print(f"Erro em get_status: {e}")
         db_status = "Erro"
         category_stats = []
         user_info = None
+    finally:
+        # A contagem de artigos era feita depois do close e prendia uma conexão do pool por chamada
+        db.close()
         
     return jsonify({
         'ai_model': ai_status,
         'database': db_status,
         'version': '1.0.0',
         'ai_configured': ai_status != "Offline (Busca Manual)",
-        'articles_count': db.query(Article).count() if db_status == "Online" else 0,
+        'articles_count': articles_count,
         'categories_count': len(category_stats) if category_stats else 0,
         'category_stats': category_stats,
         'learned_words': get_ai_service().get_learned_words() if hasattr(get_ai_service(), 'get_learned_words') else [],
         'ai_usage': get_ai_service().generator.get_usage_stats() if hasattr(get_ai_service().generator, 'get_usage_stats') else {},
+        'embedding_cache': get_embedding_cache_stats(),
         'user': user_info
     })
 
@@ -890,64 +1268,136 @@ def chat():
     if not question:
         return jsonify({'error': 'Pergunta não fornecida'}), 400
     
+    try:
+        chat_session_id = get_chat_session_id(data)
+        articles_dict, history_list, corrected_question = prepare_chat(question, chat_session_id)
+        
+        # Gerar resposta usando IA com memória (recuperação + LLM; 'embedding' é medido à parte)
+        with stage('ai'):
+            result = get_ai_service().chat(corrected_question, articles_dict, history=history_list, preferred_model=data.get('model'))
+        result = finish_chat(question, corrected_question, result, chat_session_id)
+        
+        with stage('serialize'):
+            return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Etapas síncronas antes e depois do LLM, compartilhadas com o caminho assíncrono (kb_asgi)
+
+def prepare_chat(question, chat_session_id):
+    """Artigos (cache), histórico da sessão e pergunta corrigida para a chamada ao LLM."""
     db = get_db()
     try:
         # Buscar lista de artigos (Cacheada para performance)
-        articles_dict = get_cached_articles(db)
-
-        # Preferência de modelo (opcional)
-        preferred_model = data.get('model')
+        with stage('db.articles'):
+            articles_dict = get_cached_articles(db)
 
-        # Recuperar histórico recente para contexto (últimas 2 interações)
-        # Histórico é individual, não cacheado
-        recent_history = db.query(ChatHistory).order_by(ChatHistory.created_at.desc()).limit(2).all()
-        history_list = [{'question': h.question, 'answer': h.answer} for h in reversed(recent_history)]
-        
-        # Gerar resposta usando IA com memória
-        result = get_ai_service().chat(question, articles_dict, history=history_list, preferred_model=preferred_model)
-        
-        # VERIFICAR SE HÁ NOVO CONHECIMENTO PARA SALVAR
+        # Recuperar histórico recente da sessão para contexto (últimas 2 interações)
+        # Buffer em memória por sessão; banco só no cold start
+        with stage('db.history'):
+            history_list = chat_memory.get(chat_session_id, loader=lambda: load_session_history(db, chat_session_id))
+    finally:
+        db.close()
+    
+    # Correção ortográfica local (SymSpell sobre o vocabulário da base)
+    with stage('spelling'):
+        spelling_index.ensure_built(load_articles_for_index)
+        corrected_question = spelling_index.correct(question)
+    return articles_dict, history_list, corrected_question
+
+def finish_chat(question, corrected_question, result, chat_session_id):
+    """Ajusta a resposta do LLM e enfileira conhecimento novo e histórico."""
+    if corrected_question != question:
+        result['corrected_question'] = corrected_question
+        # A IA recebeu o texto já corrigido: preservar a contagem de erros do usuário
+        corrected_words = sum(1 for a, b in zip(question.split(), corrected_question.split()) if a != b)
+        result['typo_count'] = max(result.get('typo_count') or 0, corrected_words)
+    
+    # VERIFICAR SE HÁ NOVO CONHECIMENTO PARA SALVAR (write-behind, em ordem)
+    with stage('db.queue'):
         if 'new_knowledge' in result:
             nk = result['new_knowledge']
-            # Verificar/Criar Categoria
-            category = db.query(Category).filter(Category.name == nk['category']).first()
-            if not category:
-                category = Category(name=nk['category'], description='Termos aprendidos automaticamente via chat')
-                db.add(category)
-                db.commit()
-            
-            # Verificar se artigo já existe
-            exists = db.query(Article).filter(Article.title == nk['title']).first()
-            if not exists:
-                new_article = Article(
-                    title=nk['title'],
-                    content=nk['content'],
-                    category_id=category.id,
-                    tags=nk['tags'],
-                    status='approved' # Auto-approve learned definitions
-                )
-                db.add(new_article)
-                db.commit()
-                print(f"🧠 Novo conhecimento salvo no banco: {nk['title']}")
-                invalidate_article_cache() # Importante: invalidar cache pois entrou coisa nova aprovada
+            write_queue.submit('learned_article', {
+                'title': nk['title'],
+                'content': nk['content'],
+                'category': nk['category'],
+                'tags': nk['tags']
+            })
         
-        # Salvar no histórico
+        # Salvar no histórico (write-behind; memória da sessão atualizada na hora)
         relevant_article_ids = ','.join([str(source['id']) for source in result.get('sources', [])])
-        history = ChatHistory(
-            question=question,
-            answer=result['answer'],
-            relevant_articles=relevant_article_ids
-        )
-        db.add(history)
+        write_queue.submit('chat_history', {
+            'session_id': chat_session_id,
+            'question': question,
+            'answer': result['answer'],
+            'relevant_articles': relevant_article_ids,
+            'created_at': datetime.utcnow().isoformat()
+        })
+    chat_memory.append(chat_session_id, question, result['answer'])
+    return result
+
+# ==================== PERSISTÊNCIA WRITE-BEHIND DO CHAT ====================
+
+def persist_learned_article(payload):
+    """Salva conhecimento novo aprendido no chat (executado pelo escritor em background)"""
+    db = get_db()
+    try:
+        # Verificar/Criar Categoria
+        category = db.query(Category).filter(Category.name == payload['category']).first()
+        if not category:
+            category = Category(name=payload['category'], description='Termos aprendidos automaticamente via chat')
+            db.add(category)
+            db.flush()
+        
+        # Verificar se artigo já existe (título igual ou conteúdo quase-duplicado)
+        exists = db.query(Article.id).filter(Article.title == payload['title']).first()
+        if not exists:
+            near_duplicates = find_near_duplicates(payload['title'], payload['content'])
+            if near_duplicates:
+                print(f"🔁 Conhecimento '{payload['title']}' ignorado: quase-duplicado de #{near_duplicates[0]['id']}")
+                exists = True
+        if not exists:
+            new_article = Article(
+                title=payload['title'],
+                content=payload['content'],
+                category_id=category.id,
+                tags=payload['tags'],
+                status='approved' # Auto-approve learned definitions
+            )
+            db.add(new_article)
         db.commit()
-        
-        return jsonify(result)
-    except Exception as e:
+        if not exists:
+            print(f"🧠 Novo conhecimento salvo no banco: {payload['title']}")
+            invalidate_article_cache() # Importante: invalidar cache pois entrou coisa nova aprovada
+            notify_article_saved(new_article.to_dict())
+    except Exception:
         db.rollback()
-        return jsonify({'error': str(e)}), 500
+        raise
+    finally:
+        db.close()
+
+def persist_chat_history(payload):
+    """Salva um turno de conversa no histórico (executado pelo escritor em background)"""
+    db = get_db()
+    try:
+        db.add(ChatHistory(
+            session_id=payload['session_id'],
+            question=payload['question'],
+            answer=payload['answer'],
+            relevant_articles=payload['relevant_articles'],
+            created_at=datetime.fromisoformat(payload['created_at'])
+        ))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
     finally:
         db.close()
 
+write_queue = create_write_queue(os.getenv('WRITE_QUEUE_DB', os.path.join(basedir, 'write_queue.db')))
+write_queue.register('learned_article', persist_learned_article)
+write_queue.register('chat_history', persist_chat_history)
+
 @app.route('/api/chat/history', methods=['GET'])
 def get_chat_history():
     """Retorna histórico de conversas"""
@@ -972,6 +1422,7 @@ def delete_learned_word_route(word):
     """Deleta uma palavra aprendida"""
     success = get_ai_service().delete_learned_word(word)
     if success:
+        spelling_index.remove_learned_word(word)
         return jsonify({'message': f'Palavra "{word}" removida com sucesso.'})
     else:
         return jsonify({'error': 'Falha ao remover palavra ou não encontrada.'}), 400
@@ -988,6 +1439,7 @@ def add_learned_word_route():
         
     success = get_ai_service().add_learned_word(word)
     if success:
+        spelling_index.add_learned_word(word)
         return jsonify({'message': f'Palavra "{word}" adicionada com sucesso.'}), 201
     else:
         return jsonify({'error': 'Falha ao adicionar palavra (já existe ou erro interno).'}), 400
@@ -1004,11 +1456,13 @@ def hybrid_classify_route():
         return jsonify({'error': 'Texto é obrigatório'}), 400
         
     try:
+        # Classificador local (centróides); LLM só abaixo do limiar de confiança
+        local_result = classify_locally(text, title=title, tags=tags)
+        if local_result:
+            return jsonify(local_result)
+        
         # Buscar categorias existentes para dar contexto à IA
-        from kb_database import get_db, Category
-        db = get_db()
-        existing_categories = [c.name for c in db.query(Category).all()]
-        db.close()
+        existing_categories = get_category_names()
         
         result = get_ai_service().classify_content(text, title=title, tags=tags, existing_categories=existing_categories)
         return jsonify(result)
@@ -1017,25 +1471,48 @@ def hybrid_classify_route():
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+def get_category_names():
+    db = get_db()
+    try:
+        return [c.name for c in db.query(Category).all()]
+    finally:
+        db.close()
+
+def classify_locally(text, title=None, tags=None):
+    """Classificação por centróide; retorna None se a confiança for baixa."""
+    article_vectors.ensure_built(load_articles_for_index)
+    category_classifier.ensure_built(load_articles_for_index)
+    ranked = category_classifier.classify(text, title=title)
+    if len(ranked) < 2 or ranked[0][1] < CLASSIFIER_MIN_CONFIDENCE:
+        return None
+    
+    category, confidence = ranked[0]
+    suggested_tags, _ = tag_suggester.suggest(title or '', text, existing_tags=tags)
+    high = confidence >= 0.8
+    return {
+        'predictions': content_shape_predictions(text),
+        'decision': {
+            'action': 'AUTO_UPDATE' if high else 'SUGGEST_REVIEW',
+            'reason': f'Classificador local: {category} ({confidence:.0%})',
+            'confidence_level': 'High' if high else 'Medium'
+        },
+        'derived_context': {
+            'suggested_category': category,
+            'suggested_tags': suggested_tags,
+            'category_scores': dict(ranked[:5])
+        },
+        'metadata': {
+            'model_version': 'local-centroid-v1',
+            'source': 'local',
+            'confidence': confidence
+        }
+    }
+
 @app.route('/api/hybrid/feedback', methods=['POST'])
 def hybrid_feedback_route():
     """Salva feedback de classificação para treino futuro"""
     try:
         data = request.get_json(silent=True) or {}
-        feedback_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'training_data.json')
-        
-        history = []
-        if os.path.exists(feedback_file):
-            try:
-                if os.path.getsize(feedback_file) > 0:
-                    with open(feedback_file, 'r', encoding='utf-8') as f:
-                        history = json.load(f)
-                else: history = []
-            except Exception as e:
-                print(f"⚠️ Erro ao ler feedback_file, resetando: {e}")
-                history = []
-            
-        # Adicionar novo entry
         entry = {
             'timestamp': datetime.now().isoformat(),
             'text_snippet': data.get('text', '')[:200],
@@ -1043,17 +1520,37 @@ def hybrid_feedback_route():
             'user_correction': data.get('user_correction', ''),
             'final_decision': data.get('final_decision', '')
         }
-        history.append(entry)
-        
-        # Salvar
-        with open(feedback_file, 'w', encoding='utf-8') as f:
-            json.dump(history, f, indent=2, ensure_ascii=False)
+        if data.get('category'):
+            entry['category'] = data['category']
+            # Texto completo (limitado) para o classificador reaprender igual na reconstrução
+            entry['text'] = (data.get('text') or '')[:FEEDBACK_TEXT_MAX_CHARS]
+        article_id = data.get('article_id')
+        if isinstance(article_id, int) or str(article_id or '').isdigit():
+            entry['article_id'] = int(article_id)
+        # Append-only: não relê nem reescreve o histórico a cada clique
+        feedback_store.append(entry)
+        
+        # Correção do usuário ajusta o centróide da categoria escolhida na hora
+        # (se o texto virou artigo, sai quando o artigo aprovado entra no índice)
+        if is_learnable_feedback(entry):
+            category_classifier.learn(entry['text'], entry['category'], entry.get('article_id'))
             
         return jsonify({'status': 'Feedback salvo'})
     except Exception as e:
         print(f"Erro ao salvar feedback: {e}")
         return jsonify({'error': 'Erro ao salvar feedback'}), 500
 
+@app.route('/api/hybrid/feedback/export', methods=['GET'])
+@admin_required
+def export_hybrid_feedback():
+    """Exporta todo o feedback de treino em JSONL (streaming)"""
+    from flask import Response
+    return Response(
+        feedback_store.iter_jsonl(),
+        mimetype='application/x-ndjson',
+        headers={"Content-disposition": f"attachment; filename=training_data_{datetime.now().strftime('%Y%m%d')}.jsonl"}
+    )
+
 
 # ==================== ROTAS DE ANALYTICS (BI) ====================
 
@@ -1084,12 +1581,87 @@ def get_powerbi_feed():
     data = get_ai_service().analytics.get_powerbi_data()
     return jsonify(data)
 
+def summarize_analytics_window(days):
+    """Resumo compacto da janela (0 = todo o período) para o cache de insights."""
+    db = get_db()
+    try:
+        return build_analytics_summary(db, days=days or None)
+    finally:
+        db.close()
+
+# Insights por janela de dados: TTL + regeneração em background só quando os rollups mudam
+insights_cache = InsightsCache(
+    summarize=summarize_analytics_window,
+    generate=lambda summary: call_insights_generator(get_ai_service(), summary)
+)
+
 @app.route('/api/monitor/insights')
 @admin_required
 def get_analytics_insights():
-    """Gera insights automáticos com IA sobre os dados"""
-    insights = get_ai_service().generate_analytics_insights()
-    return jsonify({'insights': insights})
+    """Gera insights automáticos com IA sobre os dados (cacheados por janela)"""
+    days = normalize_window(request.args.get('days', 0, type=int))
+    payload, status = insights_response(days, session.get('user'))
+    return jsonify(payload), status
+
+def insights_response(days, user=None):
+    """Cache da janela ou, na primeira consulta, um job de geração (202 + job_id para polling)"""
+    if insights_cache.has(days):
+        return insights_cache.get(days), 200
+    # Outro processo pode já ter gerado a janela dentro do TTL
+    for job in job_runner.list(status='succeeded', kind='insights', limit=20):
+        if job['params'].get('days') == days and time.time() - job['finished_at'] < insights_cache.ttl:
+            return job['result'], 200
+    job_id = job_runner.submit('insights', {'days': days}, created_by=user, dedupe=True)
+    job = job_runner.get(job_id)
+    if job['status'] == 'succeeded':
+        return job['result'], 200
+    return {'job_id': job_id, 'job': job}, 202
+
+def metrics_access_allowed():
+    """Admin logado ou scraper com METRICS_TOKEN (Authorization: Bearer <token>)"""
+    token = os.getenv('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') == f'Bearer {token}':
+        return True
+    return session.get('role') in ['admin', 'super_admin']
+
+@app.route('/api/monitor/metrics')
+def get_latency_metrics():
+    """Histogramas de latência por endpoint e estágio (JSON)"""
+    if not metrics_access_allowed():
+        return jsonify({'error': 'Acesso negado: Requer privilégios de administrador'}), 403
+    if request.args.get('reset') == '1':
+        metrics.reset()
+    return jsonify(metrics.snapshot())
+
+@app.route('/api/monitor/metrics/prometheus')
+def get_latency_metrics_prometheus():
+    """Mesmos histogramas no formato texto do Prometheus"""
+    from flask import Response
+    if not metrics_access_allowed():
+        return jsonify({'error': 'Acesso negado: Requer privilégios de administrador'}), 403
+    return Response(metrics.prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/monitor/profiles')
+@admin_required
+def list_request_profiles():
+    """Perfis de requisição gravados recentemente (mais novos primeiro)"""
+    limit = request.args.get('limit', 50, type=int)
+    return jsonify(profile_store.list(limit=limit))
+
+@app.route('/api/monitor/profiles/<profile_id>')
+@admin_required
+def get_request_profile(profile_id):
+    """Baixa um perfil: ?format=speedscope (padrão, abrir em speedscope.app) ou collapsed"""
+    from flask import Response
+    fmt = request.args.get('format', 'speedscope')
+    content = profile_store.read(profile_id, fmt)
+    if content is None:
+        return jsonify({'error': 'Perfil não encontrado'}), 404
+    if fmt == 'collapsed':
+        return Response(content, mimetype='text/plain',
+                        headers={"Content-disposition": f"attachment; filename={profile_id}.collapsed.txt"})
+    return Response(content, mimetype='application/json',
+                    headers={"Content-disposition": f"attachment; filename={profile_id}.speedscope.json"})
 
 @app.route('/api/monitor/action', methods=['POST'])
 def log_analytics_event():
@@ -1107,9 +1679,9 @@ def log_analytics_event():
         
         user_id = None
         if 'user' in session:
-            user = db.query(User).filter_by(username=session['user']).first()
+            user = get_session_user(session['user'])
             if user:
-                user_id = user.id
+                user_id = user['id']
         
         log = InteractionLog(
             event_type=event_type,
@@ -1132,7 +1704,7 @@ def log_analytics_event():
 @app.route('/api/articles/import/word', methods=['POST'])
 @admin_required
 def import_word():
-    """Importa conteúdo de um arquivo Word como artigo"""
+    """Importa conteúdo de um arquivo Word como artigo (processado em job de background)"""
     if 'file' not in request.files:
         return jsonify({'error': 'Nenhum arquivo enviado'}), 400
     
@@ -1145,150 +1717,180 @@ def import_word():
     if not file.filename.endswith('.docx'):
         return jsonify({'error': 'Apenas arquivos .docx são suportados'}), 400
 
-    try:
-        # Ler o arquivo Word
-        import docx
-        from flask import current_app
-        import hashlib
-        import re
-        
-        doc = docx.Document(file)
-        
-        # O título base será o nome do arquivo
-        base_title = os.path.splitext(file.filename)[0]
-        
-        # Cache de imagens salvas para evitar duplicatas (hash -> url)
-        saved_images_cache = {}
-
-        def save_count_image(image_part):
-            """Salva o blob da imagem e retorna a URL"""
-            if not image_part: return None
-            
-            try:
-                image_data = image_part.blob
-                content_type = image_part.content_type
-                # Detecção básica de extensão
-                ext = 'png'
-                if content_type:
-                    if 'jpeg' in content_type: ext = 'jpg'
-                    elif 'png' in content_type: ext = 'png'
-                    elif 'gif' in content_type: ext = 'gif'
-                
-                # Check cache
-                img_hash = hashlib.md5(image_data).hexdigest()
-                filename = f"import_{img_hash}.{ext}"
-                
-                # Se já processamos essa imagem neste request ou existe no disco
-                filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-                
-                if not os.path.exists(filepath):
-                    with open(filepath, 'wb') as f:
-                        f.write(image_data)
-                
-                return f"/static/uploads/{filename}"
-            except Exception as e:
-                print(f"Erro ao salvar imagem: {e}")
-                return None
-
-        full_content = []
-        
-        # Regex para encontrar r:embed no XML do run
-        rel_pattern = re.compile(r'r:embed="([^"]+)"')
-        
-        for para in doc.paragraphs:
-            para_content = ""
-            
-            # Iterar pelos Runs do parágrafo para manter a ordem Texto -> Imagem -> Texto
-            for run in para.runs:
-                # 1. Texto do run
-                text = run.text
-                if text:
-                    para_content += text
-                
-                # 2. Imagens no run
-                if 'w:drawing' in run._element.xml:
-                    # Encontrar todos os embeds
-                    rIds = rel_pattern.findall(run._element.xml)
-                    for rId in rIds:
-                        # Tenta encontrar a part da imagem
-                        target_part = None
-                        
-                        # Tentar via part do parágrafo (padrão)
-                        if rId in para.part.rels:
-                            if "image" in para.part.rels[rId].target_ref:
-                                target_part = para.part.rels[rId].target_part
-                        
-                        # Fallback: Tentar via part do documento principal
-                        if not target_part and rId in doc.part.rels:
-                             if "image" in doc.part.rels[rId].target_ref:
-                                target_part = doc.part.rels[rId].target_part
-                                
-                        if target_part:
-                            url = save_count_image(target_part)
-                            if url:
-                                # Quebra de linha antes e depois da imagem para block element no markdown
-                                para_content += f"\n\n![Imagem Importada]({url})\n\n"
-            
-            if para_content.strip():
-                full_content.append(para_content.strip())
+    # O documento fica em disco até o job terminar (permite retomar após reinício)
+    import uuid
+    os.makedirs(JOB_FILES_FOLDER, exist_ok=True)
+    stored_path = os.path.join(JOB_FILES_FOLDER, f"{uuid.uuid4().hex}.docx")
+    file.save(stored_path)
     
-        if not full_content:
-             return jsonify({'error': 'Arquivo Word vazio ou sem conteúdo legível'}), 400
+    job_id = job_runner.submit('import_word', {
+        'path': stored_path,
+        'filename': file.filename,
+        'category_id': int(category_id) if category_id else 1,
+        'allow_duplicates': request.form.get('allow_duplicates', 'false').lower() in ('true', '1')
+    }, created_by=session.get('user'))
+    return jsonify({'message': 'Importação iniciada', 'job_id': job_id, 'job': job_runner.get(job_id)}), 202
+
+def parse_word_document(source):
+    """Lê o .docx (texto + imagens salvas em uploads) e agrupa em fragmentos de ~2000 caracteres"""
+    import docx
+    import hashlib
+    import re
+    
+    doc = docx.Document(source)
+    
+    # Cache de imagens salvas para evitar duplicatas (hash -> url)
+    saved_images_cache = {}
 
-        # Agrupamento Inteligente
-        chunks = []
-        current_chunk = []
-        current_length = 0
+    def save_count_image(image_part):
+        """Salva o blob da imagem e retorna a URL"""
+        if not image_part: return None
         
-        for item in full_content:
-            current_chunk.append(item)
-            current_length += len(item)
-            
-            if current_length > 2000: 
-                chunks.append('\n\n'.join(current_chunk))
-                current_chunk = []
-                current_length = 0
-                
-        if current_chunk:
-            chunks.append('\n\n'.join(current_chunk))
-
-        # Salvar artigo(s)
-        db = get_db()
         try:
-            imported_count = 0
-            base_category_id = int(category_id) if category_id else 1
+            image_data = image_part.blob
+            content_type = image_part.content_type
+            # Detecção básica de extensão
+            ext = 'png'
+            if content_type:
+                if 'jpeg' in content_type: ext = 'jpg'
+                elif 'png' in content_type: ext = 'png'
+                elif 'gif' in content_type: ext = 'gif'
             
-            for i, content in enumerate(chunks):
-                title = f"{base_title} (Parte {i+1})" if len(chunks) > 1 else base_title
-                
-                new_article = Article(
-                    title=title,
-                    content=content,
-                    category_id=base_category_id,
-                    tags=f"importado, word, {base_title}",
-                    status='approved'
-                )
-                db.add(new_article)
-                imported_count += 1
+            # Check cache
+            img_hash = hashlib.md5(image_data).hexdigest()
+            filename = f"import_{img_hash}.{ext}"
             
-            db.commit()
-            invalidate_article_cache()
+            # Se já processamos essa imagem nesta importação ou existe no disco
+            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
             
-            return jsonify({
-                'message': f'Documento importado com sucesso! Criados {imported_count} fragmentos com imagens.',
-                'count': imported_count
-            }), 201
+            if not os.path.exists(filepath):
+                with open(filepath, 'wb') as f:
+                    f.write(image_data)
             
+            return f"/static/uploads/{filename}"
         except Exception as e:
-            db.rollback()
-            raise e
-        finally:
-            db.close()
+            print(f"Erro ao salvar imagem: {e}")
+            return None
+
+    full_content = []
+    
+    # Regex para encontrar r:embed no XML do run
+    rel_pattern = re.compile(r'r:embed="([^"]+)"')
+    
+    for para in doc.paragraphs:
+        para_content = ""
+        
+        # Iterar pelos Runs do parágrafo para manter a ordem Texto -> Imagem -> Texto
+        for run in para.runs:
+            # 1. Texto do run
+            text = run.text
+            if text:
+                para_content += text
+            
+            # 2. Imagens no run
+            if 'w:drawing' in run._element.xml:
+                # Encontrar todos os embeds
+                rIds = rel_pattern.findall(run._element.xml)
+                for rId in rIds:
+                    # Tenta encontrar a part da imagem
+                    target_part = None
+                    
+                    # Tentar via part do parágrafo (padrão)
+                    if rId in para.part.rels:
+                        if "image" in para.part.rels[rId].target_ref:
+                            target_part = para.part.rels[rId].target_part
+                    
+                    # Fallback: Tentar via part do documento principal
+                    if not target_part and rId in doc.part.rels:
+                         if "image" in doc.part.rels[rId].target_ref:
+                            target_part = doc.part.rels[rId].target_part
+                            
+                    if target_part:
+                        url = save_count_image(target_part)
+                        if url:
+                            # Quebra de linha antes e depois da imagem para block element no markdown
+                            para_content += f"\n\n![Imagem Importada]({url})\n\n"
+        
+        if para_content.strip():
+            full_content.append(para_content.strip())
+
+    if not full_content:
+        raise ValueError('Arquivo Word vazio ou sem conteúdo legível')
+
+    # Agrupamento Inteligente
+    chunks = []
+    current_chunk = []
+    current_length = 0
+    
+    for item in full_content:
+        current_chunk.append(item)
+        current_length += len(item)
         
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        return jsonify({'error': f'Erro ao processar arquivo: {str(e)}'}), 500
+        if current_length > 2000: 
+            chunks.append('\n\n'.join(current_chunk))
+            current_chunk = []
+            current_length = 0
+            
+    if current_chunk:
+        chunks.append('\n\n'.join(current_chunk))
+    return chunks
+
+def run_import_word_job(job):
+    """Job: importa os fragmentos do documento, um commit por fragmento (checkpoint para retomar)"""
+    params = job.params
+    base_title = os.path.splitext(params['filename'])[0]
+    try:
+        job.progress(0.02, 'Lendo documento')
+        chunks = parse_word_document(params['path'])
+        
+        imported_count = job.checkpoint.get('imported', 0)
+        skipped_duplicates = job.checkpoint.get('skipped_duplicates', [])
+        for i in range(job.checkpoint.get('next', 0), len(chunks)):
+            content = chunks[i]
+            title = f"{base_title} (Parte {i+1})" if len(chunks) > 1 else base_title
+            
+            # Reimportação do mesmo documento: não duplicar partes já existentes
+            near_duplicates = [] if params['allow_duplicates'] else find_near_duplicates(title, content)
+            if near_duplicates:
+                skipped_duplicates.append({'title': title, 'duplicate_of': near_duplicates[0]})
+            else:
+                db = get_db()
+                try:
+                    new_article = Article(
+                        title=title,
+                        content=content,
+                        category_id=params['category_id'],
+                        tags=f"importado, word, {base_title}",
+                        status='approved'
+                    )
+                    db.add(new_article)
+                    db.commit()
+                    article_dict = new_article.to_dict()
+                except Exception:
+                    db.rollback()
+                    raise
+                finally:
+                    db.close()
+                invalidate_article_cache()
+                notify_article_saved(article_dict)
+                imported_count += 1
+            
+            job.progress(0.05 + 0.95 * (i + 1) / len(chunks), f'Fragmento {i + 1} de {len(chunks)}', checkpoint={
+                'next': i + 1, 'imported': imported_count, 'skipped_duplicates': skipped_duplicates
+            })
+    finally:
+        # Cancelado/falhou não é retomado; só uma queda do processo mantém o arquivo
+        if os.path.exists(params['path']):
+            os.remove(params['path'])
+    
+    message = f'Documento importado com sucesso! Criados {imported_count} fragmentos com imagens.'
+    if skipped_duplicates:
+        message += f' {len(skipped_duplicates)} fragmentos ignorados por já existirem na base.'
+    return {
+        'message': message,
+        'count': imported_count,
+        'skipped_duplicates': skipped_duplicates
+    }
 
 @app.route('/debug-ollama')
 def debug_ollama():
@@ -1330,7 +1932,171 @@ def debug_ollama():
 
     return jsonify(results)
 
+# ==================== JOBS EM BACKGROUND ====================
+
+def sync_all_embeddings():
+    """Sincroniza os embeddings de todos os artigos com o serviço de IA"""
+    db = get_db()
+    try:
+        articles_list = [a.to_dict() for a in db.query(Article).options(undefer(Article.content), joinedload(Article.category), selectinload(Article.tags_rel)).all()]
+    finally:
+        db.close()
+    get_ai_service().sync_embeddings(articles_list)
+    return len(articles_list)
+
+def run_reembed_job(job):
+    job.progress(0.05, 'Sincronizando embeddings')
+    return {'articles': sync_all_embeddings()}
+
+def run_insights_job(job):
+    return insights_cache.get(normalize_window(job.params.get('days', 0)))
+
+def run_related_job(job, batch_size=500):
+    """Job: recalcula toda a tabela de artigos relacionados (lotes por id, retomável)"""
+    article_vectors.ensure_built(load_articles_for_index)
+    last_id = job.checkpoint.get('last_id', 0)
+    computed = job.checkpoint.get('computed', 0)
+    db = get_db()
+    try:
+        total = db.query(Article).count()
+        while True:
+            ids = [row.id for row in db.query(Article.id).filter(Article.id > last_id).order_by(Article.id).limit(batch_size).all()]
+            if not ids:
+                break
+            computed += related_articles.recompute(db, ids)
+            last_id = ids[-1]
+            job.progress(computed / max(total, computed), f'{computed} de {total} artigos',
+                         checkpoint={'last_id': last_id, 'computed': computed})
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    return {'articles': computed}
+
+def run_recompress_job(job, batch_size=200):
+    """Job: regrava o corpo dos artigos com a ARTICLE_COMPRESSION atual (linhas antigas ou após trocar o método)"""
+    table = Article.__table__
+    last_id = job.checkpoint.get('last_id', 0)
+    rewritten = job.checkpoint.get('rewritten', 0)
+    # updated_at explícito: regravar o corpo não é uma edição do artigo
+    statement = table.update().where(table.c.id == bindparam('b_id')).values(
+        content=bindparam('b_content'), updated_at=bindparam('b_updated_at'))
+    db = get_db()
+    try:
+        total = db.query(Article).count()
+        while True:
+            rows = db.query(Article.id, Article.content, Article.updated_at).filter(Article.id > last_id).order_by(Article.id).limit(batch_size).all()
+            if not rows:
+                break
+            db.execute(statement, [{'b_id': row.id, 'b_content': row.content, 'b_updated_at': row.updated_at} for row in rows])
+            db.commit()
+            last_id = rows[-1].id
+            rewritten += len(rows)
+            job.progress(rewritten / max(total, rewritten), f'{rewritten} de {total} artigos regravados',
+                         checkpoint={'last_id': last_id, 'rewritten': rewritten})
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    return {'articles': rewritten, 'compression': ARTICLE_COMPRESSION}
+
+job_runner = create_job_runner(os.getenv('JOBS_DB', os.path.join(basedir, 'jobs.db')))
+job_runner.register('import_word', run_import_word_job)
+job_runner.register('delete_all', run_delete_all_job)
+# Embeddings ficam em memória por processo: os outros workers repetem a sincronização
+job_runner.register('reembed', run_reembed_job, broadcast=sync_all_embeddings)
+job_runner.register('insights', run_insights_job)
+job_runner.register('recompress', run_recompress_job)
+job_runner.register('related', run_related_job)
+
+# Tipos que podem ser criados diretamente por POST /api/jobs (import_word exige upload)
+SUBMITTABLE_JOBS = {'delete_all', 'reembed', 'insights', 'recompress', 'related'}
+
+@app.route('/api/jobs', methods=['GET'])
+@admin_required
+def list_jobs():
+    """Jobs recentes (?status=queued|running|succeeded|failed|cancelled&kind=&limit=)"""
+    return jsonify(job_runner.list(
+        status=request.args.get('status'),
+        kind=request.args.get('kind'),
+        limit=request.args.get('limit', 50, type=int)
+    ))
+
+@app.route('/api/jobs', methods=['POST'])
+@admin_required
+def submit_job():
+    """Cria um job: {"kind": "reembed" | "delete_all" | "insights", "params": {...}}"""
+    data = request.json or {}
+    kind = data.get('kind')
+    if kind not in SUBMITTABLE_JOBS:
+        return jsonify({'error': f"Tipo de job inválido. Use: {', '.join(sorted(SUBMITTABLE_JOBS))}"}), 400
+    params = data.get('params') or {}
+    if not isinstance(params, dict):
+        return jsonify({'error': 'params deve ser um objeto'}), 400
+    job_id = job_runner.submit(kind, params, created_by=session.get('user'), dedupe=True)
+    return jsonify(job_runner.get(job_id)), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+@admin_required
+def get_job(job_id):
+    """Estado do job para polling (status, progress 0-1, message, result/error)"""
+    job = job_runner.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job não encontrado'}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+@admin_required
+def cancel_job(job_id):
+    """Cancela o job (na fila: imediato; em execução: no próximo ponto de progresso)"""
+    job = job_runner.cancel(job_id)
+    if not job:
+        return jsonify({'error': 'Job não encontrado'}), 404
+    return jsonify(job)
+
+# ==================== WARM-UP ====================
+
+def sync_embeddings_on_startup():
+    """Re-embedding completo na partida: job em background (padrão) ou na sequência de boot"""
+    if launcher_setting('EMBEDDINGS_SYNC', 'job').lower() == 'inline':
+        sync_all_embeddings()
+    else:
+        job_runner.submit('reembed', created_by='startup', dedupe=True)
+
+def build_related_on_startup():
+    """Tabela de artigos relacionados vazia (banco novo/migrado): job de cálculo completo"""
+    db = get_db()
+    try:
+        empty = db.query(ArticleNeighbor.article_id).first() is None and db.query(Article.id).first() is not None
+    finally:
+        db.close()
+    if empty:
+        job_runner.submit('related', created_by='startup', dedupe=True)
+
+# Passos executados depois do import (o import de kb_app não carrega modelos)
+WARMUP_STEPS = [
+    ('ai_service', get_ai_service),
+    ('embeddings', sync_embeddings_on_startup),
+    ('indexes', lambda: build_all_indexes(load_articles_for_index)),
+    ('related', build_related_on_startup),
+]
+
+# Servidores WSGI (gunicorn/waitress) importam o módulo sem passar pelo __main__
+if launcher_setting('KB_WARMUP', '').lower() == 'background' and __name__ != '__main__':
+    start_background_warmup(WARMUP_STEPS)
+
 if __name__ == '__main__':
+    # --warmup: carrega tudo antes de abrir a porta | --no-warmup: tudo sob demanda
+    # Padrão: abre a porta imediatamente e aquece em background (/api/ready indica o fim)
+    import sys
+    warmup_mode = launcher_setting('KB_WARMUP', 'background').lower()
+    if '--warmup' in sys.argv:
+        warmup_mode = 'blocking'
+    elif '--no-warmup' in sys.argv:
+        warmup_mode = 'off'
+
     print("\n" + "="*50)
     print("🚀 Base de Conhecimento com IA")
     print("="*50)
@@ -1341,16 +2107,15 @@ if __name__ == '__main__':
     # Inicializar banco de dados na partida
     init_db()
 
-    # Sincronizar embeddings na inicialização
-    with app.app_context():
-        try:
-            db = get_db()
-            all_articles = db.query(Article).all()
-            articles_list = [a.to_dict() for a in all_articles]
-            get_ai_service().sync_embeddings(articles_list)
-            db.close()
-        except Exception as e:
-            print(f"⚠️ Erro ao sincronizar embeddings: {e}")
+    # Reprocessar escritas pendentes (write-behind) de uma execução anterior
+    write_queue.start()
+    # Retomar jobs interrompidos
+    job_runner.start()
+
+    # Modelos, embeddings e índices
+    if warmup_mode == 'blocking':
+        with app.app_context():
+            run_warmup(WARMUP_STEPS)
             
     # --- DIAGNÓSTICO DE INICIALIZAÇÃO KRAKEN (DESATIVADO) ---
     # O usuário optou por não usar Ollama Local.
@@ -1378,4 +2143,7 @@ if __name__ == '__main__':
         print(f"🌍 ACESSO LOCAL: http://localhost:{PORT}")
         
     debug_mode = os.getenv('FLASK_DEBUG', 'False').lower() in ('true', '1', 't')
+    # Com o reloader do modo debug, só o processo filho (que atende as requisições) aquece
+    if warmup_mode == 'background' and (not debug_mode or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+        start_background_warmup(WARMUP_STEPS)
     app.run(debug=debug_mode, port=PORT, host='0.0.0.0')
@@ -0,0 +1,392 @@
+"""Servidor ASGI para os endpoints que passam a maior parte do tempo esperando o LLM.
+
+``/api/chat``, ``/api/tags/suggest``, ``/api/hybrid/classify`` e
+``/api/monitor/insights`` são atendidos por corrotinas: enquanto a resposta do
+provedor não chega, o processo continua aceitando outras requisições. As
+etapas síncronas (banco, índices, correção ortográfica) rodam num pool de
+threads próprio (ASGI_THREADS) e só ocupam uma thread pelo tempo da etapa.
+
+Por padrão a chamada ao LLM é a do AIService, no pool, com o mesmo fluxo do
+Flask. Com ASYNC_LLM=true ela vira um ``await`` no cliente HTTP assíncrono
+(kb_async_llm: Groq/Gemini/Mistral/Ollama, um pool keep-alive por processo
+aberto no lifespan) e o número de chamadas simultâneas não depende de
+threads, mas recuperação, prompt e resultado do chat passam a ser os do
+kb_async_llm (sem ``new_knowledge``; veja o módulo). Um serviço com
+corrotinas próprias (``achat``... como o provedor falso) tem prioridade; sem
+provedor configurado ou no modo ``offline``, a chamada síncrona do AIService
+vai para o pool. As demais rotas caem no Flask via
+WsgiToAsgi. As respostas das rotas nativas levam os mesmos cabeçalhos CORS
+que o Flask-CORS põe nas rotas /api/* (widget embutido em outros sites).
+
+Uso:
+    python kb_asgi.py [--workers 2] [--host 0.0.0.0] [--port 3000]
+    uvicorn kb_asgi:app --workers 2 --port 3000
+
+O profiler sob demanda e o rastreamento de SQL só cobrem as rotas servidas
+pelo Flask; as métricas de latência (estágios) cobrem as duas.
+"""
+import os
+
+# O warm-up roda no evento de lifespan, não no import do kb_app (fixado no
+# kb_startup: o kb_app recarrega o .env com override e um KB_WARMUP do .env
+# desfaria um os.environ['KB_WARMUP'] = 'off')
+from kb_startup import LAUNCHER_SETTINGS
+LAUNCHER_SETTINGS['KB_WARMUP'] = 'off'
+# Embeddings ficam em memória por processo: cada worker sincroniza os seus no
+# warm-up (o job "reembed" deduplicado em jobs.db rodaria em um worker só)
+LAUNCHER_SETTINGS['EMBEDDINGS_SYNC'] = 'inline'
+
+import json
+import time
+import uuid
+import inspect
+import asyncio
+import argparse
+import functools
+import contextvars
+import traceback
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.wsgi import WsgiToAsgi
+from flask.sessions import SecureCookieSession
+from werkzeug.http import dump_cookie
+
+import kb_app
+from kb_app import app as flask_app, write_queue, job_runner, WARMUP_STEPS
+from kb_ai_service import get_ai_service, is_ai_service_loaded
+from kb_async_llm import AsyncLLMClient, CHAT_CONTEXT_ARTICLES
+from kb_database import init_db, get_db, SearchLog
+from kb_metrics import metrics, collect_stages, record_request, stage
+from kb_startup import run_warmup, start_background_warmup
+from kb_tag_suggester import TAG_SUGGEST_MIN_CONFIDENCE
+
+# Modo do warm-up no lifespan (lido depois do .env carregado pelo kb_app)
+WARMUP_MODE = (os.getenv('KB_ASGI_WARMUP') or os.getenv('KB_WARMUP', 'background')).lower()
+
+# Threads para as etapas síncronas (banco, índices) e para o AIService sem provedor assíncrono
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', 64))
+
+_executor = ThreadPoolExecutor(max_workers=ASGI_THREADS, thread_name_prefix='kb-asgi')
+# Cliente HTTP dos provedores; o pool de conexões é aberto/fechado no lifespan
+llm_client = AsyncLLMClient()
+
+
+async def run_sync(fn, *args, **kwargs):
+    """Executa ``fn`` no pool levando o contexto atual (estágios de métricas)."""
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, fn, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(_executor, call)
+
+
+def _service_coroutine(method):
+    """Corrotina ``a<method>`` do serviço já carregado (provedor falso), se houver."""
+    if not is_ai_service_loaded():
+        return None
+    async_method = getattr(get_ai_service(), f'a{method}', None)
+    return async_method if async_method is not None and inspect.iscoroutinefunction(async_method) else None
+
+
+def uses_llm_client(method, preferred_model=None):
+    return _service_coroutine(method) is None and llm_client.available(preferred_model)
+
+
+async def call_ai(method, *args, **kwargs):
+    """Corrotina do serviço > cliente HTTP assíncrono > método síncrono do AIService no pool."""
+    async_method = _service_coroutine(method)
+    if async_method is not None:
+        return await async_method(*args, **kwargs)
+    if llm_client.available(kwargs.get('preferred_model')):
+        return await getattr(llm_client, f'a{method}')(*args, **kwargs)
+    service = get_ai_service() if is_ai_service_loaded() else await run_sync(get_ai_service)
+    return await run_sync(getattr(service, method), *args, **kwargs)
+
+
+def retrieve_chat_sources(question, articles):
+    """Artigos de contexto do chat assíncrono (vizinhos TF-IDF da pergunta)."""
+    kb_app.article_vectors.ensure_built(kb_app.load_articles_for_index)
+    by_id = {article['id']: article for article in articles}
+    hits = kb_app.article_vectors.nearest(kb_app.article_vectors.vectorize(question),
+                                          k=CHAT_CONTEXT_ARTICLES * 2, status='approved')
+    return [by_id[article_id] for article_id, _ in hits if article_id in by_id][:CHAT_CONTEXT_ARTICLES]
+
+
+def log_chat_search(term, results_count):
+    """Registra a pergunta no SearchLog, como o analytics do AIService faz no chat."""
+    if is_ai_service_loaded():
+        get_ai_service().analytics.log_search(term, source='chat', results_count=results_count)
+        return
+    db = get_db()
+    try:
+        db.add(SearchLog(term=term, source='chat', results_count=results_count))
+        db.commit()
+    except Exception:
+        db.rollback()
+    finally:
+        db.close()
+
+
+# ==================== REQUISIÇÃO / RESPOSTA ====================
+
+class AsyncRequest:
+    def __init__(self, scope, body):
+        self.scope = scope
+        self.body = body
+        self.method = scope['method']
+        self.path = scope['path']
+        self.headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope.get('headers', [])}
+        self.session = self._load_session()
+        self.session_modified = False
+
+    def json(self):
+        try:
+            return json.loads(self.body or b'null')
+        except ValueError:
+            return None
+
+    def arg(self, name, default=None, type=str):
+        values = parse_qs(self.scope.get('query_string', b'').decode('latin-1')).get(name)
+        if not values:
+            return default
+        try:
+            return type(values[0])
+        except ValueError:
+            return default
+
+    def _load_session(self):
+        """Lê a sessão do cookie assinado do Flask (mesmo SECRET_KEY)."""
+        cookie = SimpleCookie()
+        try:
+            cookie.load(self.headers.get('cookie', ''))
+        except Exception:
+            return SecureCookieSession()
+        morsel = cookie.get(flask_app.config['SESSION_COOKIE_NAME'])
+        serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+        if morsel is None or serializer is None:
+            return SecureCookieSession()
+        try:
+            return SecureCookieSession(serializer.loads(morsel.value, max_age=int(flask_app.permanent_session_lifetime.total_seconds())))
+        except Exception:
+            return SecureCookieSession()
+
+    def session_cookie(self):
+        """Cabeçalho Set-Cookie com a sessão alterada (mesmos atributos do Flask)."""
+        interface = flask_app.session_interface
+        value = interface.get_signing_serializer(flask_app).dumps(dict(self.session))
+        return dump_cookie(
+            flask_app.config['SESSION_COOKIE_NAME'], value,
+            expires=interface.get_expiration_time(flask_app, self.session),
+            domain=interface.get_cookie_domain(flask_app),
+            path=interface.get_cookie_path(flask_app),
+            secure=interface.get_cookie_secure(flask_app),
+            httponly=interface.get_cookie_httponly(flask_app),
+            samesite=interface.get_cookie_samesite(flask_app),
+        )
+
+
+def cors_headers(scope):
+    """Mesmos cabeçalhos que o Flask-CORS (origins='*') devolve nas rotas /api/*."""
+    for name, value in scope.get('headers', []):
+        if name.lower() == b'origin':
+            return [(b'access-control-allow-origin', value), (b'vary', b'Origin')]
+    return []
+
+
+def json_response(request, payload, status=200):
+    headers = [(b'content-type', b'application/json')]
+    if request.session_modified:
+        headers.append((b'set-cookie', request.session_cookie().encode('latin-1')))
+    return status, headers, (flask_app.json.dumps(payload) + '\n').encode('utf-8')
+
+
+async def read_body(receive, limit):
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if limit and size > limit:
+            raise ValueError('Payload muito grande')
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+# ==================== ROTAS ASSÍNCRONAS ====================
+
+async def chat(request):
+    """Fluxo do /api/chat do Flask (kb_app.prepare_chat/finish_chat); com ASYNC_LLM=true o
+    meio (recuperação + LLM) é o do kb_async_llm."""
+    data = request.json()
+    if not isinstance(data, dict):
+        return json_response(request, {'error': 'Payload inválido'}, 400)
+    question = data.get('question', '')
+    if not question:
+        return json_response(request, {'error': 'Pergunta não fornecida'}, 400)
+
+    chat_session_id = data.get('session_id')
+    if chat_session_id:
+        chat_session_id = str(chat_session_id)[:64]
+    else:
+        if 'chat_session_id' not in request.session:
+            request.session['chat_session_id'] = uuid.uuid4().hex
+            request.session_modified = True
+        chat_session_id = request.session['chat_session_id']
+
+    try:
+        articles_dict, history_list, corrected_question = await run_sync(kb_app.prepare_chat, question, chat_session_id)
+        preferred_model = data.get('model')
+        if uses_llm_client('chat', preferred_model):
+            with stage('retrieval'):
+                sources = await run_sync(retrieve_chat_sources, corrected_question, articles_dict)
+            with stage('ai'):
+                result = await llm_client.achat(corrected_question, sources, history=history_list,
+                                                preferred_model=preferred_model)
+            await run_sync(log_chat_search, corrected_question, len(sources))
+        else:
+            with stage('ai'):
+                result = await call_ai('chat', corrected_question, articles_dict, history=history_list,
+                                       preferred_model=preferred_model)
+        result = await run_sync(kb_app.finish_chat, question, corrected_question, result, chat_session_id)
+        with stage('serialize'):
+            return json_response(request, result)
+    except Exception as e:
+        return json_response(request, {'error': str(e)}, 500)
+
+
+async def suggest_tags(request):
+    data = request.json()
+    if not data:
+        return json_response(request, {'error': 'Payload inválido'}, 400)
+    title = data.get('title', '')
+    content = data.get('content', '')
+    if not title and not content:
+        return json_response(request, {'error': 'É necessário fornecer pelo menos um título ou conteúdo para sugestão de tags'}, 400)
+
+    result = await run_sync(kb_app.suggest_tags_locally, title, content)
+    if result['confidence'] < TAG_SUGGEST_MIN_CONFIDENCE:
+        try:
+            kb_app.apply_llm_tags(result, await call_ai('suggest_tags', title, content))
+        except Exception as e:
+            print(f"⚠️ Erro no LLM ao sugerir tags (usando sugestão local): {e}")
+    return json_response(request, result)
+
+
+async def hybrid_classify(request):
+    data = request.json()
+    if not isinstance(data, dict):
+        return json_response(request, {'error': 'Payload inválido'}, 400)
+    text = data.get('text', '')
+    title = data.get('title')
+    tags = data.get('tags') or []
+    if not text:
+        return json_response(request, {'error': 'Texto é obrigatório'}, 400)
+
+    try:
+        local_result = await run_sync(kb_app.classify_locally, text, title=title, tags=tags)
+        if local_result:
+            return json_response(request, local_result)
+        existing_categories = await run_sync(kb_app.get_category_names)
+        result = await call_ai('classify_content', text, title=title, tags=tags, existing_categories=existing_categories)
+        return json_response(request, result)
+    except Exception as e:
+        traceback.print_exc()
+        return json_response(request, {'error': str(e)}, 500)
+
+
+async def analytics_insights(request):
+    if 'user' not in request.session:
+        return json_response(request, {'error': 'Autenticação necessária'}, 401)
+    if request.session.get('role') not in ['admin', 'super_admin']:
+        return json_response(request, {'error': 'Acesso negado: Requer privilégios de administrador'}, 403)
+    days = kb_app.normalize_window(request.arg('days', 0, type=int))
+    # Primeira consulta da janela: 202 + job_id (a geração roda no executor de jobs)
+    payload, status = await run_sync(kb_app.insights_response, days, request.session.get('user'))
+    return json_response(request, payload, status)
+
+
+ASYNC_ROUTES = {
+    ('POST', '/api/chat'): chat,
+    ('POST', '/api/tags/suggest'): suggest_tags,
+    ('POST', '/api/hybrid/classify'): hybrid_classify,
+    ('GET', '/api/monitor/insights'): analytics_insights,
+}
+
+
+# ==================== APLICAÇÃO ASGI ====================
+
+class KnowledgeBaseASGI:
+    def __init__(self, flask_app):
+        self.wsgi = WsgiToAsgi(flask_app)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        handler = ASYNC_ROUTES.get((scope.get('method'), scope.get('path'))) if scope['type'] == 'http' else None
+        if handler is None:
+            return await self.wsgi(scope, receive, send)
+
+        started = time.perf_counter()
+        endpoint = f"{scope['method']} {scope['path']}"
+        with collect_stages() as stages:
+            try:
+                body = await read_body(receive, flask_app.config.get('MAX_CONTENT_LENGTH'))
+            except ValueError as e:
+                body = None
+                status, headers, payload = 413, [(b'content-type', b'application/json')], json.dumps({'error': str(e)}).encode()
+            else:
+                if body is None:
+                    return
+                status, headers, payload = await handler(AsyncRequest(scope, body))
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': headers + cors_headers(scope) + [(b'content-length', str(len(payload)).encode())]})
+        await send({'type': 'http.response.body', 'body': payload})
+        record_request(metrics, endpoint, stages, time.perf_counter() - started, status)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                init_db()
+                if os.getenv('KB_LLM_PROVIDER', '').lower() != 'fake':
+                    llm_client.start()
+                    if llm_client.providers:
+                        print(f"🔌 LLM assíncrono: {', '.join(llm_client.providers)}")
+                # Reprocessar escritas pendentes (write-behind) de uma execução anterior
+                write_queue.start()
+                job_runner.start()
+                if WARMUP_MODE == 'blocking':
+                    await run_sync(run_warmup, WARMUP_STEPS)
+                elif WARMUP_MODE == 'background':
+                    start_background_warmup(WARMUP_STEPS)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                job_runner.stop()
+                write_queue.stop()
+                await llm_client.aclose()
+                _executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+# Nome esperado por "uvicorn kb_asgi:app"
+app = KnowledgeBaseASGI(flask_app)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description='Servidor ASGI (rotas de LLM assíncronas + Flask)')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('KB_WORKERS', 2)))
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', 3000)))
+    args = parser.parse_args()
+
+    if args.workers > 1 and not os.getenv('SECRET_KEY'):
+        print("⚠️  SECRET_KEY ausente: cada worker terá uma chave própria e as sessões não serão compartilhadas.")
+    print(f"🚀 Servidor ASGI em http://{args.host}:{args.port} ({args.workers} processos, {ASGI_THREADS} threads cada)")
+    uvicorn.run('kb_asgi:app', host=args.host, port=args.port, workers=args.workers, log_level='warning')
@@ -0,0 +1,220 @@
+"""Cliente assíncrono dos provedores de LLM (Groq, Gemini, Mistral, Ollama) para kb_asgi.
+
+Um único ``httpx.AsyncClient`` por processo (criado e fechado no lifespan do
+ASGI) mantém conexões keep-alive com cada provedor; a espera pela resposta é
+um ``await``, sem ocupar thread. Provedores sem chave/URL configurada ficam
+de fora; com ``auto`` a ordem é Groq -> Gemini -> Mistral -> Ollama e uma falha
+passa para o próximo.
+
+Desligado por padrão (ASYNC_LLM=false): não é o fluxo do AIService. O chat
+recupera artigos pelos vetores TF-IDF locais (``kb_app.article_vectors``) em
+vez da busca do AIService, usa o próprio ``CHAT_SYSTEM_PROMPT``, não conta
+erros de digitação além da correção ortográfica do kb_app e não devolve
+``new_knowledge`` (o aprendizado automático do ``finish_chat`` não acontece);
+tags e classificação também usam prompts próprios. A mesma pergunta pode ter
+respostas diferentes do Flask. O modo ``offline`` e a ausência de provedores
+continuam no AIService síncrono.
+"""
+import os
+import re
+import json
+
+import httpx
+
+from kb_classifier import content_shape_predictions
+
+# Caminho assíncrono ligado (false = tudo pelo AIService no pool de threads, mesmo fluxo do Flask)
+ASYNC_LLM = os.getenv('ASYNC_LLM', 'false').lower() in ('true', '1', 't')
+LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', 60))
+# Conexões simultâneas e conexões keep-alive ociosas mantidas no pool (por processo)
+LLM_MAX_CONNECTIONS = int(os.getenv('LLM_MAX_CONNECTIONS', 200))
+LLM_MAX_KEEPALIVE = int(os.getenv('LLM_MAX_KEEPALIVE', 40))
+
+GROQ_MODEL = os.getenv('GROQ_MODEL', 'llama-3.3-70b-versatile')
+GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.5-flash')
+MISTRAL_MODEL = os.getenv('MISTRAL_MODEL', 'mistral-small-latest')
+OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'llama3')
+
+# Artigos e caracteres por artigo enviados como contexto do chat
+CHAT_CONTEXT_ARTICLES = int(os.getenv('CHAT_CONTEXT_ARTICLES', 4))
+CHAT_CONTEXT_CHARS = int(os.getenv('CHAT_CONTEXT_CHARS', 2000))
+
+CHAT_SYSTEM_PROMPT = (
+    "Você é o assistente da base de conhecimento interna da empresa. Responda em português, "
+    "de forma objetiva, usando SOMENTE as informações dos artigos fornecidos. Se a resposta "
+    "não estiver nos artigos, diga que não encontrou essa informação na base de conhecimento."
+)
+
+JSON_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+
+def _api_key(name):
+    """Chave do ambiente, ignorando os valores de exemplo do .env.example."""
+    value = (os.getenv(name) or '').strip()
+    return None if not value or value.startswith('your_') else value
+
+
+def parse_json(text):
+    """Primeiro objeto JSON da resposta (modelos às vezes cercam o JSON com texto)."""
+    match = JSON_RE.search(text or '')
+    if not match:
+        raise ValueError(f"Resposta sem JSON: {text[:200]!r}")
+    return json.loads(match.group(0))
+
+
+class AsyncLLMClient:
+    """Chamadas aos provedores com um pool de conexões compartilhado."""
+
+    def __init__(self):
+        self._client = None
+        self.providers = {}
+        if _api_key('GROQ_API_KEY'):
+            self.providers['groq'] = (self._openai_compatible, 'https://api.groq.com/openai/v1', 'GROQ_API_KEY', GROQ_MODEL, 'Groq')
+        if _api_key('GEMINI_API_KEY'):
+            self.providers['gemini'] = (self._gemini, None, 'GEMINI_API_KEY', GEMINI_MODEL, 'Gemini')
+        if _api_key('MISTRAL_API_KEY'):
+            self.providers['mistral'] = (self._openai_compatible, 'https://api.mistral.ai/v1', 'MISTRAL_API_KEY', MISTRAL_MODEL, 'Mistral')
+        if os.getenv('OLLAMA_URL'):
+            self.providers['ollama'] = (self._ollama, os.getenv('OLLAMA_URL').rstrip('/'), None, OLLAMA_MODEL, 'Ollama')
+
+    # ---------- ciclo de vida ----------
+
+    def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=LLM_TIMEOUT,
+                limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_KEEPALIVE),
+            )
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def available(self, preferred_model=None):
+        """Há provedor para atender (``offline`` fica com a busca do AIService)."""
+        return ASYNC_LLM and self._client is not None and bool(self.providers) and preferred_model != 'offline'
+
+    # ---------- provedores ----------
+
+    async def complete(self, messages, preferred_model=None, json_mode=False, max_tokens=1024):
+        """``(texto, nome do modelo)`` do primeiro provedor que responder."""
+        order = list(self.providers)
+        if preferred_model in self.providers:
+            order.remove(preferred_model)
+            order.insert(0, preferred_model)
+        last_error = None
+        for name in order:
+            call, base_url, key_env, model, label = self.providers[name]
+            try:
+                text = await call(base_url, _api_key(key_env) if key_env else None, model, messages, json_mode, max_tokens)
+                return text, f"{label} ({model})"
+            except Exception as e:
+                print(f"⚠️ LLM assíncrono: falha no provedor {name}: {e}")
+                last_error = e
+        raise RuntimeError(f"Nenhum provedor de LLM respondeu: {last_error}")
+
+    async def _openai_compatible(self, base_url, api_key, model, messages, json_mode, max_tokens):
+        body = {'model': model, 'messages': messages, 'temperature': 0.2, 'max_tokens': max_tokens}
+        if json_mode:
+            body['response_format'] = {'type': 'json_object'}
+        response = await self._client.post(f"{base_url}/chat/completions", json=body,
+                                           headers={'Authorization': f'Bearer {api_key}'})
+        response.raise_for_status()
+        return response.json()['choices'][0]['message']['content']
+
+    async def _gemini(self, base_url, api_key, model, messages, json_mode, max_tokens):
+        system = '\n\n'.join(m['content'] for m in messages if m['role'] == 'system')
+        contents = [{'role': 'model' if m['role'] == 'assistant' else 'user', 'parts': [{'text': m['content']}]}
+                    for m in messages if m['role'] != 'system']
+        body = {'contents': contents, 'generationConfig': {'temperature': 0.2, 'maxOutputTokens': max_tokens}}
+        if system:
+            body['systemInstruction'] = {'parts': [{'text': system}]}
+        if json_mode:
+            body['generationConfig']['responseMimeType'] = 'application/json'
+        response = await self._client.post(
+            f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent",
+            json=body, headers={'x-goog-api-key': api_key}
+        )
+        response.raise_for_status()
+        parts = response.json()['candidates'][0]['content']['parts']
+        return ''.join(part.get('text', '') for part in parts)
+
+    async def _ollama(self, base_url, api_key, model, messages, json_mode, max_tokens):
+        body = {'model': model, 'messages': messages, 'stream': False,
+                'options': {'temperature': 0.2, 'num_predict': max_tokens}}
+        if json_mode:
+            body['format'] = 'json'
+        response = await self._client.post(f"{base_url}/api/chat", json=body)
+        response.raise_for_status()
+        return response.json()['message']['content']
+
+    # ---------- operações usadas pelas rotas ----------
+
+    async def achat(self, question, sources, history=None, preferred_model=None):
+        """Resposta do chat com as chaves do AIService (``answer``, ``sources``, ``model_used``).
+
+        Sem ``new_knowledge``; ``typo_count`` fica para o ``finish_chat`` (correção ortográfica).
+        """
+        context = '\n\n'.join(
+            f"### [{a.get('id')}] {a.get('title')}\n{(a.get('content') or '')[:CHAT_CONTEXT_CHARS]}" for a in sources
+        ) or '(nenhum artigo relevante encontrado)'
+        messages = [{'role': 'system', 'content': CHAT_SYSTEM_PROMPT}]
+        for turn in history or []:
+            messages.append({'role': 'user', 'content': turn['question']})
+            messages.append({'role': 'assistant', 'content': turn['answer']})
+        messages.append({'role': 'user', 'content': f"Artigos da base:\n\n{context}\n\nPergunta: {question}"})
+        answer, model_used = await self.complete(messages, preferred_model=preferred_model)
+        return {
+            'answer': answer.strip(),
+            'sources': [{'id': a.get('id'), 'title': a.get('title')} for a in sources],
+            'typo_count': 0,
+            'model_used': model_used,
+        }
+
+    async def asuggest_tags(self, title, content, existing_tags=None):
+        existing = ', '.join(existing_tags or []) or 'nenhuma'
+        messages = [
+            {'role': 'system', 'content': 'Você sugere tags curtas (1 a 3 palavras, minúsculas) para artigos '
+                                          'de uma base de conhecimento. Responda apenas com JSON {"tags": [...]}.'},
+            {'role': 'user', 'content': f"Tags já usadas: {existing}\n\nTítulo: {title}\n\n{(content or '')[:4000]}"},
+        ]
+        text, _ = await self.complete(messages, json_mode=True, max_tokens=200)
+        tags = parse_json(text).get('tags') or []
+        return [str(t).strip() for t in tags if str(t).strip()][:8]
+
+    async def aclassify_content(self, text, title=None, tags=None, existing_categories=None):
+        """Categoria sugerida pelo LLM no formato do painel híbrido (igual ao classificador local)."""
+        categories = ', '.join(existing_categories or []) or 'nenhuma'
+        messages = [
+            {'role': 'system', 'content': 'Você classifica textos de uma base de conhecimento. Prefira uma das '
+                                          'categorias existentes. Responda apenas com JSON '
+                                          '{"category": "...", "tags": [...], "confidence": 0.0-1.0}.'},
+            {'role': 'user', 'content': f"Categorias existentes: {categories}\n\nTítulo: {title or ''}\n"
+                                        f"Tags: {', '.join(tags or [])}\n\n{text[:4000]}"},
+        ]
+        raw, model_used = await self.complete(messages, json_mode=True, max_tokens=200)
+        data = parse_json(raw)
+        try:
+            confidence = max(0.0, min(1.0, float(data.get('confidence', 0.5))))
+        except (TypeError, ValueError):
+            confidence = 0.5
+        high = confidence >= 0.8
+        category = str(data.get('category') or 'Geral').strip()
+        return {
+            'predictions': content_shape_predictions(text),
+            'decision': {
+                'action': 'AUTO_UPDATE' if high else 'SUGGEST_REVIEW',
+                'reason': f'LLM: {category} ({confidence:.0%})',
+                'confidence_level': 'High' if high else 'Medium'
+            },
+            'derived_context': {
+                'suggested_category': category,
+                'suggested_tags': [str(t).strip() for t in (data.get('tags') or []) if str(t).strip()][:8],
+            },
+            'metadata': {
+                'model_version': model_used,
+                'source': 'llm',
+                'confidence': confidence
+            }
+        }
@@ -0,0 +1,308 @@
+import os
+import re
+import heapq
+import unicodedata
+
+from kb_indexes import ArticleIndex
+
+# Sugestões guardadas por nó da trie (o máximo que uma consulta pode pedir)
+AUTOCOMPLETE_TOP_K = int(os.getenv('AUTOCOMPLETE_TOP_K', 10))
+# Buscas com resultado a partir dessa frequência entram como sugestão
+AUTOCOMPLETE_MIN_SEARCHES = int(os.getenv('AUTOCOMPLETE_MIN_SEARCHES', 2))
+# Termos de busca carregados do SearchLog na construção (os mais frequentes)
+AUTOCOMPLETE_MAX_SEARCH_TERMS = int(os.getenv('AUTOCOMPLETE_MAX_SEARCH_TERMS', 5000))
+# Termos ainda abaixo de AUTOCOMPLETE_MIN_SEARCHES acompanhados em memória (os mais recentes)
+AUTOCOMPLETE_MAX_PENDING_SEARCHES = int(os.getenv('AUTOCOMPLETE_MAX_PENDING_SEARCHES', 2000))
+
+MAX_KEY_LENGTH = 80
+# Pesos relativos por tipo: título inteiro > palavra do meio do título
+TITLE_WEIGHT = 3
+TITLE_WORD_WEIGHT = 1
+
+WORD_START_RE = re.compile(r"\s+")
+
+
+def normalize(text):
+    """Minúsculas, sem acentos e espaços colapsados ("Configuração  VPN" -> "configuracao vpn")."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(text.lower().split())[:MAX_KEY_LENGTH]
+
+
+class _Node:
+    __slots__ = ('children', 'entries', 'top')
+
+    def __init__(self):
+        self.children = {}   # primeiro caractere -> (rótulo da aresta, nó)
+        self.entries = {}    # entry_id -> peso (chaves que terminam aqui)
+        self.top = []        # [(peso, entry_id)] melhores da subárvore, decrescente
+
+
+class RadixTrie:
+    """Trie compactada (arestas com rótulos de vários caracteres) com top-k por nó.
+
+    Cada nó guarda as ``top_k`` melhores entradas da própria subárvore, então
+    completar um prefixo é descer pelo prefixo e devolver a lista pronta.
+    Inserir/remover recalcula só os nós do caminho.
+    """
+
+    def __init__(self, top_k=AUTOCOMPLETE_TOP_K):
+        self.top_k = top_k
+        self.root = _Node()
+        self.keys = 0
+        # Carga em massa: os top-k são calculados uma vez no fim (``finish_bulk``)
+        self.bulk = True
+
+    def set(self, key, entry_id, weight):
+        """Define o peso de ``entry_id`` na chave (peso <= 0 remove)."""
+        if not key:
+            return
+        path = [self.root]
+        node = self.root
+        rest = key
+        while rest:
+            edge = node.children.get(rest[0])
+            if edge is None:
+                if weight <= 0:
+                    return
+                child = _Node()
+                node.children[rest[0]] = (rest, child)
+                node = child
+                path.append(node)
+                break
+            label, child = edge
+            common = _common_prefix(label, rest)
+            if common < len(label):
+                if weight <= 0:
+                    return
+                # Divide a aresta: label[:common] -> meio -> label[common:]
+                middle = _Node()
+                middle.children[label[common]] = (label[common:], child)
+                middle.top = list(child.top)
+                node.children[rest[0]] = (label[:common], middle)
+                child = middle
+            node = child
+            path.append(node)
+            rest = rest[common:]
+        if weight > 0:
+            if entry_id not in node.entries:
+                self.keys += 1
+            node.entries[entry_id] = weight
+        elif node.entries.pop(entry_id, None) is not None:
+            self.keys -= 1
+        else:
+            return
+        if self.bulk:
+            return
+        for n in reversed(path):
+            self._update_top(n)
+        self._prune(key)
+
+    def finish_bulk(self):
+        """Calcula os top-k de todos os nós (pós-ordem) e passa a atualizar por caminho."""
+        stack = [(self.root, False)]
+        while stack:
+            node, visited = stack.pop()
+            if visited:
+                self._update_top(node)
+                continue
+            stack.append((node, True))
+            stack.extend((child, False) for _, child in node.children.values())
+        self.bulk = False
+
+    def _update_top(self, node):
+        best = {}
+        for entry_id, weight in node.entries.items():
+            best[entry_id] = weight
+        for _, child in node.children.values():
+            for weight, entry_id in child.top:
+                if weight > best.get(entry_id, 0):
+                    best[entry_id] = weight
+        node.top = heapq.nlargest(self.top_k, ((w, e) for e, w in best.items()))
+
+    def _prune(self, key):
+        """Remove nós vazios e funde nós com um único filho no caminho da chave."""
+        node = self.root
+        rest = key
+        while rest:
+            edge = node.children.get(rest[0])
+            if edge is None or not rest.startswith(edge[0]):
+                return
+            label, child = edge
+            if not child.entries and not child.children:
+                del node.children[rest[0]]
+                return
+            if not child.entries and len(child.children) == 1:
+                (only_label, grandchild), = child.children.values()
+                node.children[rest[0]] = (label + only_label, grandchild)
+                continue
+            node = child
+            rest = rest[len(label):]
+
+    def complete(self, prefix, limit):
+        """``[(peso, entry_id)]`` das melhores chaves que começam com ``prefix``."""
+        node = self.root
+        rest = prefix
+        while rest:
+            edge = node.children.get(rest[0])
+            if edge is None:
+                return []
+            label, child = edge
+            if len(rest) <= len(label):
+                return child.top[:limit] if label.startswith(rest) else []
+            if not rest.startswith(label):
+                return []
+            node = child
+            rest = rest[len(label):]
+        return node.top[:limit]
+
+
+def _common_prefix(a, b):
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+class AutocompleteIndex(ArticleIndex):
+    """Sugestões de busca: títulos, tags e categorias dos artigos aprovados + buscas populares.
+
+    Títulos entram inteiros e a partir de cada palavra (``vpn`` completa
+    "Configurar VPN"). Tags e categorias pesam pelo nº de artigos; termos de
+    busca pela frequência no SearchLog (``search_terms_loader``) e pelas
+    buscas registradas depois (``record_search``). Termos abaixo de
+    ``min_searches`` ficam só numa contagem limitada (``pending_searches``)
+    até atingirem o mínimo.
+    """
+
+    def __init__(self, search_terms_loader=None, min_searches=AUTOCOMPLETE_MIN_SEARCHES):
+        super().__init__()
+        self.search_terms_loader = search_terms_loader
+        self.min_searches = min_searches
+        self._clear()
+
+    def _clear(self):
+        self.trie = RadixTrie()
+        self.entries = {}         # entry_id -> {'text', 'type', 'article_id'?}
+        self.articles = {}        # article_id -> (título, [tags], categoria) indexados
+        self.tag_counts = {}      # tag normalizada -> [texto, nº de artigos]
+        self.category_counts = {}
+        self.search_counts = {}   # termo normalizado -> [texto, nº de buscas] (>= min_searches)
+        self.pending_searches = {}   # termo normalizado -> nº de buscas (abaixo do mínimo, LRU)
+
+    # ---------- artigos ----------
+
+    def _title_keys(self, title):
+        """Título inteiro e o sufixo a partir de cada palavra, com o peso de cada chave."""
+        key = normalize(title)
+        keys = {}
+        for match in WORD_START_RE.finditer(key):
+            suffix = key[match.end():]
+            if len(suffix) >= 2:
+                keys[suffix] = TITLE_WORD_WEIGHT
+        keys[key] = TITLE_WEIGHT
+        return keys.items()
+
+    def _add(self, article):
+        if article.get('status') != 'approved' or not article.get('title'):
+            return
+        article_id = article['id']
+        entry_id = f"a:{article_id}"
+        self.entries[entry_id] = {'text': article['title'], 'type': 'title', 'article_id': article_id}
+        for key, weight in self._title_keys(article['title']):
+            self.trie.set(key, entry_id, weight)
+        tags = [t.strip() for t in (article.get('tags') or []) if t and t.strip()]
+        for tag in tags:
+            self._bump(self.tag_counts, 'tag', tag, 1)
+        category = article.get('category_name')
+        if category:
+            self._bump(self.category_counts, 'category', category, 1)
+        self.articles[article_id] = (article['title'], tags, category)
+
+    def _remove(self, article_id):
+        indexed = self.articles.pop(article_id, None)
+        if indexed is None:
+            return
+        title, tags, category = indexed
+        entry_id = f"a:{article_id}"
+        for key, _ in self._title_keys(title):
+            self.trie.set(key, entry_id, 0)
+        self.entries.pop(entry_id, None)
+        for tag in tags:
+            self._bump(self.tag_counts, 'tag', tag, -1)
+        if category:
+            self._bump(self.category_counts, 'category', category, -1)
+
+    def _bump(self, counts, kind, text, delta, min_count=1):
+        """Ajusta a contagem de uma tag/categoria/busca e o peso correspondente na trie."""
+        key = normalize(text)
+        if not key:
+            return
+        item = counts.get(key)
+        if item is None:
+            item = counts[key] = [text, 0]
+        item[1] += delta
+        entry_id = f"{kind[0]}:{key}"
+        if item[1] <= 0:
+            del counts[key]
+            self.entries.pop(entry_id, None)
+            self.trie.set(key, entry_id, 0)
+            return
+        if item[1] >= min_count:
+            self.entries[entry_id] = {'text': item[0], 'type': kind}
+            self.trie.set(key, entry_id, item[1])
+
+    # ---------- buscas ----------
+
+    def _finish_build(self):
+        try:
+            terms = self.search_terms_loader() if self.search_terms_loader else []
+        except Exception as e:
+            print(f"⚠️ Erro ao carregar termos de busca para o autocomplete: {e}")
+            terms = []
+        for term, count in terms:
+            self._count_search(term, count)
+        self.trie.finish_bulk()
+
+    def record_search(self, term):
+        """Busca com resultado feita agora (mantém a popularidade sem esperar a reconstrução)."""
+        if not self.built or not normalize(term):
+            return
+        with self._lock:
+            self._journal(lambda index: index._count_search(term.strip(), 1))
+
+    def _count_search(self, term, count):
+        key = normalize(term)
+        if not key:
+            return
+        if key not in self.search_counts:
+            count += self.pending_searches.pop(key, 0)
+            if count < self.min_searches:
+                # Reinserido no fim: os menos recentes saem primeiro
+                self.pending_searches[key] = count
+                if len(self.pending_searches) > AUTOCOMPLETE_MAX_PENDING_SEARCHES:
+                    del self.pending_searches[next(iter(self.pending_searches))]
+                return
+        self._bump(self.search_counts, 'search', term, count, min_count=self.min_searches)
+
+    # ---------- consulta ----------
+
+    def complete(self, prefix, limit=8):
+        key = normalize(prefix)
+        if not key:
+            return []
+        limit = max(1, min(limit, self.trie.top_k))
+        results = []
+        seen = set()
+        with self._lock:
+            # Pede a lista inteira do nó: a mesma palavra pode vir como tag e como busca
+            for weight, entry_id in self.trie.complete(key, self.trie.top_k):
+                entry = self.entries.get(entry_id)
+                if entry is None or (entry['type'] != 'title' and normalize(entry['text']) in seen):
+                    continue
+                seen.add(normalize(entry['text']))
+                results.append(dict(entry, score=weight))
+                if len(results) == limit:
+                    break
+        return results
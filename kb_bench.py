@@ -0,0 +1,305 @@
+"""Benchmark ponta a ponta: sobe o kb_app com o provedor de IA falso e mede latência/vazão.
+
+Uso:
+    python kb_bench.py                                  # banco demo novo, saída em JSON no stdout
+    python kb_bench.py --concurrency 1,8,32 --duration 15 --output bench/baseline.json
+    python kb_bench.py --compare bench/baseline.json    # compara com um baseline (sai com 1 se regrediu)
+    python kb_bench.py --db /caminho/kb_data.db         # usa um banco existente (gerar_demo_db.py)
+    python kb_bench.py --base-url http://host:3000      # mede um servidor já em execução
+
+O servidor roda com KB_LLM_PROVIDER=fake (latência e tokens/s configuráveis
+com --llm-latency-ms / --llm-tokens-per-sec). Um DATABASE_URL definido no .env
+tem precedência sobre o banco do benchmark (kb_app carrega o .env com override).
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import http.client
+from datetime import datetime
+from urllib.parse import urlparse, quote
+
+BASEDIR = os.path.abspath(os.path.dirname(__file__))
+SEARCH_TERMS = ['vpn', 'férias', 'senha', 'rede', 'vendas', 'email', 'wifi', 'política', 'acesso', 'formulário']
+QUESTIONS = [
+    'Como configurar a VPN?', 'Quantos dias de férias posso vender?', 'Como trocar minha senha?',
+    'Qual o script de abordagem para vendas?', 'Como acessar a rede interna de casa?',
+]
+
+
+def scenario_articles(rng):
+    if rng.random() < 0.5:
+        return 'GET', '/api/articles', None
+    return 'GET', f"/api/articles?search={quote(rng.choice(SEARCH_TERMS))}", None
+
+
+def scenario_chat(rng):
+    return 'POST', '/api/chat', {'question': rng.choice(QUESTIONS), 'session_id': f"bench-{rng.randrange(1000)}"}
+
+
+def scenario_status(rng):
+    return 'GET', '/api/status', None
+
+
+def scenario_action(rng):
+    return 'POST', '/api/monitor/action', {'event_type': rng.choice(['view', 'view', 'view', 'like']), 'article_id': rng.randint(1, 3)}
+
+
+SCENARIOS = {
+    'articles': scenario_articles,
+    'chat': scenario_chat,
+    'status': scenario_status,
+    'action': scenario_action,
+}
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(p / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def run_level(base_url, scenario, concurrency, duration, seed):
+    """Executa ``concurrency`` clientes (keep-alive) por ``duration`` segundos."""
+    target = urlparse(base_url)
+    latencies = []
+    errors = {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(worker_id):
+        rng = random.Random(seed * 1000 + worker_id)
+        conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=60)
+        local = []
+        local_errors = {}
+        while time.perf_counter() < deadline:
+            method, path, payload = scenario(rng)
+            body = json.dumps(payload) if payload is not None else None
+            headers = {'Content-Type': 'application/json'} if body else {}
+            started = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 400:
+                    local_errors[str(response.status)] = local_errors.get(str(response.status), 0) + 1
+                else:
+                    local.append(time.perf_counter() - started)
+            except Exception as e:
+                local_errors[type(e).__name__] = local_errors.get(type(e).__name__, 0) + 1
+                conn.close()
+                conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=60)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            for key, count in local_errors.items():
+                errors[key] = errors.get(key, 0) + count
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    ms = lambda v: round(v * 1000, 2) if v is not None else None
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 2) if elapsed else 0,
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'max_ms': ms(latencies[-1] if latencies else None),
+    }
+
+
+def wait_ready(base_url, timeout=120):
+    target = urlparse(base_url)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(target.hostname, target.port, timeout=2)
+            conn.request('GET', '/api/ready')
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def start_server(args, workdir):
+    """Sobe kb_app (ou kb_serve/kb_asgi) num processo separado com o provedor falso."""
+    db_path = os.path.join(workdir, 'kb_data.db')
+    if args.db:
+        shutil.copy(args.db, db_path)
+    else:
+        print("🧱 Gerando banco de demonstração...", file=sys.stderr)
+        subprocess.run([sys.executable, os.path.join(BASEDIR, 'gerar_demo_db.py')], cwd=workdir,
+                       check=True, stdout=subprocess.DEVNULL)
+        if args.articles or args.search_logs:
+            # Corpus sintético sobre o demo (mantém os artigos modelo usados pelos cenários)
+            subprocess.run([sys.executable, os.path.join(BASEDIR, 'gerar_demo_db.py'), '--append',
+                            '--categories', '10', '--tags', '200', '--articles', str(args.articles),
+                            '--search-logs', str(args.search_logs), '--seed', str(args.seed)],
+                           cwd=workdir, check=True, stdout=subprocess.DEVNULL)
+
+    env = dict(os.environ)
+    env.update({
+        'KB_LLM_PROVIDER': 'fake',
+        'FAKE_LLM_LATENCY_MS': str(args.llm_latency_ms),
+        'FAKE_LLM_TOKENS_PER_SEC': str(args.llm_tokens_per_sec),
+        'DATABASE_URL': f"sqlite:///{db_path}",
+        'WRITE_QUEUE_DB': os.path.join(workdir, 'write_queue.db'),
+        'PORT': str(args.port),
+        'FLASK_DEBUG': 'false',
+    })
+    if args.server == 'prefork':
+        command = [sys.executable, os.path.join(BASEDIR, 'kb_serve.py'), '--workers', str(args.workers),
+                   '--host', '127.0.0.1', '--port', str(args.port)]
+    elif args.server == 'asgi':
+        env['KB_ASGI_WARMUP'] = 'blocking'
+        command = [sys.executable, os.path.join(BASEDIR, 'kb_asgi.py'), '--workers', str(args.workers),
+                   '--host', '127.0.0.1', '--port', str(args.port)]
+    else:
+        command = [sys.executable, os.path.join(BASEDIR, 'kb_app.py'), '--warmup']
+    log = open(os.path.join(workdir, 'server.log'), 'w')
+    process = subprocess.Popen(command, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    return process, log
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASEDIR,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(baseline, current, threshold):
+    """Regressões: p95 maior ou vazão menor que o baseline além de ``threshold`` (fração)."""
+    regressions = []
+    for endpoint, levels in current['results'].items():
+        previous = {level['concurrency']: level for level in baseline.get('results', {}).get(endpoint, [])}
+        for level in levels:
+            old = previous.get(level['concurrency'])
+            if not old or not old.get('p95_ms') or not level.get('p95_ms'):
+                continue
+            p95_change = (level['p95_ms'] - old['p95_ms']) / old['p95_ms']
+            rps_change = (level['rps'] - old['rps']) / old['rps'] if old['rps'] else 0
+            status = 'ok'
+            if p95_change > threshold or rps_change < -threshold:
+                status = 'regressão'
+                regressions.append((endpoint, level['concurrency']))
+            print(f"{endpoint:<10} c={level['concurrency']:<4} p95 {old['p95_ms']:>9.2f} -> {level['p95_ms']:>9.2f} ms "
+                  f"({p95_change:+.1%})  rps {old['rps']:>8.2f} -> {level['rps']:>8.2f} ({rps_change:+.1%})  {status}",
+                  file=sys.stderr)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ponta a ponta da Base de Conhecimento')
+    parser.add_argument('--base-url', help='mede um servidor já em execução (não sobe kb_app)')
+    parser.add_argument('--db', help='banco SQLite existente a copiar para o benchmark')
+    parser.add_argument('--articles', type=int, default=0, help='artigos sintéticos extras no banco gerado')
+    parser.add_argument('--search-logs', type=int, default=0, help='buscas sintéticas extras no banco gerado')
+    parser.add_argument('--server', choices=['app', 'prefork', 'asgi'], default='app')
+    parser.add_argument('--workers', type=int, default=4, help='workers do modo prefork')
+    parser.add_argument('--port', type=int, default=3999)
+    parser.add_argument('--endpoints', default=','.join(SCENARIOS))
+    parser.add_argument('--concurrency', default='1,8,32')
+    parser.add_argument('--duration', type=float, default=10.0, help='segundos por nível de concorrência')
+    parser.add_argument('--llm-latency-ms', type=float, default=300)
+    parser.add_argument('--llm-tokens-per-sec', type=float, default=80)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='grava o resultado (baseline) neste arquivo JSON')
+    parser.add_argument('--compare', help='baseline JSON para comparar')
+    parser.add_argument('--threshold', type=float, default=0.10, help='tolerância de regressão (fração)')
+    args = parser.parse_args()
+
+    endpoints = [e.strip() for e in args.endpoints.split(',') if e.strip()]
+    unknown = [e for e in endpoints if e not in SCENARIOS]
+    if unknown:
+        parser.error(f"endpoints desconhecidos: {', '.join(unknown)}")
+    levels = [int(c) for c in args.concurrency.split(',')]
+
+    workdir = None
+    process = log = None
+    base_url = args.base_url
+    if not base_url:
+        workdir = tempfile.mkdtemp(prefix='kb_bench_')
+        process, log = start_server(args, workdir)
+        base_url = f"http://127.0.0.1:{args.port}"
+
+    try:
+        if not wait_ready(base_url):
+            print(f"❌ Servidor não ficou pronto (log: {workdir and os.path.join(workdir, 'server.log')})", file=sys.stderr)
+            return 2
+
+        results = {}
+        for endpoint in endpoints:
+            results[endpoint] = []
+            for concurrency in levels:
+                level = run_level(base_url, SCENARIOS[endpoint], concurrency, args.duration, args.seed)
+                results[endpoint].append(level)
+                print(f"⏱️  {endpoint:<10} c={concurrency:<4} {level['rps']:>8.2f} req/s  "
+                      f"p50 {level['p50_ms']} ms  p95 {level['p95_ms']} ms  p99 {level['p99_ms']} ms  "
+                      f"erros {level['errors'] or 0}", file=sys.stderr)
+    finally:
+        if process:
+            process.terminate()
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            log.close()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'date': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'server': 'external' if args.base_url else args.server,
+            'corpus': None if args.base_url or args.db else {'articles': args.articles, 'search_logs': args.search_logs},
+            'duration': args.duration,
+            'llm_latency_ms': args.llm_latency_ms,
+            'llm_tokens_per_sec': args.llm_tokens_per_sec,
+        },
+        'results': results,
+    }
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"💾 Baseline gravado em {args.output}", file=sys.stderr)
+    else:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} regressão(ões) acima de {args.threshold:.0%}", file=sys.stderr)
+            return 1
+        print("✅ Sem regressões", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,57 @@
+import threading
+from collections import OrderedDict, deque
+
+
+class ConversationMemory:
+    """Buffer circular de turnos recentes por sessão de chat.
+
+    - Cada sessão guarda no máximo ``turns_per_session`` turnos (deque com maxlen).
+    - No máximo ``max_sessions`` sessões ficam em memória; as ociosas saem por LRU.
+    - Memória total limitada a ``max_sessions * turns_per_session`` turnos.
+    - Na primeira consulta de uma sessão (cold start) o ``loader`` busca no banco.
+    """
+
+    def __init__(self, turns_per_session=2, max_sessions=5000):
+        self.turns_per_session = turns_per_session
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()  # session_id -> deque[{'question', 'answer'}]
+        self._lock = threading.Lock()
+
+    def get(self, session_id, loader=None):
+        """Retorna os turnos recentes (mais antigo primeiro)."""
+        with self._lock:
+            turns = self._sessions.get(session_id)
+            if turns is not None:
+                self._sessions.move_to_end(session_id)
+                return list(turns)
+
+        # Cold start: carrega fora do lock (I/O de banco)
+        loaded = loader() if loader else []
+        with self._lock:
+            turns = self._sessions.get(session_id)
+            if turns is None:
+                turns = deque(loaded[-self.turns_per_session:], maxlen=self.turns_per_session)
+                self._store(session_id, turns)
+            return list(turns)
+
+    def append(self, session_id, question, answer):
+        """Registra um novo turno na sessão."""
+        with self._lock:
+            turns = self._sessions.get(session_id)
+            if turns is None:
+                turns = deque(maxlen=self.turns_per_session)
+            turns.append({'question': question, 'answer': answer})
+            self._store(session_id, turns)
+
+    def _store(self, session_id, turns):
+        self._sessions[session_id] = turns
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def forget(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._sessions)
@@ -0,0 +1,203 @@
+import os
+import re
+import math
+
+from kb_indexes import ArticleIndex
+from kb_vectors import article_text, tokenize
+
+# Confiança mínima para responder localmente (abaixo disso, consulta o LLM)
+CLASSIFIER_MIN_CONFIDENCE = float(os.getenv('CLASSIFIER_MIN_CONFIDENCE', 0.6))
+# Temperatura do softmax sobre as similaridades (menor = mais confiante). É ajustada na
+# construção contra os próprios artigos; este valor vale enquanto não há exemplos suficientes
+CLASSIFIER_TEMPERATURE = float(os.getenv('CLASSIFIER_TEMPERATURE', 0.05))
+# Artigos (amostra) usados no ajuste da temperatura e mínimo para ajustar
+CLASSIFIER_CALIBRATION_SAMPLES = int(os.getenv('CLASSIFIER_CALIBRATION_SAMPLES', 500))
+CLASSIFIER_CALIBRATION_MIN_SAMPLES = 20
+# Temperaturas candidatas (0.01 a ~2.6, passo geométrico)
+TEMPERATURE_GRID = [0.01 * 1.25 ** i for i in range(26)]
+# Texto de feedback guardado no log e aprendido (o mesmo na hora e na reconstrução)
+FEEDBACK_TEXT_MAX_CHARS = int(os.getenv('FEEDBACK_TEXT_MAX_CHARS', 5000))
+
+DEFINITION_RE = re.compile(r"\b(é|são|significa|significam|refere-se|consiste|define-se)\b", re.IGNORECASE)
+
+
+class _Centroid:
+    """Soma dos vetores de uma categoria, com norma mantida incrementalmente."""
+
+    __slots__ = ('total', 'count', 'norm_sq')
+
+    def __init__(self):
+        self.total = {}
+        self.count = 0
+        self.norm_sq = 0.0
+
+    def dot(self, vector):
+        return sum(w * self.total.get(t, 0.0) for t, w in vector.items())
+
+    def add(self, vector, sign=1):
+        # ||s ± v||² = ||s||² ± 2 s·v + ||v||²
+        self.norm_sq += sign * 2 * self.dot(vector) + sum(w * w for w in vector.values())
+        for t, w in vector.items():
+            value = self.total.get(t, 0.0) + sign * w
+            if abs(value) < 1e-12:
+                self.total.pop(t, None)
+            else:
+                self.total[t] = value
+        self.count += sign
+
+    def similarity(self, vector):
+        if self.count <= 0 or self.norm_sq <= 1e-12:
+            return 0.0
+        return self.dot(vector) / math.sqrt(self.norm_sq)
+
+
+class CategoryClassifier(ArticleIndex):
+    """Classificador de categoria por centróide (um vetor médio por categoria).
+
+    Usa os vetores TF-IDF de ``vector_index``. Só artigos aprovados entram nos
+    centróides; aprovar, mover ou excluir um artigo ajusta o centróide em O(termos).
+    Correções do usuário (feedback híbrido) entram na hora como exemplos extras;
+    as que viraram artigo (``article_id``, criado como pendente) saem quando o
+    artigo entra no índice, para não contar duas vezes.
+
+    A temperatura do softmax é ajustada em cada construção por máxima
+    verossimilhança sobre uma amostra dos artigos (cada um contra os centróides
+    sem ele mesmo), então as probabilidades ficam próximas da taxa de acerto
+    observada nos próprios artigos.
+    """
+
+    def __init__(self, vector_index, feedback_loader=None):
+        super().__init__()
+        self.vector_index = vector_index
+        self.feedback_loader = feedback_loader
+        self._clear()
+
+    def _clear(self):
+        self.centroids = {}       # nome da categoria -> _Centroid
+        self.contributions = {}   # article_id / ('feedback', n) -> (categoria, vetor)
+        self.feedback_articles = {}   # article_id ainda fora do índice -> [chaves do feedback]
+        self._feedback_seq = 0
+        self.temperature = CLASSIFIER_TEMPERATURE
+
+    def _contribute(self, key, category, vector):
+        if not category or not vector:
+            return
+        self.centroids.setdefault(category, _Centroid()).add(vector)
+        self.contributions[key] = (category, vector)
+
+    def _add(self, article):
+        if article.get('status') != 'approved':
+            return
+        # O artigo criado a partir do feedback passa a contar por si mesmo
+        for feedback_key in self.feedback_articles.pop(article['id'], ()):
+            self._remove(feedback_key)
+        vector = self.vector_index.vectors.get(article['id']) or self.vector_index.vectorize(article_text(article))
+        self._contribute(article['id'], article.get('category_name'), vector)
+
+    def _remove(self, key):
+        contribution = self.contributions.pop(key, None)
+        if contribution is None:
+            return
+        category, vector = contribution
+        centroid = self.centroids.get(category)
+        if centroid:
+            centroid.add(vector, sign=-1)
+            if centroid.count <= 0:
+                del self.centroids[category]
+
+    def _finish_build(self):
+        try:
+            for entry in self.feedback_loader() if self.feedback_loader else []:
+                if is_learnable_feedback(entry) and entry.get('article_id') not in self.contributions:
+                    self._learn(entry['text'], entry['category'], entry.get('article_id'))
+        except Exception as e:
+            print(f"⚠️ Erro ao carregar feedback no classificador: {e}")
+        self._fit_temperature()
+
+    def learn(self, text, category, article_id=None):
+        """Incorpora uma correção do usuário (texto rotulado com a categoria final).
+
+        ``article_id``: artigo criado com esse texto; a correção vale até ele ser aprovado.
+        """
+        if not self.built:
+            return
+        def op(index):
+            if article_id is None or article_id not in index.contributions:
+                index._learn(text, category, article_id)
+
+        with self._lock:
+            self._journal(op)
+
+    def _learn(self, text, category, article_id=None):
+        self._feedback_seq += 1
+        key = ('feedback', self._feedback_seq)
+        self._contribute(key, category, self.vector_index.vectorize(text))
+        if article_id is not None and key in self.contributions:
+            self.feedback_articles.setdefault(article_id, []).append(key)
+
+    def _fit_temperature(self):
+        """Temperatura que minimiza a log-verossimilhança negativa da categoria real dos artigos."""
+        samples = [(category, vector) for key, (category, vector) in self.contributions.items()
+                   if not isinstance(key, tuple)]
+        step = max(1, len(samples) // CLASSIFIER_CALIBRATION_SAMPLES)
+        rows = []
+        for category, vector in samples[::step]:
+            if self.centroids[category].count <= 1:
+                continue   # sem o próprio artigo a categoria não existiria
+            own_sq = sum(w * w for w in vector.values())
+            scores = []
+            for name, centroid in self.centroids.items():
+                if name != category:
+                    scores.append(centroid.similarity(vector))
+                    continue
+                # Centróide sem o próprio artigo (leave-one-out)
+                dot = centroid.dot(vector)
+                norm_sq = centroid.norm_sq - 2 * dot + own_sq
+                true_score = (dot - own_sq) / math.sqrt(norm_sq) if norm_sq > 1e-12 else 0.0
+                scores.append(true_score)
+            rows.append((true_score, scores))
+        if len(self.centroids) < 2 or len(rows) < CLASSIFIER_CALIBRATION_MIN_SAMPLES:
+            self.temperature = CLASSIFIER_TEMPERATURE
+            return
+
+        def nll(temperature):
+            total = 0.0
+            for true_score, scores in rows:
+                top = max(scores)
+                total += math.log(sum(math.exp((s - top) / temperature) for s in scores)) - (true_score - top) / temperature
+            return total
+
+        self.temperature = min(TEMPERATURE_GRID, key=nll)
+        print(f"🌡️ Classificador: temperatura {self.temperature:.3f} ajustada em {len(rows)} artigos")
+
+    def classify(self, text, title=None):
+        """Retorna ``[(categoria, probabilidade), ...]`` em ordem decrescente."""
+        vector = self.vector_index.vectorize(article_text({'title': title or '', 'content': text}))
+        if not vector:
+            return []
+        with self._lock:
+            scores = [(name, c.similarity(vector)) for name, c in self.centroids.items()]
+        if not scores:
+            return []
+        # Softmax com a temperatura ajustada na construção: similaridades -> probabilidades
+        top = max(s for _, s in scores)
+        exps = [(name, math.exp((s - top) / self.temperature)) for name, s in scores]
+        total = sum(e for _, e in exps)
+        probs = [(name, round(e / total, 4)) for name, e in exps]
+        probs.sort(key=lambda kv: kv[1], reverse=True)
+        return probs
+
+
+def is_learnable_feedback(entry):
+    """Feedback com categoria e texto (correção do usuário)."""
+    return bool(entry.get('category') and entry.get('text'))
+
+
+def content_shape_predictions(text):
+    """Heurística rápida do tipo de conteúdo (conceito / definição / artigo)."""
+    words = len(tokenize(text)) or len(text.split())
+    first_sentence = re.split(r"[.!?\n]", text.strip(), maxsplit=1)[0]
+    is_concept = 0.75 if words <= 8 else 0.1
+    is_definition = 0.8 if DEFINITION_RE.search(first_sentence) and words <= 80 else 0.2
+    is_article = round(min(1.0, words / 120.0), 3)
+    return {'is_concept': is_concept, 'is_definition': is_definition, 'is_article': is_article}
@@ -1,12 +1,68 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey, Table
+from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Float, ForeignKey, Table, Index, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import sessionmaker, relationship, deferred
+from sqlalchemy.types import TypeDecorator
 from datetime import datetime
 import os
+import zlib
+import base64
 from dotenv import load_dotenv
 
+try:
+    import zstandard
+except ImportError:  # zstandard é opcional (ARTICLE_COMPRESSION=zstd)
+    zstandard = None
+
 load_dotenv()
 
+# Compressão do corpo dos artigos: off | zlib | zstd (zstd requer o pacote zstandard)
+ARTICLE_COMPRESSION = os.getenv('ARTICLE_COMPRESSION', 'off').lower()
+# Corpos menores que isso (caracteres) são gravados sem compressão
+ARTICLE_COMPRESS_MIN_CHARS = int(os.getenv('ARTICLE_COMPRESS_MIN_CHARS', 1024))
+
+if ARTICLE_COMPRESSION == 'zstd' and zstandard is None:
+    print("⚠️ ARTICLE_COMPRESSION=zstd sem o pacote zstandard: usando zlib")
+    ARTICLE_COMPRESSION = 'zlib'
+
+# Prefixos dos valores comprimidos (base64 para caber na coluna Text já existente)
+COMPRESSION_MARKERS = {'zlib': 'zlib+b64:', 'zstd': 'zstd+b64:'}
+
+
+def compress_text(value, method=None):
+    """Texto a gravar: comprimido com marcador, ou o próprio texto se não compensar."""
+    method = method or ARTICLE_COMPRESSION
+    if value is None or method not in COMPRESSION_MARKERS or len(value) < ARTICLE_COMPRESS_MIN_CHARS:
+        return value
+    raw = value.encode('utf-8')
+    packed = zstandard.ZstdCompressor(level=6).compress(raw) if method == 'zstd' else zlib.compress(raw, 6)
+    encoded = COMPRESSION_MARKERS[method] + base64.b64encode(packed).decode('ascii')
+    return encoded if len(encoded) < len(value) else value
+
+
+def decompress_text(value):
+    """Inverso de ``compress_text``; textos sem marcador (linhas antigas) passam direto."""
+    if not value or not value.startswith(tuple(COMPRESSION_MARKERS.values())):
+        return value
+    method, payload = value.split('+b64:', 1)
+    packed = base64.b64decode(payload)
+    if method == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("Artigo comprimido com zstd: instale o pacote zstandard")
+        return zstandard.ZstdDecompressor().decompress(packed).decode('utf-8')
+    return zlib.decompress(packed).decode('utf-8')
+
+
+class CompressedText(TypeDecorator):
+    """Text com compressão transparente (ARTICLE_COMPRESSION); lê linhas comprimidas ou não."""
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return compress_text(value)
+
+    def process_result_value(self, value, dialect):
+        return decompress_text(value)
+
 Base = declarative_base()
 
 class Category(Base):
@@ -60,7 +116,9 @@ class Article(Base):
     
     id = Column(Integer, primary_key=True)
     title = Column(String(200), nullable=False)
-    content = Column(Text, nullable=False)
+    # Adiado: contagens, listagens de categoria/tag e checagens não carregam o corpo.
+    # Quem serializa listas de artigos usa options(undefer(Article.content)).
+    content = deferred(Column(CompressedText, nullable=False))
     category_id = Column(Integer, ForeignKey('categories.id'))
     tags = Column(String(500))  # Tags separadas por vírgula
     status = Column(String(20), default='pending') # pending, approved, rejected
@@ -85,6 +143,21 @@ class Article(Base):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
+class ArticleNeighbor(Base):
+    """Vizinhos pré-calculados (top-N artigos aprovados semelhantes) de cada artigo"""
+    __tablename__ = 'article_neighbors'
+
+    article_id = Column(Integer, ForeignKey('articles.id'), primary_key=True)
+    rank = Column(Integer, primary_key=True)  # 0 = mais semelhante
+    neighbor_id = Column(Integer, ForeignKey('articles.id'), nullable=False)
+    score = Column(Float, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Busca reversa: quem tem o artigo como vizinho (atualização incremental)
+        Index('ix_article_neighbors_neighbor', 'neighbor_id'),
+    )
+
 class User(Base):
     """Modelo para usuários do sistema"""
     __tablename__ = 'users'
@@ -108,14 +181,20 @@ class ChatHistory(Base):
     __tablename__ = 'chat_history'
     
     id = Column(Integer, primary_key=True)
+    session_id = Column(String(64))  # Sessão de chat (contexto individual)
     question = Column(Text, nullable=False)
     answer = Column(Text, nullable=False)
     relevant_articles = Column(Text)  # IDs dos artigos relevantes, separados por vírgula
     created_at = Column(DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        Index('ix_chat_history_session_created', 'session_id', 'created_at'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
+            'session_id': self.session_id,
             'question': self.question,
             'answer': self.answer,
             'relevant_articles': self.relevant_articles.split(',') if self.relevant_articles else [],
@@ -153,10 +232,24 @@ if os.path.exists('/.dockerenv') and 'localhost' in DATABASE_URL:
 engine = create_engine(DATABASE_URL, echo=False)
 SessionLocal = sessionmaker(bind=engine)
 
+def upgrade_schema():
+    """Adiciona colunas/índices novos em bancos criados por versões anteriores."""
+    inspector = inspect(engine)
+    chat_columns = [c['name'] for c in inspector.get_columns('chat_history')]
+    if 'session_id' not in chat_columns:
+        print("Migrating: adding chat_history.session_id...")
+        with engine.begin() as conn:
+            conn.execute(text('ALTER TABLE chat_history ADD COLUMN session_id VARCHAR(64)'))
+    chat_indexes = [i['name'] for i in inspector.get_indexes('chat_history')]
+    if 'ix_chat_history_session_created' not in chat_indexes:
+        with engine.begin() as conn:
+            conn.execute(text('CREATE INDEX ix_chat_history_session_created ON chat_history (session_id, created_at)'))
+
 def init_db():
     """Inicializa o banco de dados e cria as tabelas"""
     print(f"Connecting to DB: {DATABASE_URL.split('@')[1] if '@' in DATABASE_URL else 'SQLite Local'}")
     Base.metadata.create_all(engine)
+    upgrade_schema()
     print("Database initialized successfully!")
     
     # Criar categorias padrão se não existirem
@@ -0,0 +1,156 @@
+import os
+import re
+import random
+import zlib
+
+from kb_indexes import ArticleIndex
+
+# Similaridade (Jaccard estimada) a partir da qual dois artigos são quase-duplicados
+DEDUP_THRESHOLD = float(os.getenv('DEDUP_THRESHOLD', 0.8))
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def shingles(text, size=3):
+    """Conjunto de shingles (n-gramas de palavras) hasheados em 32 bits."""
+    tokens = TOKEN_RE.findall((text or '').lower())
+    if len(tokens) < size:
+        grams = [' '.join(tokens)] if tokens else []
+    else:
+        grams = (' '.join(tokens[i:i + size]) for i in range(len(tokens) - size + 1))
+    return {zlib.crc32(g.encode('utf-8')) for g in grams}
+
+
+class NearDuplicateIndex(ArticleIndex):
+    """Índice MinHash + LSH (bandas) para detectar quase-duplicados.
+
+    Cada artigo vira uma assinatura de ``num_perm`` mínimos; a assinatura é
+    dividida em ``bands`` bandas e cada banda vai para um bucket. Candidatos
+    são os artigos que compartilham algum bucket, então checar um documento
+    novo custa O(num_perm × shingles), independente do tamanho da base.
+    """
+
+    def __init__(self, num_perm=64, bands=16, threshold=DEDUP_THRESHOLD, seed=42):
+        super().__init__()
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        rng = random.Random(seed)
+        self._perms = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME)) for _ in range(num_perm)]
+        self._clear()
+
+    def _clear(self):
+        self.signatures = {}   # article_id -> tuple
+        self.titles = {}       # article_id -> título (para relatórios)
+        self.buckets = {}      # (banda, valores) -> set(article_id)
+
+    def signature(self, text):
+        hashes = shingles(text)
+        if not hashes:
+            return None
+        return tuple(
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self._perms
+        )
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            start = band * self.rows
+            yield (band, signature[start:start + self.rows])
+
+    @staticmethod
+    def similarity(sig_a, sig_b):
+        """Jaccard estimada = fração de mínimos iguais."""
+        return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+    def _add(self, article):
+        signature = self.signature(f"{article.get('title') or ''} {article.get('content') or ''}")
+        if signature is None:
+            return
+        article_id = article['id']
+        self.signatures[article_id] = signature
+        self.titles[article_id] = article.get('title')
+        for key in self._band_keys(signature):
+            self.buckets.setdefault(key, set()).add(article_id)
+
+    def _remove(self, article_id):
+        signature = self.signatures.pop(article_id, None)
+        self.titles.pop(article_id, None)
+        if signature is None:
+            return
+        for key in self._band_keys(signature):
+            bucket = self.buckets.get(key)
+            if bucket is not None:
+                bucket.discard(article_id)
+                if not bucket:
+                    del self.buckets[key]
+
+    def find(self, title, content, exclude_id=None, threshold=None):
+        """Quase-duplicados de um texto: ``[{'id', 'title', 'similarity'}]``."""
+        threshold = self.threshold if threshold is None else threshold
+        signature = self.signature(f"{title or ''} {content or ''}")
+        if signature is None:
+            return []
+        with self._lock:
+            candidates = set()
+            for key in self._band_keys(signature):
+                candidates |= self.buckets.get(key, set())
+            candidates.discard(exclude_id)
+            matches = []
+            for article_id in candidates:
+                sim = self.similarity(signature, self.signatures[article_id])
+                if sim >= threshold:
+                    matches.append({'id': article_id, 'title': self.titles.get(article_id), 'similarity': round(sim, 3)})
+        matches.sort(key=lambda m: m['similarity'], reverse=True)
+        return matches
+
+    def scan(self, threshold=None):
+        """Varre todos os buckets e agrupa quase-duplicados (union-find)."""
+        threshold = self.threshold if threshold is None else threshold
+        parent = {}
+
+        def root(x):
+            while parent.get(x, x) != x:
+                parent[x] = parent.get(parent[x], parent[x])
+                x = parent[x]
+            return x
+
+        with self._lock:
+            checked = set()
+            for bucket in self.buckets.values():
+                if len(bucket) < 2:
+                    continue
+                ids = sorted(bucket)
+                for i, a in enumerate(ids):
+                    for b in ids[i + 1:]:
+                        if (a, b) in checked:
+                            continue
+                        checked.add((a, b))
+                        if self.similarity(self.signatures[a], self.signatures[b]) >= threshold:
+                            parent.setdefault(a, a)
+                            parent.setdefault(b, b)
+                            parent[root(b)] = root(a)
+
+            groups = {}
+            for article_id in parent:
+                groups.setdefault(root(article_id), set()).add(article_id)
+            report = []
+            for members in groups.values():
+                members = sorted(members)
+                keep = members[0]
+                report.append({
+                    'keep': keep,
+                    'articles': [
+                        {
+                            'id': m,
+                            'title': self.titles.get(m),
+                            'similarity': round(self.similarity(self.signatures[keep], self.signatures[m]), 3)
+                        }
+                        for m in members
+                    ]
+                })
+        report.sort(key=lambda g: len(g['articles']), reverse=True)
+        return {'scanned': len(self.signatures), 'pairs_checked': len(checked), 'groups': report}
@@ -0,0 +1,225 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Entradas mantidas no SQLite (LRU por último uso)
+EMBEDDING_CACHE_MAX = int(os.getenv('EMBEDDING_CACHE_MAX', 50000))
+# Entradas quentes mantidas também em memória
+EMBEDDING_CACHE_MEMORY = int(os.getenv('EMBEDDING_CACHE_MEMORY', 5000))
+
+# Argumentos de ``encode`` que não mudam os vetores; qualquer outro entra na chave
+ENCODE_KWARGS_WITHOUT_EFFECT = {'batch_size', 'show_progress_bar', 'device', 'convert_to_numpy', 'convert_to_tensor', 'output_value'}
+
+
+def text_key(model_key, text, options=''):
+    """Chave = hash do texto exato entregue ao modelo (+ modelo e opções de encode)."""
+    digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    return f"{model_key}|{options}|{digest}"
+
+
+class EmbeddingCache:
+    """Memo de embeddings por hash de conteúdo: LRU em memória + SQLite persistente."""
+
+    def __init__(self, path, max_entries=EMBEDDING_CACHE_MAX, memory_entries=EMBEDDING_CACHE_MEMORY):
+        self.path = path
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._connect()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS embeddings '
+            '(key TEXT PRIMARY KEY, dtype TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)')
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, key, vector):
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get_many(self, keys):
+        """``{key: vetor}`` para as chaves encontradas (cópias: o chamador pode alterá-las)."""
+        found = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is None:
+                    missing.append(key)
+                else:
+                    self._memory.move_to_end(key)
+                    found[key] = vector.copy()
+        if missing:
+            conn = self._connect()
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT key, dtype, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for key, dtype, blob in rows:
+                    # frombuffer é somente leitura e fica compartilhado no LRU
+                    vector = np.frombuffer(blob, dtype=dtype)
+                    found[key] = vector.copy()
+                    self._remember(key, vector)
+            if found:
+                now = time.time()
+                conn.executemany('UPDATE embeddings SET last_used = ? WHERE key = ?', [(now, k) for k in found if k in missing])
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items):
+        """Grava ``[(key, vetor), ...]``."""
+        if not items:
+            return
+        now = time.time()
+        rows = []
+        for key, vector in items:
+            vector = np.array(vector)
+            self._remember(key, vector)
+            rows.append((key, vector.dtype.str, vector.tobytes(), now))
+        conn = self._connect()
+        conn.executemany('INSERT OR REPLACE INTO embeddings (key, dtype, vector, last_used) VALUES (?, ?, ?, ?)', rows)
+        self._writes += len(rows)
+        if self._writes >= 500:
+            self._writes = 0
+            self.prune()
+
+    def prune(self):
+        """Descarta as entradas menos usadas acima de ``max_entries``."""
+        conn = self._connect()
+        excess = conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0] - self.max_entries
+        if excess > 0:
+            conn.execute(
+                'DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)', (excess,)
+            )
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else None,
+            'memory_entries': len(self._memory),
+            'stored_entries': self._connect().execute('SELECT COUNT(*) FROM embeddings').fetchone()[0],
+        }
+
+
+def _model_key(model):
+    """Identifica o modelo (nome/caminho + dimensão) para não misturar embeddings de modelos diferentes."""
+    key = getattr(model, '_kb_cache_model_key', None)
+    if key:
+        return key
+    name = None
+    try:
+        name = model[0].auto_model.config._name_or_path
+    except Exception:
+        name = getattr(model, 'model_name_or_path', None) or type(model).__name__
+    try:
+        dim = model.get_sentence_embedding_dimension()
+    except Exception:
+        dim = '?'
+    key = f"{name}:{dim}"
+    try:
+        model._kb_cache_model_key = key
+    except Exception:
+        pass
+    return key
+
+
+def encode_options(kwargs):
+    """Parte da chave com os argumentos que afetam os vetores (``prompt``, ``precision``...).
+
+    Retorna None quando algum valor não é serializável de forma estável (sem cache).
+    """
+    options = []
+    for name in sorted(kwargs):
+        if name in ENCODE_KWARGS_WITHOUT_EFFECT:
+            continue
+        value = kwargs[name]
+        if value is None or value is False:
+            continue
+        if not isinstance(value, (str, int, float, bool)):
+            return None
+        options.append(f"{name}={value!r}")
+    return ','.join(options)
+
+
+def memoize_encode(encode, cache):
+    """Envolve ``SentenceTransformer.encode``: só textos inéditos chegam ao modelo.
+
+    Chamadas com saída diferente de numpy (tensores, token embeddings) passam direto.
+    """
+    def cached_encode(model, sentences, *args, **kwargs):
+        if args or kwargs.get('convert_to_tensor') or kwargs.get('output_value', 'sentence_embedding') != 'sentence_embedding' \
+                or kwargs.get('convert_to_numpy') is False:
+            return encode(model, sentences, *args, **kwargs)
+
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts or not all(isinstance(t, str) for t in texts):
+            return encode(model, sentences, *args, **kwargs)
+
+        options = encode_options(kwargs)
+        if options is None:
+            return encode(model, sentences, *args, **kwargs)
+        model_key = _model_key(model)
+        keys = [text_key(model_key, t, options) for t in texts]
+        found = cache.get_many(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            kwargs.pop('show_progress_bar', None)
+            encoded = encode(model, list(missing.values()), show_progress_bar=False, **kwargs)
+            new_items = list(zip(missing.keys(), encoded))
+            cache.put_many(new_items)
+            found.update(new_items)
+
+        vectors = [found[key] for key in keys]
+        return np.array(vectors[0]) if single else np.stack(vectors)
+
+    cached_encode._kb_embedding_cache = cache
+    return cached_encode
+
+
+def install_embedding_cache(cache):
+    """Ativa o memo em ``SentenceTransformer.encode`` (todas as instâncias do processo)."""
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        print("⚠️ sentence-transformers indisponível: cache de embeddings não instalado")
+        return False
+    if getattr(SentenceTransformer.encode, '_kb_embedding_cache', None) is not None:
+        return True
+    SentenceTransformer.encode = memoize_encode(SentenceTransformer.encode, cache)
+    print(f"🧠 Cache de embeddings ativo ({cache.path})")
+    return True
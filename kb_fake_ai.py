@@ -0,0 +1,190 @@
+"""Provedor de IA falso para benchmarks e testes de carga (KB_LLM_PROVIDER=fake).
+
+Implementa a mesma interface do AIService usada por kb_app, sem modelos nem
+rede: a "geração" dorme FAKE_LLM_LATENCY_MS (tempo até o primeiro token) mais
+o tempo de emitir a resposta a FAKE_LLM_TOKENS_PER_SEC. A recuperação é uma
+sobreposição de palavras real sobre os artigos recebidos, para o custo de CPU
+do caminho do chat continuar presente no benchmark.
+"""
+import os
+import re
+import csv
+import io
+import time
+import asyncio
+import threading
+from datetime import datetime
+
+from kb_database import get_db, SearchLog
+
+FAKE_LLM_LATENCY_MS = float(os.getenv('FAKE_LLM_LATENCY_MS', 300))
+FAKE_LLM_TOKENS_PER_SEC = float(os.getenv('FAKE_LLM_TOKENS_PER_SEC', 80))
+FAKE_LLM_ANSWER_TOKENS = int(os.getenv('FAKE_LLM_ANSWER_TOKENS', 120))
+
+WORD_RE = re.compile(r"\w{3,}", re.UNICODE)
+
+
+def generation_delay(tokens):
+    delay = FAKE_LLM_LATENCY_MS / 1000.0
+    if FAKE_LLM_TOKENS_PER_SEC > 0:
+        delay += tokens / FAKE_LLM_TOKENS_PER_SEC
+    return delay
+
+
+def simulate_generation(tokens):
+    """Dorme o tempo de uma geração de ``tokens`` tokens."""
+    delay = generation_delay(tokens)
+    if delay > 0:
+        time.sleep(delay)
+
+
+async def simulate_generation_async(tokens):
+    """Mesma espera sem ocupar thread (caminho assíncrono de kb_asgi)."""
+    delay = generation_delay(tokens)
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+
+class FakeAnalytics:
+    """Grava buscas no banco como o analytics real (o custo de escrita entra no benchmark)."""
+
+    def log_search(self, term, source='chat', results_count=0):
+        db = get_db()
+        try:
+            db.add(SearchLog(term=term, source=source, results_count=results_count))
+            db.commit()
+        except Exception:
+            db.rollback()
+        finally:
+            db.close()
+
+    def get_all_stats(self):
+        return {'provider': 'fake'}
+
+    def export_to_csv(self):
+        output = io.StringIO()
+        csv.writer(output).writerow(['term', 'source', 'results_count', 'created_at'])
+        return output.getvalue()
+
+    def get_powerbi_data(self):
+        return {'provider': 'fake', 'rows': []}
+
+
+class FakeGenerator:
+    def __init__(self):
+        self.calls = 0
+        self.tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, tokens):
+        with self._lock:
+            self.calls += 1
+            self.tokens += tokens
+
+    def get_usage_stats(self):
+        return {'fake': {'calls': self.calls, 'tokens': self.tokens}}
+
+
+class FakeAIService:
+    """Substituto do AIService com latência e vazão de tokens configuráveis."""
+
+    def __init__(self):
+        self.analytics = FakeAnalytics()
+        self.generator = FakeGenerator()
+        self.learned_words = set()
+        print(f"🧪 Provedor de IA falso: {FAKE_LLM_LATENCY_MS:.0f}ms + {FAKE_LLM_TOKENS_PER_SEC:.0f} tokens/s")
+
+    def get_active_model_name(self):
+        return 'Fake (Benchmark)'
+
+    # ---------- embeddings ----------
+
+    def update_article_embedding(self, article):
+        pass
+
+    def sync_embeddings(self, articles):
+        pass
+
+    # ---------- palavras aprendidas ----------
+
+    def get_learned_words(self):
+        return sorted(self.learned_words)
+
+    def add_learned_word(self, word):
+        self.learned_words.add(word.lower())
+        return True
+
+    def delete_learned_word(self, word):
+        self.learned_words.discard(word.lower())
+        return True
+
+    # ---------- geração ----------
+
+    @staticmethod
+    def _retrieve(question, articles, k=3):
+        terms = set(WORD_RE.findall(question.lower()))
+        scored = []
+        for article in articles:
+            words = set(WORD_RE.findall(f"{article.get('title', '')} {article.get('content', '')}".lower()))
+            overlap = len(terms & words)
+            if overlap:
+                scored.append((overlap, article))
+        scored.sort(key=lambda s: s[0], reverse=True)
+        return [article for _, article in scored[:k]]
+
+    def chat(self, question, articles, history=None, preferred_model=None):
+        sources = self._retrieve(question, articles)
+        self.analytics.log_search(question, source='chat', results_count=len(sources))
+        simulate_generation(FAKE_LLM_ANSWER_TOKENS)
+        return self._chat_result(sources)
+
+    async def achat(self, question, articles, history=None, preferred_model=None):
+        sources = self._retrieve(question, articles)
+        await asyncio.to_thread(self.analytics.log_search, question, 'chat', len(sources))
+        await simulate_generation_async(FAKE_LLM_ANSWER_TOKENS)
+        return self._chat_result(sources)
+
+    def _chat_result(self, sources):
+        self.generator.record(FAKE_LLM_ANSWER_TOKENS)
+        if sources:
+            answer = f"Segundo a base, {sources[0].get('content', '')[:400]}"
+        else:
+            answer = 'Não encontrei essa informação na base de conhecimento.'
+        return {
+            'answer': answer,
+            'sources': [{'id': a.get('id'), 'title': a.get('title')} for a in sources],
+            'typo_count': 0,
+            'model_used': self.get_active_model_name(),
+        }
+
+    def suggest_tags(self, title, content, existing_tags=None):
+        simulate_generation(10)
+        return self._tags(title, content, existing_tags)
+
+    async def asuggest_tags(self, title, content, existing_tags=None):
+        await simulate_generation_async(10)
+        return self._tags(title, content, existing_tags)
+
+    def _tags(self, title, content, existing_tags):
+        self.generator.record(10)
+        existing = {t.lower() for t in (existing_tags or [])}
+        words = [w for w in WORD_RE.findall(f"{title} {content}".lower()) if len(w) > 4 and w not in existing]
+        return list(dict.fromkeys(words))[:5]
+
+    def classify_content(self, text, title=None, tags=None, existing_categories=None):
+        simulate_generation(20)
+        return self._classification(existing_categories)
+
+    async def aclassify_content(self, text, title=None, tags=None, existing_categories=None):
+        await simulate_generation_async(20)
+        return self._classification(existing_categories)
+
+    def _classification(self, existing_categories):
+        self.generator.record(20)
+        category = (existing_categories or ['Geral'])[0]
+        return {'category': category, 'confidence': 0.5}
+
+    def generate_analytics_insights(self, summary=None):
+        simulate_generation(200)
+        self.generator.record(200)
+        return f"Insights simulados em {datetime.utcnow().isoformat()}."
@@ -0,0 +1,120 @@
+import os
+import json
+import glob
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Tamanho máximo do log ativo antes de rotacionar (padrão 10 MB)
+FEEDBACK_MAX_BYTES = int(os.getenv('FEEDBACK_MAX_BYTES', 10 * 1024 * 1024))
+# Quantos arquivos rotacionados manter (training_data.jsonl.1 ... .N)
+FEEDBACK_BACKUP_COUNT = int(os.getenv('FEEDBACK_BACKUP_COUNT', 5))
+
+
+class FeedbackStore:
+    """Log append-only (JSONL) para feedback de classificação híbrida.
+
+    Cada feedback é uma linha JSON. A escrita é O(1): abre em modo append,
+    trava o arquivo de lock, grava a linha e libera. Quando o arquivo ativo
+    passa de ``max_bytes`` ele é rotacionado (``.1``, ``.2``...).
+    """
+
+    def __init__(self, path, max_bytes=FEEDBACK_MAX_BYTES, backup_count=FEEDBACK_BACKUP_COUNT, legacy_path=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.legacy_path = legacy_path
+        self.lock_path = path + '.lock'
+        self._thread_lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self):
+        """Lock entre threads (mesmo processo) e entre processos (arquivo .lock)."""
+        with self._thread_lock:
+            with open(self.lock_path, 'a+b') as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                try:
+                    yield
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                    else:
+                        lock_file.seek(0)
+                        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def append(self, entry):
+        """Acrescenta um feedback ao log (tempo constante)."""
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        data = line.encode('utf-8')
+        with self._locked():
+            try:
+                size = os.path.getsize(self.path)
+            except OSError:
+                size = 0
+            if size and size + len(data) > self.max_bytes:
+                self._rotate()
+            # Um único write() em modo append mantém a linha inteira
+            with open(self.path, 'ab') as f:
+                f.write(data)
+
+    def _rotate(self):
+        """Rotaciona o log ativo: .jsonl -> .jsonl.1 -> .jsonl.2 ..."""
+        oldest = f"{self.path}.{self.backup_count}"
+        if os.path.exists(oldest):
+            os.remove(oldest)
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def _files_oldest_first(self):
+        """Lista os arquivos do log na ordem cronológica."""
+        rotated = []
+        for name in glob.glob(glob.escape(self.path) + '.*'):
+            suffix = name[len(self.path) + 1:]
+            if suffix.isdigit():
+                rotated.append((int(suffix), name))
+        files = [name for _, name in sorted(rotated, reverse=True)]
+        if os.path.exists(self.path):
+            files.append(self.path)
+        return files
+
+    def iter_entries(self):
+        """Lê todos os feedbacks em streaming (legado JSON + rotacionados + ativo)."""
+        if self.legacy_path and os.path.exists(self.legacy_path) and os.path.getsize(self.legacy_path) > 0:
+            try:
+                with open(self.legacy_path, 'r', encoding='utf-8') as f:
+                    for entry in json.load(f):
+                        yield entry
+            except Exception as e:
+                print(f"⚠️ Erro ao ler feedback legado ({self.legacy_path}): {e}")
+
+        for name in self._files_oldest_first():
+            with open(name, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        # Linha truncada (ex: queda no meio da escrita) - ignora
+                        continue
+
+    def iter_jsonl(self):
+        """Gera as linhas JSONL para exportação (ex: Response em streaming)."""
+        for entry in self.iter_entries():
+            yield json.dumps(entry, ensure_ascii=False) + '\n'
@@ -0,0 +1,515 @@
+import os
+import re
+import json
+import math
+import time
+import zlib
+import hashlib
+
+from kb_indexes import ArticleIndex
+
+# Arestas de similaridade por artigo (vizinhos TF-IDF) e similaridade mínima
+GRAPH_SIMILAR_K = int(os.getenv('GRAPH_SIMILAR_K', 3))
+GRAPH_MIN_SIMILARITY = float(os.getenv('GRAPH_MIN_SIMILARITY', 0.2))
+# Acima disso, /api/graph responde com um nó por categoria (clusters) em vez do grafo completo
+GRAPH_MAX_NODES = int(os.getenv('GRAPH_MAX_NODES', 1500))
+# Iterações de relaxamento (força) por cluster no layout completo
+GRAPH_LAYOUT_ITERATIONS = int(os.getenv('GRAPH_LAYOUT_ITERATIONS', 60))
+# Intervalo mínimo (s) entre gravações do layout após mudanças incrementais
+GRAPH_LAYOUT_SAVE_INTERVAL = float(os.getenv('GRAPH_LAYOUT_SAVE_INTERVAL', 30))
+
+GOLDEN_ANGLE = math.pi * (3 - math.sqrt(5))
+# Espaçamento (px) entre artigos dentro de um cluster e folga entre clusters
+NODE_SPACING = 60.0
+CLUSTER_GAP = 250.0
+
+CONCEPT_TAGS_RE = re.compile(r"conceito|definição|significado|glosário", re.IGNORECASE)
+CONCEPT_CATEGORY_RE = re.compile(r"aprendizado|conceitos|glossário", re.IGNORECASE)
+
+
+def category_node_id(name):
+    return f"cat_{name}"
+
+
+def tag_node_id(name):
+    return f"tag_{name}"
+
+
+def _jitter(key, scale):
+    """Deslocamento determinístico (mesmo nó, mesma posição entre processos)."""
+    h = zlib.crc32(str(key).encode('utf-8'))
+    angle = (h % 3600) / 3600.0 * 2 * math.pi
+    radius = scale * (0.3 + ((h >> 12) % 700) / 1000.0)
+    return radius * math.cos(angle), radius * math.sin(angle)
+
+
+def _repulsion(pos, rows, ideal):
+    """Força de repulsão k²/d sobre os nós ``rows`` (vetor unitário × k²/d = delta × k²/d²).
+
+    Variante em grade do Fruchterman-Reingold: só contam os vizinhos das
+    células adjacentes (distância até ~2k), em O(nós × vizinhos) em vez de
+    O(nós²). Sem a soma de longo alcance os nós também não se acumulam na
+    borda do disco do cluster.
+    """
+    import numpy as np
+
+    k2 = ideal * ideal
+    cells = np.floor(pos / (2 * ideal)).astype(np.int64)
+    cells -= cells.min(axis=0)
+    stride = int(cells[:, 1].max()) + 3
+    keys = (cells[:, 0] + 1) * stride + cells[:, 1] + 1
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    force = np.zeros((len(rows), 2))
+    for ox in (-1, 0, 1):
+        for oy in (-1, 0, 1):
+            target = keys[rows] + ox * stride + oy
+            start = np.searchsorted(sorted_keys, target, side='left')
+            counts = np.searchsorted(sorted_keys, target, side='right') - start
+            total = int(counts.sum())
+            if not total:
+                continue
+            # Expande cada faixa [start, start + count) em pares (nó móvel, vizinho)
+            owner = np.repeat(np.arange(len(rows)), counts)
+            other = order[np.repeat(start - (np.cumsum(counts) - counts), counts) + np.arange(total)]
+            d = pos[rows[owner]] - pos[other]
+            scale = k2 / ((d * d).sum(axis=1) + 1e-6)
+            force[:, 0] += np.bincount(owner, d[:, 0] * scale, minlength=len(rows))
+            force[:, 1] += np.bincount(owner, d[:, 1] * scale, minlength=len(rows))
+    return force
+
+
+def extract_definition(content):
+    """Primeiro parágrafo de texto (não título) do artigo, resumido."""
+    for part in re.split(r"\n\s*\n", content or ''):
+        part = part.strip()
+        if not part.startswith('#') and len(part) > 20:
+            return part[:100] + '...' if len(part) > 100 else part
+    return None
+
+
+class KnowledgeGraph(ArticleIndex):
+    """Grafo de conhecimento (categorias, artigos aprovados, tags e similaridade) com layout em cache.
+
+    As arestas de similaridade vêm dos vizinhos TF-IDF de ``vector_index``. O
+    layout é calculado no servidor: categorias como clusters em espiral, artigos
+    relaxados por força dentro do cluster, tags no centróide dos seus artigos.
+    Posições existentes são preservadas entre reconstruções (e em disco), então
+    novos artigos só posicionam a si mesmos perto do hub e dos vizinhos.
+    """
+
+    def __init__(self, vector_index, layout_path=None):
+        super().__init__()
+        self.vector_index = vector_index
+        self.layout_path = layout_path
+        self.positions = {}        # node_id -> (x, y), preservado entre reconstruções
+        self.pinned = set()        # nós arrastados manualmente (não são relaxados)
+        self.version = 0
+        self._fingerprint = (None, None)   # (version, hash do conteúdo)
+        self._layout_loaded = False
+        self._saved_at = 0.0
+        self._clear()
+
+    def _clear(self):
+        self.articles = {}         # article_id -> {'title', 'category', 'tags', 'concept', 'hybrid', 'definition'}
+        self.similar = {}          # article_id -> {vizinho: similaridade}
+        self.categories = {}       # nome -> set(article_id)
+        self.tags = {}             # nome -> set(article_id)
+        # Carga completa em andamento (ensure_built também reconstrói um índice já construído)
+        self._loading = True
+        # Último artigo removido: numa edição (remove + add) mantém a posição se a categoria não mudou
+        self._removed = None
+
+    def _prepare_shadow(self, shadow):
+        # Posições sobrevivem ao _clear: a reconstrução em background trabalha numa cópia
+        shadow.positions = dict(self.positions)
+        shadow.pinned = set(self.pinned)
+
+    # ---------- manutenção incremental ----------
+
+    def _add(self, article):
+        if article.get('status') != 'approved':
+            return
+        article_id = article['id']
+        category = article.get('category_name') or 'Geral'
+        tags = [t.strip() for t in (article.get('tags') or []) if t and t.strip()]
+        tag_text = ' '.join(tags)
+        concept = bool(CONCEPT_TAGS_RE.search(tag_text) or CONCEPT_CATEGORY_RE.search(category))
+        self.articles[article_id] = {
+            'title': article.get('title'),
+            'category': category,
+            'tags': tags,
+            'concept': concept,
+            'hybrid': 'hybrid_auto' in tag_text,
+            'definition': extract_definition(article.get('content')) if concept else None,
+        }
+        self.categories.setdefault(category, set()).add(article_id)
+        for tag in tags:
+            self.tags.setdefault(tag, set()).add(article_id)
+        if self.built and not self._loading:
+            self._link_similar(article_id)
+            removed, self._removed = self._removed, None
+            if removed and removed[0] == article_id and removed[1] == category and removed[2]:
+                self.positions[article_id] = removed[2]
+                for tag in tags:
+                    self._place_tag(tag)
+            else:
+                self._place_new(article_id)
+            self._changed()
+
+    def _remove(self, article_id):
+        info = self.articles.pop(article_id, None)
+        if info is None:
+            return
+        self._discard(self.categories, info['category'], article_id)
+        for tag in info['tags']:
+            self._discard(self.tags, tag, article_id)
+        for neighbor in self.similar.pop(article_id, {}):
+            self.similar.get(neighbor, {}).pop(article_id, None)
+        self._removed = (article_id, info['category'], self.positions.pop(article_id, None))
+        self.pinned.discard(article_id)
+        if self.built and not self._loading:
+            self._changed()
+
+    @staticmethod
+    def _discard(groups, key, article_id):
+        members = groups.get(key)
+        if members is not None:
+            members.discard(article_id)
+            if not members:
+                del groups[key]
+
+    def _link_similar(self, article_id):
+        """Top-k vizinhos do artigo; arestas não-direcionadas (entra na lista do vizinho também)."""
+        vector = self.vector_index.vectors.get(article_id)
+        links = self.similar.setdefault(article_id, {})
+        if not vector:
+            return
+        for neighbor, score in self.vector_index.nearest(vector, k=GRAPH_SIMILAR_K, exclude=article_id, status='approved'):
+            if score < GRAPH_MIN_SIMILARITY or neighbor not in self.articles:
+                continue
+            links[neighbor] = score
+            self.similar.setdefault(neighbor, {})[article_id] = score
+
+    def _finish_build(self):
+        started = time.time()
+        self._load_layout()
+        for article_id in self.articles:
+            self._link_similar(article_id)
+        self.layout()
+        self._loading = False
+        self.version += 1
+        self.save_layout()
+        print(f"🕸️ Grafo: {len(self.articles)} artigos, {self.edge_count()} arestas de similaridade, "
+              f"layout em {time.time() - started:.2f}s")
+
+    def _changed(self):
+        self.version += 1
+        if time.time() - self._saved_at >= GRAPH_LAYOUT_SAVE_INTERVAL:
+            self.save_layout()
+
+    def edge_count(self):
+        return sum(len(links) for links in self.similar.values()) // 2
+
+    # ---------- layout ----------
+
+    def _cluster_radius(self, category):
+        return NODE_SPACING * math.sqrt(max(1, len(self.categories.get(category, ()))))
+
+    def _place_hubs(self):
+        """Hubs sem posição em espiral, do maior cluster para o menor, sem sobreposição."""
+        placed = [(self.positions[category_node_id(c)], self._cluster_radius(c))
+                  for c in self.categories if category_node_id(c) in self.positions]
+        pending = sorted((c for c in self.categories if category_node_id(c) not in self.positions),
+                         key=lambda c: len(self.categories[c]), reverse=True)
+        for i, category in enumerate(pending):
+            radius = self._cluster_radius(category)
+            angle = (len(placed) + i) * GOLDEN_ANGLE
+            distance = 0.0
+            while True:
+                x, y = distance * math.cos(angle), distance * math.sin(angle)
+                if all(math.hypot(x - px, y - py) >= radius + pr + CLUSTER_GAP for (px, py), pr in placed):
+                    break
+                distance += NODE_SPACING
+            self.positions[category_node_id(category)] = (round(x, 1), round(y, 1))
+            placed.append(((x, y), radius))
+
+    def layout(self, iterations=GRAPH_LAYOUT_ITERATIONS):
+        """Posiciona os nós sem posição; clusters com nós novos são relaxados por força."""
+        with self._lock:
+            self._place_hubs()
+            for category, members in self.categories.items():
+                new = [a for a in members if a not in self.positions]
+                if not new:
+                    continue
+                hub = self.positions[category_node_id(category)]
+                radius = self._cluster_radius(category)
+                # Semente: sunflower no disco do cluster (determinística pela ordem dos ids)
+                for k, article_id in enumerate(sorted(new)):
+                    r = radius * math.sqrt((k + 0.5) / len(new))
+                    self.positions[article_id] = (hub[0] + r * math.cos(k * GOLDEN_ANGLE),
+                                                  hub[1] + r * math.sin(k * GOLDEN_ANGLE))
+                self._relax(sorted(members), hub, radius, iterations, movable=set(new))
+            self._place_tags()
+            self._prune_positions()
+
+    def _relax(self, members, hub, radius, iterations, movable):
+        """Fruchterman-Reingold dentro do cluster (numpy): molas nas arestas, repulsão entre nós próximos.
+
+        Só as forças sobre os nós móveis são calculadas: posicionar um artigo
+        novo custa O(cluster) por iteração, não O(cluster²).
+        """
+        import numpy as np
+
+        movable = [a for a in members if a in movable and a not in self.pinned]
+        if not movable or iterations <= 0:
+            return
+        index = {a: i for i, a in enumerate(members)}
+        pos = np.array([self.positions[a] for a in members], dtype=np.float64)
+        center = np.array(hub, dtype=np.float64)
+        rows = np.array([index[a] for a in movable], dtype=np.int64)
+        is_movable = np.zeros(len(members), dtype=bool)
+        is_movable[rows] = True
+        # Só as arestas que tocam um nó móvel puxam alguém
+        edges = np.array([(index[a], index[b]) for a in members for b in self.similar.get(a, {})
+                          if b in index and index[a] < index[b] and (is_movable[index[a]] or is_movable[index[b]])],
+                         dtype=np.int64).reshape(-1, 2)
+        ideal = NODE_SPACING
+        temperature = radius / 4
+        for _ in range(iterations):
+            force = _repulsion(pos, rows, ideal)
+            if len(edges):
+                d = pos[edges[:, 0]] - pos[edges[:, 1]]
+                length = np.sqrt((d * d).sum(axis=1)) + 1e-6
+                pull = d * (length / ideal)[:, None]
+                for axis in (0, 1):
+                    total = np.bincount(edges[:, 1], pull[:, axis], minlength=len(pos)) \
+                        - np.bincount(edges[:, 0], pull[:, axis], minlength=len(pos))
+                    force[:, axis] += total[rows]
+            # Gravidade para o hub mantém o cluster compacto
+            force += (center - pos[rows]) * (ideal / radius)
+            norm = np.sqrt((force * force).sum(axis=1))[:, None] + 1e-6
+            moved = pos[rows] + force / norm * np.minimum(norm, temperature)
+            # Mantém os nós dentro do disco do cluster
+            offset = moved - center
+            distance = np.sqrt((offset * offset).sum(axis=1))[:, None] + 1e-6
+            pos[rows] = np.where(distance > radius, center + offset / distance * radius, moved)
+            temperature *= 0.95
+        for a in movable:
+            self.positions[a] = (round(float(pos[index[a], 0]), 1), round(float(pos[index[a], 1]), 1))
+
+    def _place_new(self, article_id):
+        """Artigo novo/alterado: perto dos vizinhos do mesmo cluster (ou do hub) e relaxa só ele."""
+        category = self.articles[article_id]['category']
+        hub_id = category_node_id(category)
+        if hub_id not in self.positions:
+            self._place_hubs()
+        hub = self.positions[hub_id]
+        radius = self._cluster_radius(category)
+        anchors = [self.positions[n] for n in self.similar.get(article_id, {})
+                   if n in self.positions and self.articles.get(n, {}).get('category') == category]
+        if anchors:
+            base = (sum(p[0] for p in anchors) / len(anchors), sum(p[1] for p in anchors) / len(anchors))
+        else:
+            base = hub
+        dx, dy = _jitter(article_id, NODE_SPACING if anchors else radius)
+        self.positions[article_id] = (base[0] + dx, base[1] + dy)
+        self._relax(sorted(self.categories[category]), hub, radius, iterations=15, movable={article_id})
+        for tag in self.articles[article_id]['tags']:
+            self._place_tag(tag)
+
+    def _place_tag(self, tag):
+        points = [self.positions[a] for a in self.tags.get(tag, ()) if a in self.positions]
+        if not points or tag_node_id(tag) in self.pinned:
+            return
+        dx, dy = _jitter(tag, NODE_SPACING)
+        self.positions[tag_node_id(tag)] = (round(sum(p[0] for p in points) / len(points) + dx, 1),
+                                            round(sum(p[1] for p in points) / len(points) + dy, 1))
+
+    def _place_tags(self):
+        for tag in self.tags:
+            self._place_tag(tag)
+
+    def _prune_positions(self):
+        valid = set(self.articles) | {category_node_id(c) for c in self.categories} | {tag_node_id(t) for t in self.tags}
+        for node_id in [n for n in self.positions if n not in valid]:
+            del self.positions[node_id]
+            self.pinned.discard(node_id)
+
+    def relayout(self):
+        """Descarta todas as posições (inclusive fixadas) e recalcula do zero."""
+        with self._lock:
+            self._journal(KnowledgeGraph._relayout)
+
+    def _relayout(self):
+        self.positions.clear()
+        self.pinned.clear()
+        self.layout()
+        self.version += 1
+        self.save_layout()
+
+    def pin(self, positions):
+        """Posições definidas manualmente (arrastar na interface); retorna quantas foram aplicadas."""
+        with self._lock:
+            return self._journal(lambda index: index._pin(positions))
+
+    def _pin(self, positions):
+        applied = 0
+        for node_id, point in positions.items():
+            node_id = int(node_id) if str(node_id).isdigit() else node_id
+            if node_id not in self.positions:
+                continue
+            self.positions[node_id] = (round(float(point['x']), 1), round(float(point['y']), 1))
+            self.pinned.add(node_id)
+            applied += 1
+        if applied:
+            self.version += 1
+            self.save_layout()
+        return applied
+
+    # ---------- persistência ----------
+
+    def _load_layout(self):
+        if self._layout_loaded or not self.layout_path:
+            return
+        self._layout_loaded = True
+        try:
+            with open(self.layout_path, encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Layout do grafo ignorado ({self.layout_path}): {e}")
+            return
+        for node_id, point in data.get('positions', {}).items():
+            key = int(node_id) if node_id.isdigit() else node_id
+            self.positions.setdefault(key, tuple(point))
+        self.pinned.update(int(n) if str(n).isdigit() else n for n in data.get('pinned', []))
+
+    def save_layout(self):
+        self._saved_at = time.time()
+        if not self.layout_path:
+            return
+        tmp = f"{self.layout_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'positions': {str(k): v for k, v in self.positions.items()},
+                           'pinned': [str(n) for n in self.pinned]}, f)
+            os.replace(tmp, self.layout_path)
+        except OSError as e:
+            print(f"⚠️ Erro ao salvar layout do grafo: {e}")
+
+    # ---------- consulta ----------
+
+    def fingerprint(self):
+        """Hash do conteúdo servido (nós, posições, arestas), recalculado só quando ``version`` muda.
+
+        ``version`` é um contador do processo; com vários workers o hash é o que
+        identifica o mesmo grafo (ETag), sem confundir estados diferentes.
+        """
+        with self._lock:
+            version, digest = self._fingerprint
+            if version != self.version:
+                payload = json.dumps({
+                    'positions': {str(k): v for k, v in self.positions.items()},
+                    'articles': self.articles,
+                    'similar': {a: {n: round(score, 3) for n, score in links.items()} for a, links in self.similar.items()},
+                    'pinned': sorted(map(str, self.pinned)),
+                }, sort_keys=True, default=sorted)
+                digest = hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+                self._fingerprint = (self.version, digest)
+            return digest
+
+    def node_count(self):
+        return len(self.articles) + len(self.categories) + len(self.tags)
+
+    def _category_node(self, category):
+        x, y = self.positions.get(category_node_id(category), (0.0, 0.0))
+        return {'id': category_node_id(category), 'type': 'category', 'label': category,
+                'x': x, 'y': y, 'count': len(self.categories.get(category, ()))}
+
+    def _cluster_node(self, category):
+        node = self._category_node(category)
+        node['type'] = 'cluster'
+        return node
+
+    def _article_node(self, article_id):
+        info = self.articles[article_id]
+        x, y = self.positions.get(article_id, (0.0, 0.0))
+        node = {'id': article_id, 'type': 'article', 'label': info['title'], 'category': info['category'],
+                'x': x, 'y': y, 'concept': info['concept'], 'hybrid': info['hybrid']}
+        if info['definition']:
+            node['definition'] = info['definition']
+        return node
+
+    def _tag_node(self, tag):
+        x, y = self.positions.get(tag_node_id(tag), (0.0, 0.0))
+        return {'id': tag_node_id(tag), 'type': 'tag', 'label': tag, 'x': x, 'y': y,
+                'count': len(self.tags.get(tag, ()))}
+
+    def _cluster_edges(self, categories):
+        """Arestas entre clusters: número de pares de artigos semelhantes entre as categorias."""
+        weights = {}
+        for article_id, links in self.similar.items():
+            a = self.articles[article_id]['category']
+            for neighbor in links:
+                b = self.articles[neighbor]['category']
+                if a < b and a in categories and b in categories:
+                    weights[(a, b)] = weights.get((a, b), 0) + 1
+        return [{'from': category_node_id(a), 'to': category_node_id(b), 'type': 'similar', 'weight': w}
+                for (a, b), w in weights.items()]
+
+    def snapshot(self, level='auto', category=None, max_nodes=GRAPH_MAX_NODES):
+        """Grafo para a interface.
+
+        - ``full``: todos os nós e arestas.
+        - ``clusters``: um nó por categoria, arestas agregadas entre categorias.
+        - ``category``: uma categoria completa (artigos, tags) e as demais como clusters.
+        - ``auto``: ``full`` até ``max_nodes`` nós, senão ``clusters``.
+        """
+        with self._lock:
+            if category is not None and category not in self.categories:
+                return None
+            if category is not None:
+                level = 'category'
+            elif level == 'auto':
+                level = 'full' if self.node_count() <= max_nodes else 'clusters'
+
+            if level == 'full':
+                expanded = set(self.categories)
+            elif level == 'category':
+                expanded = {category}
+            else:
+                expanded = set()
+            nodes = [self._category_node(c) if c in expanded else self._cluster_node(c) for c in sorted(self.categories)]
+            edges = self._cluster_edges(set(self.categories) - expanded) if level != 'full' else []
+
+            members = [a for c in expanded for a in self.categories[c]]
+            member_set = set(members)
+            tags = set()
+            for article_id in members:
+                info = self.articles[article_id]
+                nodes.append(self._article_node(article_id))
+                edges.append({'from': article_id, 'to': category_node_id(info['category']), 'type': 'category'})
+                for tag in info['tags']:
+                    tags.add(tag)
+                    edges.append({'from': article_id, 'to': tag_node_id(tag), 'type': 'tag'})
+                for neighbor, score in self.similar.get(article_id, {}).items():
+                    if neighbor in member_set:
+                        if article_id < neighbor:
+                            edges.append({'from': article_id, 'to': neighbor, 'type': 'similar', 'weight': round(score, 3)})
+                    else:
+                        # Vizinho num cluster recolhido: aresta até o cluster
+                        edges.append({'from': article_id, 'to': category_node_id(self.articles[neighbor]['category']),
+                                      'type': 'similar', 'weight': round(score, 3)})
+            nodes.extend(self._tag_node(tag) for tag in sorted(tags))
+            return {
+                'version': self.version,
+                'level': level,
+                'category': category,
+                'nodes': nodes,
+                'edges': edges,
+                'stats': {'articles': len(self.articles), 'categories': len(self.categories),
+                          'tags': len(self.tags), 'similar_edges': self.edge_count(),
+                          'total_nodes': self.node_count()},
+            }
@@ -0,0 +1,183 @@
+import os
+import time
+import threading
+
+# Idade máxima (s) de um índice antes de ser reconstruído do banco.
+# Limita a defasagem entre workers, já que as atualizações incrementais são locais ao processo.
+INDEX_MAX_AGE = int(os.getenv('INDEX_MAX_AGE', 600))
+
+
+class ArticleIndex:
+    """Base para índices em memória derivados dos artigos.
+
+    O índice é construído sob demanda (``ensure_built``) e depois mantido
+    incrementalmente pelas rotas de escrita via ``notify_article_saved`` /
+    ``notify_article_deleted`` / ``notify_articles_reset``.
+    Subclasses implementam ``_clear``, ``_add`` e ``_remove``.
+
+    Depois de INDEX_MAX_AGE a reconstrução roda numa thread, sobre uma cópia
+    (``_shadow``): as consultas continuam no índice antigo e as escritas feitas
+    nesse meio tempo são registradas (``_journal``) e reaplicadas na cópia antes
+    da troca. Só a primeira construção (ou depois de ``reset``) é síncrona.
+    """
+
+    def __init__(self):
+        self.built_at = None
+        self._lock = threading.RLock()
+        self._rebuilding = None   # escritas durante a reconstrução em background
+        self._generation = 0      # muda no reset: descarta reconstruções em andamento
+
+    @property
+    def built(self):
+        return self.built_at is not None
+
+    def _expired(self):
+        return bool(INDEX_MAX_AGE) and time.time() - self.built_at >= INDEX_MAX_AGE
+
+    def ensure_built(self, load_articles):
+        """Constrói o índice se ainda não existe; se expirou, reconstrói em background."""
+        if self.built and not self._expired():
+            return
+        with self._lock:
+            if not self.built:
+                self._build(load_articles)
+                return
+            if not self._expired() or self._rebuilding is not None:
+                return
+            shadow = self._shadow()
+            self._rebuilding = []
+            generation = self._generation
+        threading.Thread(target=self._rebuild, args=(shadow, load_articles, generation),
+                         name=f'rebuild-{type(self).__name__}', daemon=True).start()
+
+    def _build(self, load_articles):
+        started = time.time()
+        articles = load_articles()
+        self._clear()
+        for article in articles:
+            self._add(article)
+        self._finish_build()
+        self.built_at = time.time()
+        print(f"🗂️ Índice {type(self).__name__} construído: {len(articles)} artigos em {self.built_at - started:.2f}s")
+
+    def _shadow(self):
+        """Cópia para reconstruir sem tocar no índice servido (chamada com o lock)."""
+        shadow = object.__new__(type(self))
+        shadow.__dict__.update(self.__dict__)
+        shadow._lock = threading.RLock()
+        shadow._rebuilding = None
+        self._prepare_shadow(shadow)
+        return shadow
+
+    def _prepare_shadow(self, shadow):
+        """Gancho: copia para ``shadow`` o estado mutável que sobrevive ao ``_clear``."""
+        pass
+
+    def _rebuild(self, shadow, load_articles, generation):
+        try:
+            shadow._build(load_articles)
+        except Exception as e:
+            print(f"⚠️ Erro ao reconstruir índice {type(self).__name__} (mantendo o atual): {e}")
+            with self._lock:
+                if generation == self._generation:
+                    self._rebuilding = None
+                    self.built_at = time.time()
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            for op in self._rebuilding:
+                op(shadow)
+            state = {k: v for k, v in shadow.__dict__.items() if k not in ('_lock', '_rebuilding', '_generation')}
+            self.__dict__.update(state)
+            self._rebuilding = None
+
+    def _journal(self, op):
+        """Aplica ``op(índice)`` agora e, com reconstrução em andamento, também na cópia."""
+        result = op(self)
+        if self._rebuilding is not None:
+            self._rebuilding.append(op)
+        return result
+
+    def upsert_article(self, article):
+        if not self.built:
+            return
+        def op(index):
+            index._remove(article['id'])
+            index._add(article)
+
+        with self._lock:
+            self._journal(op)
+
+    def remove_article(self, article_id):
+        if not self.built:
+            return
+        with self._lock:
+            self._journal(lambda index: index._remove(article_id))
+
+    def reset(self):
+        """Descarta o índice; será reconstruído no próximo uso."""
+        with self._lock:
+            self.built_at = None
+            self._rebuilding = None
+            self._generation += 1
+            self._clear()
+
+    def _clear(self):
+        raise NotImplementedError
+
+    def _add(self, article):
+        raise NotImplementedError
+
+    def _remove(self, article_id):
+        raise NotImplementedError
+
+    def _finish_build(self):
+        """Gancho opcional executado ao fim da construção completa."""
+        pass
+
+
+_registry = []
+
+
+def register_index(index):
+    """Registra um índice para receber as notificações de escrita de artigos."""
+    _registry.append(index)
+    return index
+
+
+def notify_article_saved(article):
+    """Artigo criado/atualizado (``article`` = ``Article.to_dict()``)."""
+    for index in _registry:
+        try:
+            index.upsert_article(article)
+        except Exception as e:
+            print(f"⚠️ Erro ao atualizar índice {type(index).__name__}: {e}")
+
+
+def notify_article_deleted(article_id):
+    for index in _registry:
+        try:
+            index.remove_article(article_id)
+        except Exception as e:
+            print(f"⚠️ Erro ao atualizar índice {type(index).__name__}: {e}")
+
+
+def notify_articles_reset():
+    """Mudança em massa (delete-all, rejeitar pendentes...): reconstruir tudo no próximo uso."""
+    for index in _registry:
+        index.reset()
+
+
+def build_all_indexes(load_articles):
+    """Constrói todos os índices registrados com uma única carga de artigos (warm-up)."""
+    articles = None
+
+    def cached_loader():
+        nonlocal articles
+        if articles is None:
+            articles = load_articles()
+        return articles
+
+    for index in _registry:
+        index.ensure_built(cached_loader)
@@ -0,0 +1,184 @@
+import os
+import time
+import inspect
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, case
+
+from kb_database import SearchLog, InteractionLog, Article
+
+# Tempo (s) em que os insights de uma janela são servidos sem reavaliar os dados
+INSIGHTS_TTL = int(os.getenv('INSIGHTS_TTL', 900))
+# Variação relativa dos volumes que justifica uma nova chamada ao LLM
+INSIGHTS_CHANGE_THRESHOLD = float(os.getenv('INSIGHTS_CHANGE_THRESHOLD', 0.15))
+# Janelas (dias) com cache próprio; 0 = todo o período. Outros valores caem na próxima maior
+INSIGHTS_WINDOWS = sorted({int(d) for d in os.getenv('INSIGHTS_WINDOWS', '0,1,7,30,90,365').split(',') if d.strip()} | {0})
+
+
+def normalize_window(days, windows=INSIGHTS_WINDOWS):
+    """Menor janela suportada que cobre ``days`` (0 = todo o período), limitando as chaves do cache."""
+    if not days or days <= 0:
+        return 0
+    return next((w for w in windows if w >= days), 0)
+
+
+def build_analytics_summary(db, days=None, top=10):
+    """Resumo compacto (rollups) de buscas e interações para a janela informada."""
+    since = datetime.utcnow() - timedelta(days=days) if days else None
+
+    searches = db.query(SearchLog.term, func.count(SearchLog.id), func.sum(case((SearchLog.results_count == 0, 1), else_=0)))
+    interactions = db.query(InteractionLog.event_type, func.count(InteractionLog.id))
+    top_articles = db.query(InteractionLog.article_id, Article.title, func.count(InteractionLog.id)) \
+        .join(Article, Article.id == InteractionLog.article_id) \
+        .filter(InteractionLog.event_type == 'view')
+    if since:
+        searches = searches.filter(SearchLog.created_at >= since)
+        interactions = interactions.filter(InteractionLog.created_at >= since)
+        top_articles = top_articles.filter(InteractionLog.created_at >= since)
+
+    term_rows = searches.group_by(SearchLog.term).all()
+    total_searches = sum(count for _, count, _ in term_rows)
+    zero_results = sum(int(zero or 0) for _, _, zero in term_rows)
+    top_terms = sorted(term_rows, key=lambda r: r[1], reverse=True)[:top]
+    missing_terms = sorted([r for r in term_rows if r[2]], key=lambda r: r[2], reverse=True)[:5]
+
+    return {
+        'window_days': days,
+        'total_searches': total_searches,
+        'zero_result_searches': zero_results,
+        'top_terms': [[term, count] for term, count, _ in top_terms],
+        'terms_without_results': [[term, int(zero)] for term, _, zero in missing_terms],
+        'interactions': {event: count for event, count in interactions.group_by(InteractionLog.event_type).all()},
+        'most_viewed': [
+            [title, count] for _, title, count in
+            top_articles.group_by(InteractionLog.article_id, Article.title)
+            .order_by(func.count(InteractionLog.id).desc()).limit(5).all()
+        ],
+    }
+
+
+def summary_changed(old, new, threshold=INSIGHTS_CHANGE_THRESHOLD):
+    """Mudança relevante: volumes variaram além do limiar ou o top de termos mudou."""
+    if old is None:
+        return True
+
+    def relative(a, b):
+        return abs(a - b) / max(a, b, 1)
+
+    if relative(old['total_searches'], new['total_searches']) > threshold:
+        return True
+    if relative(old['zero_result_searches'], new['zero_result_searches']) > threshold:
+        return True
+    old_total = sum(old['interactions'].values())
+    new_total = sum(new['interactions'].values())
+    if relative(old_total, new_total) > threshold:
+        return True
+    return [t for t, _ in old['top_terms'][:5]] != [t for t, _ in new['top_terms'][:5]]
+
+
+class InsightsCache:
+    """Cache de insights por janela de dados, com regeneração em background.
+
+    - Dentro do TTL: resposta imediata do cache.
+    - TTL vencido: recalcula o resumo (consultas agregadas, barato). Se não
+      mudou de forma relevante, apenas renova o TTL; se mudou, serve o insight
+      atual e regenera em background.
+    - Só a primeira consulta de uma janela espera pelo LLM; consultas
+      simultâneas a uma janela fria esperam a mesma geração (single-flight).
+    """
+
+    def __init__(self, summarize, generate, ttl=INSIGHTS_TTL):
+        self.summarize = summarize    # (window) -> resumo
+        self.generate = generate      # (resumo) -> texto de insights
+        self.ttl = ttl
+        self._entries = {}            # window -> {'insights', 'summary', 'generated_at', 'checked_at'}
+        self._refreshing = set()
+        self._cold_locks = {}         # window -> Lock da primeira geração
+        self._lock = threading.Lock()
+
+    def has(self, window):
+        """Já existe insight gerado para a janela (``get`` não vai esperar o LLM)."""
+        return window in self._entries
+
+    def get(self, window):
+        now = time.time()
+        entry = self._entries.get(window)
+        if entry and now - entry['checked_at'] < self.ttl:
+            return self._response(entry, stale=False)
+
+        if entry is None:
+            return self._response(self._generate_cold(window), stale=False)
+
+        summary = self.summarize(window)
+
+        if not summary_changed(entry['summary'], summary):
+            entry['checked_at'] = now
+            return self._response(entry, stale=False)
+
+        self._refresh_in_background(window, summary)
+        return self._response(entry, stale=True)
+
+    def _generate_cold(self, window):
+        """Primeira geração da janela; quem chegar durante ela reaproveita o resultado."""
+        with self._lock:
+            cold_lock = self._cold_locks.setdefault(window, threading.Lock())
+        with cold_lock:
+            entry = self._entries.get(window)
+            if entry is None:
+                entry = self._regenerate(window, self.summarize(window))
+        with self._lock:
+            self._cold_locks.pop(window, None)
+        return entry
+
+    def _regenerate(self, window, summary):
+        insights = self.generate(summary)
+        now = time.time()
+        entry = {'insights': insights, 'summary': summary, 'generated_at': now, 'checked_at': now}
+        self._entries[window] = entry
+        return entry
+
+    def _refresh_in_background(self, window, summary):
+        with self._lock:
+            if window in self._refreshing:
+                return
+            self._refreshing.add(window)
+
+        def run():
+            try:
+                self._regenerate(window, summary)
+            except Exception as e:
+                print(f"⚠️ Erro ao regenerar insights ({window}): {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(window)
+
+        threading.Thread(target=run, name=f'insights-{window}', daemon=True).start()
+
+    def invalidate(self, window=None):
+        if window is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(window, None)
+
+    @staticmethod
+    def _response(entry, stale):
+        return {
+            'insights': entry['insights'],
+            'generated_at': datetime.fromtimestamp(entry['generated_at']).isoformat(),
+            'stale': stale,
+            'summary': entry['summary'],
+        }
+
+
+def call_insights_generator(service, summary):
+    """Chama ``generate_analytics_insights(summary=...)`` quando o serviço aceita o resumo."""
+    method = service.generate_analytics_insights
+    try:
+        parameters = inspect.signature(method).parameters
+    except (TypeError, ValueError):
+        parameters = {}
+    accepts_summary = 'summary' in parameters or any(
+        p.kind is inspect.Parameter.VAR_KEYWORD for p in parameters.values()
+    )
+    return method(summary=summary) if accepts_summary else method()
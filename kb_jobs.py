@@ -0,0 +1,411 @@
+import os
+import json
+import time
+import uuid
+import atexit
+import sqlite3
+import threading
+
+# Jobs finalizados mantidos no histórico (dias)
+JOBS_KEEP_DAYS = float(os.getenv('JOBS_KEEP_DAYS', 7))
+
+FINISHED_STATUSES = ('succeeded', 'failed', 'cancelled')
+
+
+class JobCancelled(Exception):
+    """Levantada dentro do handler quando o job foi cancelado."""
+
+
+class JobContext:
+    """O que o handler enxerga: parâmetros, progresso, checkpoint e cancelamento."""
+
+    def __init__(self, runner, job_id, params, checkpoint):
+        self.runner = runner
+        self.id = job_id
+        self.params = params
+        self.checkpoint = checkpoint or {}
+
+    def progress(self, fraction, message=None, checkpoint=None):
+        """Registra o avanço (0-1) e, opcionalmente, o ponto de retomada.
+
+        Também é o ponto de cancelamento: levanta ``JobCancelled`` se pedido.
+        """
+        if checkpoint is not None:
+            self.checkpoint = checkpoint
+        self.runner._update_progress(self.id, fraction, message, checkpoint)
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        if self.runner.cancel_requested(self.id):
+            raise JobCancelled()
+
+
+class JobRunner:
+    """Jobs em background persistidos em SQLite, executados por um pool local de threads.
+
+    - ``submit`` grava o job (``queued``) e acorda os workers; retorna o id.
+    - Cada worker reserva o job mais antigo por lease (vários processos podem
+      compartilhar o mesmo arquivo); o lease é renovado enquanto o job roda.
+    - Jobs ``running`` de um processo que morreu (pid inexistente ou lease
+      vencido) voltam para a fila e retomam do último checkpoint.
+    - ``cancel`` cancela na hora se ainda estiver na fila; em execução, o
+      handler para no próximo ``progress``/``check_cancelled``.
+    - Com ``enabled=False``, ``submit`` executa o job na thread chamadora.
+    - Tipos registrados com ``broadcast`` (estado em memória, como embeddings)
+      repetem o efeito nos demais processos: o heartbeat de cada processo vê
+      o job concluído em outro e chama ``broadcast()`` localmente.
+    """
+
+    def __init__(self, path, workers=2, lease_seconds=30, max_attempts=3, enabled=True):
+        self.path = path
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.enabled = enabled
+        self.handlers = {}
+        self._broadcasts = {}         # kind -> função repetida nos outros processos
+        self._broadcast_since = time.time()
+        self.owner = f"{os.getpid()}-{id(self)}"
+        self._local = threading.local()
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self._threads = []
+        self._heartbeat_thread = None
+        self._running = set()
+        self._running_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._finished_here = set()   # jobs com broadcast concluídos neste processo
+        self._broadcasting = set()
+        self._init_schema()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        """No processo filho (pre-fork): lease, conexões e threads próprios."""
+        self.owner = f"{os.getpid()}-{id(self)}"
+        self._local = threading.local()
+        self._wakeup = threading.Condition()
+        self._threads = []
+        self._heartbeat_thread = None
+        self._running = set()
+        self._running_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._finished_here = set()
+        self._broadcasting = set()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        self._connect().execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'id TEXT PRIMARY KEY, kind TEXT NOT NULL, params TEXT NOT NULL, '
+            "status TEXT NOT NULL DEFAULT 'queued', progress REAL NOT NULL DEFAULT 0, message TEXT, "
+            'result TEXT, error TEXT, checkpoint TEXT, created_by TEXT, '
+            'created_at REAL NOT NULL, started_at REAL, finished_at REAL, '
+            'attempts INTEGER NOT NULL DEFAULT 0, cancel_requested INTEGER NOT NULL DEFAULT 0, '
+            'claimed_by TEXT, heartbeat_at REAL)'
+        )
+        self._connect().execute('CREATE INDEX IF NOT EXISTS ix_jobs_status_created ON jobs (status, created_at)')
+
+    def register(self, kind, handler, broadcast=None):
+        """Registra ``handler(ctx)`` para jobs do tipo ``kind``; o retorno vira ``result``.
+
+        ``broadcast()`` roda em cada um dos outros processos quando um job do
+        tipo termina com sucesso (ex.: recarregar embeddings em memória).
+        """
+        self.handlers[kind] = handler
+        if broadcast is not None:
+            self._broadcasts[kind] = broadcast
+
+    # ---------- API ----------
+
+    def submit(self, kind, params=None, created_by=None, dedupe=False):
+        """Enfileira um job. Com ``dedupe``, reaproveita um job igual ainda não finalizado."""
+        if kind not in self.handlers:
+            raise KeyError(f"Tipo de job não registrado: {kind}")
+        payload = json.dumps(params or {}, ensure_ascii=False, sort_keys=True)
+        conn = self._connect()
+        if dedupe:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE kind = ? AND params = ? AND status IN ('queued', 'running') "
+                'ORDER BY created_at LIMIT 1', (kind, payload)
+            ).fetchone()
+            if row:
+                return row['id']
+        job_id = uuid.uuid4().hex
+        conn.execute(
+            'INSERT INTO jobs (id, kind, params, created_by, created_at) VALUES (?, ?, ?, ?, ?)',
+            (job_id, kind, payload, created_by, time.time())
+        )
+        if not self.enabled:
+            self._execute(conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone())
+            return job_id
+        self.start()
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def get(self, job_id):
+        row = self._connect().execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list(self, status=None, kind=None, limit=50):
+        query = 'SELECT * FROM jobs'
+        clauses, args = [], []
+        if status:
+            clauses.append('status = ?')
+            args.append(status)
+        if kind:
+            clauses.append('kind = ?')
+            args.append(kind)
+        if clauses:
+            query += ' WHERE ' + ' AND '.join(clauses)
+        query += ' ORDER BY created_at DESC LIMIT ?'
+        args.append(limit)
+        return [self._to_dict(row) for row in self._connect().execute(query, args).fetchall()]
+
+    def cancel(self, job_id):
+        """Cancela o job. Retorna o estado atualizado (``None`` se não existir)."""
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            "UPDATE jobs SET status = 'cancelled', finished_at = ?, message = 'Cancelado' "
+            "WHERE id = ? AND status = 'queued'", (now, job_id)
+        )
+        conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,))
+        return self.get(job_id)
+
+    def cancel_requested(self, job_id):
+        row = self._connect().execute('SELECT cancel_requested FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return bool(row and row['cancel_requested'])
+
+    @staticmethod
+    def _to_dict(row):
+        data = dict(row)
+        for key in ('params', 'result', 'checkpoint'):
+            data[key] = json.loads(data[key]) if data[key] else None
+        data['cancel_requested'] = bool(data['cancel_requested'])
+        data['progress'] = round(data['progress'], 4)
+        for key in ('claimed_by', 'heartbeat_at'):
+            data.pop(key)
+        return data
+
+    # ---------- workers ----------
+
+    def start(self):
+        """Inicia os workers (idempotente) e devolve à fila jobs órfãos de processos mortos."""
+        if not self.enabled:
+            return
+        if self._threads and all(t.is_alive() for t in self._threads):
+            return
+        with self._start_lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            if len(self._threads) >= self.workers:
+                return
+            self._stopping = False
+            self._requeue_orphans()
+            self._prune()
+            for i in range(len(self._threads), self.workers):
+                thread = threading.Thread(target=self._run, name=f'job-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            if not (self._heartbeat_thread and self._heartbeat_thread.is_alive()):
+                self._heartbeat_thread = threading.Thread(target=self._heartbeat, name='job-heartbeat', daemon=True)
+                self._heartbeat_thread.start()
+
+    def _requeue_orphans(self):
+        conn = self._connect()
+        rows = conn.execute("SELECT id, claimed_by FROM jobs WHERE status = 'running'").fetchall()
+        for row in rows:
+            pid = int((row['claimed_by'] or '0').split('-')[0] or 0)
+            if pid and pid != os.getpid() and _pid_alive(pid):
+                continue
+            if row['claimed_by'] == self.owner:
+                continue
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', claimed_by = NULL, heartbeat_at = NULL, "
+                "message = 'Retomando após reinício' WHERE id = ? AND status = 'running'", (row['id'],)
+            )
+            print(f"🔁 Job {row['id']} interrompido: voltou para a fila")
+
+    def _prune(self):
+        self._connect().execute(
+            f"DELETE FROM jobs WHERE status IN {FINISHED_STATUSES} AND finished_at < ?",
+            (time.time() - JOBS_KEEP_DAYS * 86400,)
+        )
+
+    def _claim(self):
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' OR (status = 'running' AND heartbeat_at < ?) "
+                'ORDER BY created_at LIMIT 1', (now - self.lease_seconds,)
+            ).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', claimed_by = ?, heartbeat_at = ?, "
+                    'started_at = COALESCE(started_at, ?), attempts = attempts + 1 WHERE id = ?',
+                    (self.owner, now, now, row['id'])
+                )
+                row = conn.execute('SELECT * FROM jobs WHERE id = ?', (row['id'],)).fetchone()
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return row
+
+    def _run(self):
+        while not self._stopping:
+            try:
+                row = self._claim()
+            except Exception as e:
+                print(f"⚠️ Jobs: erro ao ler fila: {e}")
+                row = None
+            if row is None:
+                with self._wakeup:
+                    self._wakeup.wait(timeout=2.0)
+                continue
+            self._execute(row)
+
+    def _execute(self, row):
+        job_id = row['id']
+        conn = self._connect()
+        if row['attempts'] > self.max_attempts:
+            self._finish(job_id, 'failed', error=f"Interrompido {row['attempts'] - 1} vezes; desistindo")
+            return
+        handler = self.handlers.get(row['kind'])
+        if handler is None:
+            self._finish(job_id, 'failed', error=f"Tipo de job não registrado: {row['kind']}")
+            return
+        if not self.enabled:
+            conn.execute("UPDATE jobs SET status = 'running', started_at = ?, attempts = 1 WHERE id = ?",
+                         (time.time(), job_id))
+        with self._running_lock:
+            self._running.add(job_id)
+        ctx = JobContext(self, job_id, json.loads(row['params']),
+                         json.loads(row['checkpoint']) if row['checkpoint'] else None)
+        started = time.time()
+        try:
+            result = handler(ctx)
+            if row['kind'] in self._broadcasts:
+                self._finished_here.add(job_id)
+            self._finish(job_id, 'succeeded', result=result)
+            print(f"✅ Job {row['kind']} {job_id} concluído em {time.time() - started:.1f}s")
+        except JobCancelled:
+            self._finish(job_id, 'cancelled', message='Cancelado')
+            print(f"🛑 Job {row['kind']} {job_id} cancelado")
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            self._finish(job_id, 'failed', error=str(e))
+        finally:
+            with self._running_lock:
+                self._running.discard(job_id)
+
+    def _finish(self, job_id, status, result=None, error=None, message=None):
+        self._connect().execute(
+            'UPDATE jobs SET status = ?, result = ?, error = ?, message = COALESCE(?, message), '
+            'progress = CASE WHEN ? = \'succeeded\' THEN 1 ELSE progress END, finished_at = ?, '
+            'claimed_by = NULL, heartbeat_at = NULL WHERE id = ?',
+            (status, json.dumps(result, ensure_ascii=False) if result is not None else None,
+             error, message, status, time.time(), job_id)
+        )
+
+    def _update_progress(self, job_id, fraction, message, checkpoint):
+        self._connect().execute(
+            'UPDATE jobs SET progress = ?, message = COALESCE(?, message), '
+            'checkpoint = COALESCE(?, checkpoint), heartbeat_at = ? WHERE id = ?',
+            (max(0.0, min(1.0, fraction)), message,
+             json.dumps(checkpoint, ensure_ascii=False) if checkpoint is not None else None,
+             time.time(), job_id)
+        )
+
+    def _check_broadcasts(self):
+        """Jobs com ``broadcast`` concluídos em outro processo: repete o efeito aqui (uma vez por tipo)."""
+        kinds = list(self._broadcasts)
+        rows = self._connect().execute(
+            f"SELECT id, kind, finished_at FROM jobs WHERE status = 'succeeded' AND finished_at > ? "
+            f"AND kind IN ({','.join('?' * len(kinds))}) ORDER BY finished_at",
+            [self._broadcast_since] + kinds
+        ).fetchall()
+        pending = set()
+        for row in rows:
+            self._broadcast_since = max(self._broadcast_since, row['finished_at'])
+            if row['id'] in self._finished_here:
+                self._finished_here.discard(row['id'])
+            else:
+                pending.add(row['kind'])
+        for kind in pending - self._broadcasts_running():
+            threading.Thread(target=self._run_broadcast, args=(kind,), name=f'job-broadcast-{kind}', daemon=True).start()
+
+    def _broadcasts_running(self):
+        with self._running_lock:
+            return set(self._broadcasting)
+
+    def _run_broadcast(self, kind):
+        with self._running_lock:
+            self._broadcasting.add(kind)
+        try:
+            print(f"📣 Job {kind} concluído em outro processo: atualizando este processo")
+            self._broadcasts[kind]()
+        except Exception as e:
+            print(f"⚠️ Jobs: erro ao aplicar {kind} neste processo: {e}")
+        finally:
+            with self._running_lock:
+                self._broadcasting.discard(kind)
+
+    def _heartbeat(self):
+        """Renova o lease dos jobs em execução (handlers longos sem ``progress``) e aplica broadcasts."""
+        while not self._stopping:
+            time.sleep(self.lease_seconds / 3)
+            if self._broadcasts:
+                try:
+                    self._check_broadcasts()
+                except sqlite3.Error as e:
+                    print(f"⚠️ Jobs: erro ao verificar broadcasts: {e}")
+            with self._running_lock:
+                running = list(self._running)
+            for job_id in running:
+                try:
+                    self._connect().execute(
+                        'UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND claimed_by = ?',
+                        (time.time(), job_id, self.owner)
+                    )
+                except sqlite3.Error as e:
+                    print(f"⚠️ Jobs: erro ao renovar lease de {job_id}: {e}")
+
+    def stop(self, timeout=1):
+        """Encerra os workers; jobs em execução são retomados no próximo start."""
+        self._stopping = True
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+def create_job_runner(path):
+    """Cria o executor de jobs; JOBS_ENABLED=false executa cada job na própria requisição."""
+    enabled = os.getenv('JOBS_ENABLED', 'true').lower() in ('true', '1', 't')
+    runner = JobRunner(path, workers=int(os.getenv('JOB_WORKERS', 2)),
+                       lease_seconds=float(os.getenv('JOB_LEASE_SECONDS', 30)), enabled=enabled)
+    atexit.register(runner.stop)
+    return runner
@@ -0,0 +1,247 @@
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from flask import g, has_request_context, request
+
+# Sub-buckets por potência de 2 (erro relativo máximo ~3%)
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+# Limites (s) exportados no formato Prometheus
+PROMETHEUS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+PERCENTILES = (50, 90, 95, 99)
+
+
+class LatencyHistogram:
+    """Histograma log-linear (estilo HDR) de latências em microssegundos.
+
+    Valores abaixo de 2×SUB_BUCKETS µs são exatos; acima, cada potência de 2
+    é dividida em SUB_BUCKETS faixas lineares. Memória fixa (~1000 contadores)
+    e percentis com erro relativo limitado, independente do volume.
+    """
+
+    __slots__ = ('counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+
+    @staticmethod
+    def _index(micros):
+        if micros < 2 * SUB_BUCKETS:
+            return micros
+        shift = micros.bit_length() - SUB_BUCKET_BITS - 1
+        return 2 * SUB_BUCKETS + (shift - 1) * SUB_BUCKETS + ((micros >> shift) - SUB_BUCKETS)
+
+    @staticmethod
+    def _upper_bound(index):
+        """Limite superior (µs, exclusivo) do bucket."""
+        if index < 2 * SUB_BUCKETS:
+            return index + 1
+        shift = (index - 2 * SUB_BUCKETS) // SUB_BUCKETS + 1
+        mantissa = (index - 2 * SUB_BUCKETS) % SUB_BUCKETS + SUB_BUCKETS
+        return (mantissa + 1) << shift
+
+    def record(self, seconds):
+        index = self._index(max(0, int(seconds * 1e6)))
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.min = seconds if self.min is None else min(self.min, seconds)
+
+    def percentile(self, p):
+        """Percentil ``p`` (0-100) em segundos (limite superior do bucket)."""
+        if not self.count:
+            return None
+        target = max(1, int(round(self.count * p / 100.0)))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self._upper_bound(index) / 1e6, self.max)
+        return self.max
+
+    def cumulative(self, bounds):
+        """Contagens acumuladas até cada limite (para buckets ``le`` do Prometheus)."""
+        ordered = sorted(self.counts.items())
+        result = []
+        seen = 0
+        position = 0
+        for bound in bounds:
+            limit = bound * 1e6
+            while position < len(ordered) and self._upper_bound(ordered[position][0]) <= limit:
+                seen += ordered[position][1]
+                position += 1
+            result.append(seen)
+        return result
+
+    def summary(self):
+        data = {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count * 1000, 3) if self.count else None,
+            'min_ms': round(self.min * 1000, 3) if self.min is not None else None,
+            'max_ms': round(self.max * 1000, 3),
+        }
+        for p in PERCENTILES:
+            value = self.percentile(p)
+            data[f'p{p}_ms'] = round(value * 1000, 3) if value is not None else None
+        return data
+
+
+class MetricsRegistry:
+    """Histogramas por (endpoint, estágio) e contagem de respostas por status."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.histograms = {}   # (endpoint, estágio) -> LatencyHistogram
+        self.statuses = {}     # (endpoint, status) -> contagem
+        self.collectors = {}   # nome -> (snapshot(), prometheus(prefix), reset())
+        self._lock = threading.Lock()
+
+    def add_collector(self, name, snapshot, prometheus=None, reset=None):
+        """Seção extra exposta junto com as latências (ex.: rastreamento de SQL)."""
+        self.collectors[name] = (snapshot, prometheus, reset)
+
+    def record(self, endpoint, stage, seconds):
+        with self._lock:
+            histogram = self.histograms.get((endpoint, stage))
+            if histogram is None:
+                histogram = self.histograms[(endpoint, stage)] = LatencyHistogram()
+            histogram.record(seconds)
+
+    def record_status(self, endpoint, status):
+        with self._lock:
+            self.statuses[(endpoint, status)] = self.statuses.get((endpoint, status), 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.statuses.clear()
+            self.started_at = time.time()
+        for _, _, reset in self.collectors.values():
+            if reset:
+                reset()
+
+    def snapshot(self):
+        with self._lock:
+            endpoints = {}
+            for (endpoint, stage), histogram in sorted(self.histograms.items()):
+                entry = endpoints.setdefault(endpoint, {'status': {}, 'stages': {}})
+                entry['stages'][stage] = histogram.summary()
+            for (endpoint, status), count in self.statuses.items():
+                endpoints.setdefault(endpoint, {'status': {}, 'stages': {}})['status'][str(status)] = count
+        data = {'uptime_seconds': round(time.time() - self.started_at, 1), 'endpoints': endpoints}
+        for name, (snapshot, _, _) in self.collectors.items():
+            data[name] = snapshot()
+        return data
+
+    def prometheus(self, prefix='kb'):
+        """Exposição no formato texto do Prometheus (histogram + counter)."""
+        lines = [
+            f'# HELP {prefix}_stage_duration_seconds Duração por endpoint e estágio da requisição',
+            f'# TYPE {prefix}_stage_duration_seconds histogram',
+        ]
+        with self._lock:
+            for (endpoint, stage), histogram in sorted(self.histograms.items()):
+                labels = f'endpoint="{escape_label(endpoint)}",stage="{escape_label(stage)}"'
+                for bound, count in zip(PROMETHEUS_BUCKETS, histogram.cumulative(PROMETHEUS_BUCKETS)):
+                    lines.append(f'{prefix}_stage_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'{prefix}_stage_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f'{prefix}_stage_duration_seconds_sum{{{labels}}} {histogram.total:.6f}')
+                lines.append(f'{prefix}_stage_duration_seconds_count{{{labels}}} {histogram.count}')
+            lines.append(f'# HELP {prefix}_requests_total Respostas por endpoint e status HTTP')
+            lines.append(f'# TYPE {prefix}_requests_total counter')
+            for (endpoint, status), count in sorted(self.statuses.items()):
+                lines.append(f'{prefix}_requests_total{{endpoint="{escape_label(endpoint)}",status="{status}"}} {count}')
+        for _, prometheus, _ in self.collectors.values():
+            if prometheus:
+                lines.extend(prometheus(prefix))
+        return '\n'.join(lines) + '\n'
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+metrics = MetricsRegistry()
+
+# Estágios fora do Flask (caminho ASGI): a lista segue a requisição pelo
+# contexto do asyncio e pelas threads do executor (contextvars são copiados)
+_context_stages = ContextVar('kb_stages', default=None)
+
+
+def _request_endpoint():
+    rule = request.url_rule.rule if request.url_rule else 'unmatched'
+    return f"{request.method} {rule}"
+
+
+@contextmanager
+def stage(name):
+    """Mede um estágio da requisição atual (fora de requisição, não faz nada).
+
+    Estágios podem ser aninhados: cada um registra o próprio tempo total.
+    """
+    stages = g.get('_kb_stages') if has_request_context() else _context_stages.get()
+    if stages is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages.append((name, time.perf_counter() - started))
+
+
+@contextmanager
+def collect_stages():
+    """Coleta os ``stage`` executados fora de uma requisição Flask (ex.: kb_asgi)."""
+    stages = []
+    token = _context_stages.set(stages)
+    try:
+        yield stages
+    finally:
+        _context_stages.reset(token)
+
+
+def record_request(registry, endpoint, stages, total_seconds, status):
+    for name, seconds in stages:
+        registry.record(endpoint, name, seconds)
+    registry.record(endpoint, 'total', total_seconds)
+    registry.record_status(endpoint, status)
+
+
+def timed_stage(name):
+    """Decorator: a função inteira conta como o estágio ``name``."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def init_metrics(app, registry=metrics):
+    """Middleware: tempo total por endpoint + estágios registrados com ``stage``."""
+
+    @app.before_request
+    def _start_request_timer():
+        g._kb_started = time.perf_counter()
+        g._kb_stages = []
+
+    @app.after_request
+    def _record_request_metrics(response):
+        started = g.pop('_kb_started', None)
+        if started is None:
+            return response
+        record_request(registry, _request_endpoint(), g.pop('_kb_stages', []),
+                       time.perf_counter() - started, response.status_code)
+        return response
+
+    return registry
@@ -0,0 +1,234 @@
+import os
+import sys
+import json
+import time
+import uuid
+import threading
+from datetime import datetime
+
+from flask import g, request, session
+
+# Intervalo de amostragem (ms) e duração máxima de um perfil (s)
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', 5))
+PROFILE_MAX_SECONDS = float(os.getenv('PROFILE_MAX_SECONDS', 60))
+# Perfis mantidos em disco (os mais antigos são apagados)
+PROFILE_MAX_STORED = int(os.getenv('PROFILE_MAX_STORED', 50))
+
+PROFILE_HEADER = 'X-KB-Profile'
+PROFILE_QUERY_ARG = '_profile'
+
+
+class SamplingProfiler:
+    """Amostra a pilha de UMA thread (``sys._current_frames``) a partir de outra thread.
+
+    A thread perfilada não é instrumentada (sem ``sys.setprofile``): o custo
+    fica na thread amostradora, proporcional à frequência de amostragem.
+    """
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL_MS / 1000.0, max_seconds=PROFILE_MAX_SECONDS):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.stacks = {}        # tupla de frames (raiz -> folha) -> amostras
+        self.samples = 0
+        self.started_at = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='kb-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+
+    def _run(self):
+        deadline = self.started_at + self.max_seconds
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None or time.perf_counter() > deadline:
+                return
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            key = tuple(reversed(stack))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+    def collapsed(self):
+        """Formato "collapsed stacks" (flamegraph.pl / speedscope): ``a;b;c contagem``."""
+        lines = []
+        for stack, count in sorted(self.stacks.items(), key=lambda kv: kv[1], reverse=True):
+            names = ';'.join(f"{name} ({os.path.basename(filename)}:{line})" for name, filename, line in stack)
+            lines.append(f"{names} {count}")
+        return '\n'.join(lines) + '\n'
+
+    def speedscope(self, name):
+        """Perfil no formato JSON do speedscope (tipo "sampled")."""
+        frames = []
+        frame_index = {}
+        samples = []
+        weights = []
+        interval_ms = self.interval * 1000
+        for stack, count in self.stacks.items():
+            indexes = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    frames.append({'name': frame[0], 'file': frame[1], 'line': frame[2]})
+                indexes.append(frame_index[frame])
+            samples.append(indexes)
+            weights.append(count * interval_ms)
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'exporter': 'kb_profiler',
+            'name': name,
+            'activeProfileIndex': 0,
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': name,
+                'unit': 'milliseconds',
+                'startValue': 0,
+                'endValue': sum(weights),
+                'samples': samples,
+                'weights': weights,
+            }],
+        }
+
+
+class ProfileStore:
+    """Perfis em disco (metadados, speedscope e collapsed por requisição), compartilhados entre workers."""
+
+    def __init__(self, directory, max_profiles=PROFILE_MAX_STORED):
+        self.directory = directory
+        self.max_profiles = max_profiles
+
+    def _path(self, profile_id, suffix):
+        return os.path.join(self.directory, f"{profile_id}{suffix}")
+
+    @staticmethod
+    def valid_id(profile_id):
+        return bool(profile_id) and all(c.isalnum() or c in '-_' for c in profile_id) and len(profile_id) <= 64
+
+    def save(self, profile_id, meta, profiler):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(profile_id, '.speedscope.json'), 'w', encoding='utf-8') as f:
+            json.dump(profiler.speedscope(f"{meta['method']} {meta['path']}"), f)
+        with open(self._path(profile_id, '.collapsed.txt'), 'w', encoding='utf-8') as f:
+            f.write(profiler.collapsed())
+        tmp = self._path(profile_id, '.meta.json.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp, self._path(profile_id, '.meta.json'))
+        self._prune()
+
+    def _prune(self):
+        metas = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith('.meta.json')),
+            key=lambda entry: entry.stat().st_mtime, reverse=True
+        )
+        for entry in metas[self.max_profiles:]:
+            profile_id = entry.name[:-len('.meta.json')]
+            for suffix in ('.meta.json', '.speedscope.json', '.collapsed.txt'):
+                try:
+                    os.remove(self._path(profile_id, suffix))
+                except FileNotFoundError:
+                    pass
+
+    def list(self, limit=50):
+        profiles = []
+        if not os.path.isdir(self.directory):
+            return profiles
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith('.meta.json'):
+                continue
+            try:
+                with open(entry.path, encoding='utf-8') as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        profiles.sort(key=lambda p: p.get('created_at', ''), reverse=True)
+        return profiles[:limit]
+
+    def read(self, profile_id, fmt='speedscope'):
+        """Conteúdo do perfil no formato pedido (``None`` se não existir)."""
+        if not self.valid_id(profile_id):
+            return None
+        suffix = '.collapsed.txt' if fmt == 'collapsed' else '.speedscope.json'
+        try:
+            with open(self._path(profile_id, suffix), encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+
+def profiling_requested():
+    return request.headers.get(PROFILE_HEADER) or request.args.get(PROFILE_QUERY_ARG)
+
+
+def init_profiler(app, store):
+    """Perfil sob demanda: admin + header ``X-KB-Profile: 1`` ou ``?_profile=1``.
+
+    Sem a flag, o custo por requisição é uma consulta de header e outra de query string.
+    """
+
+    @app.before_request
+    def _start_request_profiler():
+        if not profiling_requested() or session.get('role') not in ['admin', 'super_admin']:
+            return
+        # Id sempre gerado no servidor: um X-Request-Id do cliente não sobrescreve perfis existentes
+        g._kb_request_id = uuid.uuid4().hex
+        g._kb_profiler = SamplingProfiler(threading.get_ident())
+        g._kb_profiler.start()
+
+    def _finish(status, error=None):
+        """Para o amostrador (se ainda ativo) e grava o perfil; retorna o id ou None."""
+        profiler = g.pop('_kb_profiler', None)
+        if profiler is None:
+            return None
+        profiler.stop()
+        request_id = g.pop('_kb_request_id')
+        incoming = request.headers.get('X-Request-Id')
+        meta = {
+            'id': request_id,
+            'client_request_id': incoming if ProfileStore.valid_id(incoming) else None,
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'endpoint': request.url_rule.rule if request.url_rule else None,
+            'status': status,
+            'error': error,
+            'duration_ms': round(profiler.duration * 1000, 2),
+            'samples': profiler.samples,
+            'interval_ms': profiler.interval * 1000,
+            'user': session.get('user'),
+            'pid': os.getpid(),
+            'created_at': datetime.utcnow().isoformat(),
+        }
+        try:
+            store.save(request_id, meta, profiler)
+        except OSError as e:
+            print(f"⚠️ Erro ao salvar perfil {request_id}: {e}")
+        return request_id
+
+    @app.after_request
+    def _finish_request_profiler(response):
+        request_id = _finish(response.status_code)
+        if request_id:
+            response.headers['X-Request-Id'] = request_id
+            response.headers['X-KB-Profile-Id'] = request_id
+        return response
+
+    @app.teardown_request
+    def _stop_request_profiler(exc):
+        # Exceção não tratada pula o after_request: o amostrador não pode ficar rodando até o limite
+        _finish(500, error=repr(exc) if exc else None)
+
+    return store
@@ -0,0 +1,152 @@
+import os
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+class MemoryBucketStore:
+    """Armazena buckets em memória (LRU + TTL + limite rígido de entradas)."""
+
+    def __init__(self, max_entries=10000, ttl=900):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def update(self, key, fn):
+        """Aplica ``fn(state) -> new_state`` atomicamente e retorna o novo estado.
+
+        ``state`` é ``(tokens, updated_at)`` ou ``None``; ``new_state`` ``None`` remove a chave.
+        """
+        now = time.time()
+        with self._lock:
+            state = self._buckets.pop(key, None)
+            if state is not None and now - state[1] > self.ttl:
+                state = None
+            new_state = fn(state)
+            if new_state is not None:
+                self._buckets[key] = new_state
+                self._evict(now)
+            return new_state
+
+    def _evict(self, now):
+        # Remove expirados a partir do mais antigo (ordem LRU)
+        while self._buckets:
+            oldest_key, (_, updated_at) = next(iter(self._buckets.items()))
+            if now - updated_at <= self.ttl and len(self._buckets) <= self.max_entries:
+                break
+            del self._buckets[oldest_key]
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SQLiteBucketStore:
+    """Armazena buckets em SQLite para compartilhar o limite entre workers."""
+
+    def __init__(self, path, ttl=900):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS login_buckets '
+                '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_login_buckets_updated ON login_buckets (updated_at)')
+        if hasattr(os, 'register_at_fork'):
+            # Conexões SQLite não podem ser herdadas por processos filhos (pre-fork)
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def update(self, key, fn):
+        now = time.time()
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated_at FROM login_buckets WHERE key = ?', (key,)).fetchone()
+            state = tuple(row) if row and now - row[1] <= self.ttl else None
+            new_state = fn(state)
+            if new_state is None:
+                conn.execute('DELETE FROM login_buckets WHERE key = ?', (key,))
+            else:
+                conn.execute(
+                    'INSERT OR REPLACE INTO login_buckets (key, tokens, updated_at) VALUES (?, ?, ?)',
+                    (key, new_state[0], new_state[1])
+                )
+            # Limpeza oportunista de chaves expiradas
+            conn.execute('DELETE FROM login_buckets WHERE updated_at < ?', (now - self.ttl,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return new_state
+
+
+class LoginRateLimiter:
+    """Token bucket por cliente: ``capacity`` falhas seguidas, recarga gradual.
+
+    Cada falha consome um token; um token volta a cada ``refill_seconds / capacity``.
+    Sem tokens o cliente está bloqueado e nem chega a verificar a senha.
+    """
+
+    def __init__(self, capacity=5, refill_seconds=900, store=None):
+        self.capacity = capacity
+        self.rate = capacity / float(refill_seconds)  # tokens por segundo
+        self.store = store if store is not None else MemoryBucketStore(ttl=refill_seconds)
+
+    def _refilled(self, state, now):
+        if state is None:
+            return float(self.capacity)
+        tokens, updated_at = state
+        return min(float(self.capacity), tokens + (now - updated_at) * self.rate)
+
+    def retry_after(self, key):
+        """Segundos até a próxima tentativa permitida (0 = liberado)."""
+        now = time.time()
+        result = {}
+
+        def peek(state):
+            result['tokens'] = self._refilled(state, now)
+            return state
+
+        self.store.update(key, peek)
+        if result['tokens'] >= 1:
+            return 0
+        return (1 - result['tokens']) / self.rate
+
+    def consume(self, key):
+        """Registra uma tentativa falha."""
+        now = time.time()
+
+        def take(state):
+            tokens = max(0.0, self._refilled(state, now) - 1)
+            return (tokens, now)
+
+        self.store.update(key, take)
+
+    def reset(self, key):
+        """Limpa o bucket (login bem-sucedido)."""
+        self.store.update(key, lambda state: None)
+
+
+def create_login_limiter(capacity, lockout_seconds):
+    """Cria o limitador; usa SQLite compartilhado se LOGIN_RATE_LIMIT_DB estiver definido."""
+    db_path = os.getenv('LOGIN_RATE_LIMIT_DB')
+    if db_path:
+        store = SQLiteBucketStore(db_path, ttl=lockout_seconds)
+    else:
+        max_entries = int(os.getenv('LOGIN_RATE_LIMIT_MAX_ENTRIES', 10000))
+        store = MemoryBucketStore(max_entries=max_entries, ttl=lockout_seconds)
+    return LoginRateLimiter(capacity=capacity, refill_seconds=lockout_seconds, store=store)
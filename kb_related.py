@@ -0,0 +1,82 @@
+import os
+from datetime import datetime
+
+from kb_database import ArticleNeighbor, Article, Category
+
+# Vizinhos gravados por artigo e similaridade mínima (cosseno TF-IDF) para entrar na tabela
+RELATED_TOP_N = int(os.getenv('RELATED_TOP_N', 5))
+RELATED_MIN_SCORE = float(os.getenv('RELATED_MIN_SCORE', 0.1))
+
+
+class RelatedArticles:
+    """Tabela ``article_neighbors``: top-N artigos aprovados semelhantes a cada artigo.
+
+    Os vizinhos vêm de ``vector_index`` (TfidfArticleIndex) e são gravados no
+    banco, então a leitura (``related``) é uma única consulta pela chave
+    primária, igual em todos os workers. Quando um artigo muda, ``refresh``
+    recalcula o próprio artigo, quem o tinha como vizinho e os novos vizinhos.
+    """
+
+    def __init__(self, vector_index, top_n=RELATED_TOP_N, min_score=RELATED_MIN_SCORE):
+        self.vector_index = vector_index
+        self.top_n = top_n
+        self.min_score = min_score
+
+    def neighbors(self, article_id):
+        vector = self.vector_index.vectors.get(article_id)
+        if not vector:
+            return []
+        return [(neighbor, score) for neighbor, score in
+                self.vector_index.nearest(vector, k=self.top_n, exclude=article_id, status='approved')
+                if score >= self.min_score]
+
+    def _write(self, db, article_ids):
+        """Regrava as linhas dos artigos informados; retorna os vizinhos calculados."""
+        computed = {article_id: self.neighbors(article_id) for article_id in article_ids}
+        if not article_ids:
+            return computed
+        db.query(ArticleNeighbor).filter(ArticleNeighbor.article_id.in_(article_ids)).delete(synchronize_session=False)
+        now = datetime.utcnow()
+        db.bulk_insert_mappings(ArticleNeighbor, [
+            {'article_id': article_id, 'rank': rank, 'neighbor_id': neighbor, 'score': round(score, 4), 'updated_at': now}
+            for article_id, neighbors in computed.items()
+            for rank, (neighbor, score) in enumerate(neighbors)
+        ])
+        return computed
+
+    def referrers(self, db, article_id):
+        """Artigos que têm ``article_id`` entre os vizinhos (índice reverso)."""
+        return {row.article_id for row in
+                db.query(ArticleNeighbor.article_id).filter(ArticleNeighbor.neighbor_id == article_id).all()}
+
+    def refresh(self, db, article_id):
+        """Artigo criado/alterado: ele, seus antigos vizinhos reversos e os novos vizinhos."""
+        former = self.referrers(db, article_id)
+        computed = self._write(db, [article_id])
+        affected = (former | {neighbor for neighbor, _ in computed[article_id]}) - {article_id}
+        return 1 + self.recompute(db, affected)
+
+    def recompute(self, db, article_ids):
+        """Recalcula e grava os vizinhos dos artigos (lote do job ``related``, vizinhos de excluídos...)."""
+        # Só artigos que ainda existem no índice (os demais ficariam órfãos na tabela)
+        article_ids = [a for a in article_ids if a in self.vector_index.vectors]
+        self._write(db, article_ids)
+        db.commit()
+        return len(article_ids)
+
+    def related(self, db, article_id):
+        """Vizinhos já calculados do artigo (consulta única pela chave primária)."""
+        rows = db.query(ArticleNeighbor.neighbor_id, ArticleNeighbor.score, Article.title, Category.name) \
+            .join(Article, Article.id == ArticleNeighbor.neighbor_id) \
+            .outerjoin(Category, Category.id == Article.category_id) \
+            .filter(ArticleNeighbor.article_id == article_id, Article.status == 'approved') \
+            .order_by(ArticleNeighbor.rank).all()
+        return [{'id': neighbor_id, 'title': title, 'category_name': category, 'score': score}
+                for neighbor_id, score, title, category in rows]
+
+
+def delete_for_articles(db, article_ids):
+    """Remove as linhas em que os artigos aparecem (como origem ou vizinho) antes de excluí-los."""
+    db.query(ArticleNeighbor).filter(
+        ArticleNeighbor.article_id.in_(article_ids) | ArticleNeighbor.neighbor_id.in_(article_ids)
+    ).delete(synchronize_session=False)
@@ -0,0 +1,212 @@
+"""Servidor de produção pre-fork.
+
+O processo mestre importa a aplicação, carrega o modelo de IA, os embeddings e
+os índices em memória e só então cria os workers com ``fork``: as páginas
+desses objetos são compartilhadas por copy-on-write em vez de existir uma
+cópia por worker.
+
+Uso:
+    python kb_serve.py [--workers 4] [--host 0.0.0.0] [--port 3000]
+
+Sinais (mestre):
+    SIGHUP          recarrega modelo/índices no mestre e troca os workers um a um
+    SIGTERM/SIGINT  encerra os workers e sai
+
+Os índices em memória continuam sendo reconstruídos por worker após
+INDEX_MAX_AGE (em background, numa cópia); com KB_RELOAD_INTERVAL menor que esse valor o mestre recarrega
+antes e os workers novos herdam índices recentes, mantendo o compartilhamento.
+
+Sem ``fork`` (Windows), roda em processo único.
+"""
+import os
+
+# Bibliotecas de ML com pools de threads próprios não sobrevivem bem a fork; um thread por worker
+os.environ.setdefault('OMP_NUM_THREADS', '1')
+os.environ.setdefault('TOKENIZERS_PARALLELISM', 'false')
+# O mestre aquece de forma síncrona antes do fork (nunca em thread de background);
+# fixado no kb_startup porque o kb_app recarrega o .env com override
+from kb_startup import LAUNCHER_SETTINGS
+LAUNCHER_SETTINGS['KB_WARMUP'] = 'blocking'
+# Embeddings no mestre, para os workers herdarem (um job rodaria em um worker só)
+LAUNCHER_SETTINGS['EMBEDDINGS_SYNC'] = 'inline'
+
+import gc
+import sys
+import time
+import signal
+import socket
+import argparse
+import threading
+
+from werkzeug.serving import make_server
+
+from kb_app import app, WARMUP_STEPS, write_queue, job_runner
+from kb_database import init_db, engine
+from kb_indexes import notify_articles_reset
+from kb_startup import run_warmup, wait_for_warmup
+
+KB_WORKERS = int(os.getenv('KB_WORKERS', os.cpu_count() or 2))
+# Intervalo (s) entre workers na troca gradual do SIGHUP
+KB_RELOAD_STAGGER = float(os.getenv('KB_RELOAD_STAGGER', 2.0))
+# Recarga periódica (s) do modelo/índices no mestre; 0 = só via SIGHUP
+KB_RELOAD_INTERVAL = int(os.getenv('KB_RELOAD_INTERVAL', 0))
+
+
+def warm_up(force=False):
+    """Carrega tudo no mestre e congela o heap para o GC não sujar páginas compartilhadas."""
+    with app.app_context():
+        state = run_warmup(WARMUP_STEPS, force=force)
+    if state['status'] == 'loading':
+        # Warm-up de background já em andamento: o fork no meio da carga herdaria locks presos
+        print("⏳ Aguardando o warm-up em andamento antes do fork...")
+        state = wait_for_warmup()
+    if state['status'] != 'ready':
+        print(f"⚠️ Warm-up do mestre terminou com status '{state['status']}': os workers carregam o que faltou sob demanda")
+    # Conexões do pool não podem ser herdadas pelos workers
+    engine.dispose()
+    gc.collect()
+    if hasattr(gc, 'freeze'):
+        gc.freeze()
+    return state
+
+
+class PreforkServer:
+    """Mestre: mantém ``workers`` processos atendendo o mesmo socket."""
+
+    def __init__(self, host, port, workers):
+        self.host = host
+        self.port = port
+        self.workers = max(1, workers)
+        self.children = set()
+        self.sock = None
+        self._reload = False
+        self._stopping = False
+
+    def listen(self):
+        family = socket.AF_INET6 if ':' in self.host else socket.AF_INET
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((self.host, self.port))
+        self.sock.listen(128)
+        self.sock.set_inheritable(True)
+
+    def spawn(self):
+        pid = os.fork()
+        if pid:
+            self.children.add(pid)
+            return pid
+        try:
+            self._worker_main()
+        finally:
+            os._exit(0)
+
+    def _worker_main(self):
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+        server = make_server(self.host, self.port, app, threaded=True, fd=self.sock.fileno())
+
+        def shutdown(signum, frame):
+            # serve_forever só para quando shutdown é chamado de outra thread
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        write_queue.start()
+        job_runner.start()
+        print(f"👷 Worker {os.getpid()} pronto")
+        server.serve_forever()
+        job_runner.stop()
+        write_queue.stop()
+
+    def _stop_child(self, pid, timeout=10):
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            self.children.discard(pid)
+            return
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                done, _ = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                done = pid
+            if done:
+                self.children.discard(pid)
+                return
+            time.sleep(0.1)
+        os.kill(pid, signal.SIGKILL)
+        os.waitpid(pid, 0)
+        self.children.discard(pid)
+
+    def reload(self):
+        """Recarrega no mestre e substitui os workers gradualmente (sem derrubar o socket)."""
+        print("🔄 Recarregando modelo e índices...")
+        if hasattr(gc, 'unfreeze'):
+            gc.unfreeze()
+        notify_articles_reset()
+        warm_up(force=True)
+        for old in list(self.children):
+            self.spawn()
+            time.sleep(KB_RELOAD_STAGGER)
+            self._stop_child(old)
+        print("✅ Workers substituídos")
+
+    def run(self):
+        self.listen()
+        signal.signal(signal.SIGHUP, lambda s, f: setattr(self, '_reload', True))
+        signal.signal(signal.SIGTERM, lambda s, f: setattr(self, '_stopping', True))
+        signal.signal(signal.SIGINT, lambda s, f: setattr(self, '_stopping', True))
+
+        for _ in range(self.workers):
+            self.spawn()
+        print(f"🚀 Mestre {os.getpid()}: {self.workers} workers em http://{self.host}:{self.port}")
+
+        last_reload = time.time()
+        while not self._stopping:
+            if KB_RELOAD_INTERVAL and time.time() - last_reload >= KB_RELOAD_INTERVAL:
+                self._reload = True
+            if self._reload:
+                self._reload = False
+                last_reload = time.time()
+                self.reload()
+                continue
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                pid = 0
+            if pid and pid in self.children:
+                self.children.discard(pid)
+                print(f"⚠️ Worker {pid} saiu (status {status}); recriando")
+                self.spawn()
+            else:
+                time.sleep(0.5)
+
+        print("🛑 Encerrando workers...")
+        for pid in list(self.children):
+            self._stop_child(pid)
+        self.sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor pre-fork da Base de Conhecimento')
+    parser.add_argument('--workers', type=int, default=KB_WORKERS)
+    parser.add_argument('--host', default=os.getenv('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', 3000)))
+    args = parser.parse_args()
+
+    init_db()
+    warm_up()
+
+    if not hasattr(os, 'fork'):
+        print("⚠️ fork indisponível nesta plataforma: rodando em processo único")
+        write_queue.start()
+        job_runner.start()
+        app.run(host=args.host, port=args.port, threaded=True)
+        return 0
+
+    PreforkServer(args.host, args.port, args.workers).run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,211 @@
+import re
+from array import array
+
+from kb_indexes import ArticleIndex
+
+WORD_RE = re.compile(r"[^\W\d_]+", re.UNICODE)
+
+try:
+    from spellchecker import SpellChecker
+except ImportError:  # pyspellchecker é opcional aqui
+    SpellChecker = None
+
+_dictionary = None
+
+
+def _general_dictionary():
+    """Dicionário geral (pyspellchecker, pt) usado só para NÃO corrigir palavras válidas."""
+    global _dictionary
+    if _dictionary is None:
+        try:
+            _dictionary = SpellChecker(language='pt') if SpellChecker else False
+        except Exception as e:
+            print(f"⚠️ Dicionário pt do pyspellchecker indisponível: {e}")
+            _dictionary = False
+    return _dictionary
+
+
+def tokenize(text):
+    return [w for w in WORD_RE.findall((text or '').lower()) if 2 <= len(w) <= 40]
+
+
+def _deletes(word, max_distance):
+    """Todas as variantes de ``word`` com até ``max_distance`` caracteres removidos."""
+    result = set()
+    frontier = {word}
+    for _ in range(max_distance):
+        next_frontier = set()
+        for w in frontier:
+            if len(w) <= 1:
+                continue
+            for i in range(len(w)):
+                d = w[:i] + w[i + 1:]
+                if d not in result:
+                    result.add(d)
+                    next_frontier.add(d)
+        frontier = next_frontier
+    return result
+
+
+def _osa_distance(a, b, max_distance):
+    """Distância de Damerau-Levenshtein (OSA) com corte em ``max_distance``."""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        row_min = cur[0]
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+            row_min = min(row_min, cur[j])
+        if row_min > max_distance:
+            return max_distance + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+class SpellingIndex(ArticleIndex):
+    """Índice de correção ortográfica estilo SymSpell sobre o vocabulário da base.
+
+    Vocabulário = títulos, conteúdo e tags dos artigos + palavras aprendidas.
+    As variantes por deleção (até ``max_distance``) do prefixo de cada palavra
+    são pré-computadas, então a busca é só lookups em dicionário + verificação
+    de poucos candidatos.
+    """
+
+    def __init__(self, learned_words_loader=None, max_distance=2, prefix_length=7):
+        super().__init__()
+        self.learned_words_loader = learned_words_loader
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self._clear()
+
+    # --- estrutura interna ---
+
+    def _clear(self):
+        self.word_ids = {}       # palavra -> id
+        self.words = []          # id -> palavra
+        self.counts = {}         # palavra -> nº de documentos que a contêm
+        self.deletes = {}        # variante -> set(palavras)
+        self.doc_words = {}      # article_id / ('learned', palavra) -> array de ids
+
+    def _word_id(self, word):
+        word_id = self.word_ids.get(word)
+        if word_id is None:
+            word_id = len(self.words)
+            self.word_ids[word] = word_id
+            self.words.append(word)
+        return word_id
+
+    def _inc(self, word):
+        count = self.counts.get(word, 0)
+        self.counts[word] = count + 1
+        if count == 0:
+            prefix = word[:self.prefix_length]
+            for d in _deletes(prefix, self.max_distance) | {prefix}:
+                self.deletes.setdefault(d, set()).add(word)
+
+    def _dec(self, word):
+        count = self.counts.get(word, 0) - 1
+        if count > 0:
+            self.counts[word] = count
+            return
+        self.counts.pop(word, None)
+        prefix = word[:self.prefix_length]
+        for d in _deletes(prefix, self.max_distance) | {prefix}:
+            bucket = self.deletes.get(d)
+            if bucket is not None:
+                bucket.discard(word)
+                if not bucket:
+                    del self.deletes[d]
+
+    def _set_doc(self, key, text):
+        self._remove_doc(key)
+        unique = set(tokenize(text))
+        if not unique:
+            return
+        self.doc_words[key] = array('I', (self._word_id(w) for w in unique))
+        for w in unique:
+            self._inc(w)
+
+    def _remove_doc(self, key):
+        ids = self.doc_words.pop(key, None)
+        if ids:
+            for word_id in ids:
+                self._dec(self.words[word_id])
+
+    def _add(self, article):
+        tags = article.get('tags') or []
+        text = ' '.join([article.get('title') or '', article.get('content') or '', ' '.join(tags)])
+        self._set_doc(article['id'], text)
+
+    def _remove(self, article_id):
+        self._remove_doc(article_id)
+
+    def _finish_build(self):
+        if self.learned_words_loader:
+            try:
+                for word in self.learned_words_loader() or []:
+                    self._set_doc(('learned', word), word)
+            except Exception as e:
+                print(f"⚠️ Erro ao carregar palavras aprendidas no índice ortográfico: {e}")
+
+    # --- palavras aprendidas ---
+
+    def add_learned_word(self, word):
+        if self.built:
+            with self._lock:
+                self._journal(lambda index: index._set_doc(('learned', word), word))
+
+    def remove_learned_word(self, word):
+        if self.built:
+            with self._lock:
+                self._journal(lambda index: index._remove_doc(('learned', word)))
+
+    # --- consulta ---
+
+    def lookup(self, word, max_distance=None):
+        """Retorna ``(sugestão, distância)`` ou ``None``."""
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        if word in self.counts:
+            return word, 0
+        prefix = word[:self.prefix_length]
+        best = None
+        seen = set()
+        for variant in _deletes(prefix, max_distance) | {prefix}:
+            for candidate in self.deletes.get(variant, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                distance = _osa_distance(word, candidate, max_distance)
+                if distance > max_distance:
+                    continue
+                key = (distance, -self.counts.get(candidate, 0))
+                if best is None or key < best[0]:
+                    best = (key, candidate)
+        if best is None:
+            return None
+        return best[1], best[0][0]
+
+    def correct(self, query):
+        """Corrige palavras desconhecidas da consulta. Retorna a consulta corrigida."""
+        dictionary = _general_dictionary()
+
+        def fix(match):
+            original = match.group(0)
+            word = original.lower()
+            # Palavras curtas, conhecidas da base ou válidas no português ficam como estão
+            if len(word) < 4 or word in self.counts or (dictionary and word in dictionary):
+                return original
+            suggestion = self.lookup(word, max_distance=1 if len(word) <= 5 else 2)
+            if not suggestion or suggestion[1] == 0:
+                return original
+            fixed = suggestion[0]
+            return fixed.capitalize() if original[:1].isupper() else fixed
+
+        with self._lock:
+            return WORD_RE.sub(fix, query)
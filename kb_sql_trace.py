@@ -0,0 +1,239 @@
+import os
+import re
+import json
+import time
+import threading
+from collections import deque
+from datetime import datetime
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from kb_metrics import escape_label
+
+# Requisição com tempo total de SQL acima disso (ms) vai para o log de consultas lentas
+SLOW_SQL_REQUEST_MS = float(os.getenv('SLOW_SQL_REQUEST_MS', 200))
+# Uma única instrução acima disso (ms) também
+SLOW_SQL_STATEMENT_MS = float(os.getenv('SLOW_SQL_STATEMENT_MS', 100))
+# Repetições do mesmo formato de instrução numa requisição para marcar N+1
+SQL_N_PLUS_ONE_MIN = int(os.getenv('SQL_N_PLUS_ONE_MIN', 5))
+# Arquivo JSONL opcional com as requisições lentas (compartilhado entre workers)
+SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG', '')
+SLOW_QUERY_MEMORY = int(os.getenv('SLOW_QUERY_MEMORY', 100))
+
+SLOWEST_PER_REQUEST = 3
+STATEMENT_PREVIEW = 300
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_IN_LIST_RE = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PARAM_RE = re.compile(r'%\([^)]+\)s|%s|:\w+|\$\d+')
+
+
+def statement_shape(statement):
+    """Formato da instrução sem literais nem parâmetros (``IN (...)`` colapsado).
+
+    Duas consultas com o mesmo formato diferem só nos valores — N vezes o mesmo
+    formato numa requisição é o padrão N+1 (lazy load dentro de um laço).
+    """
+    shape = _WHITESPACE_RE.sub(' ', statement).strip()
+    shape = _STRING_RE.sub('?', shape)
+    shape = _PARAM_RE.sub('?', shape)
+    shape = _NUMBER_RE.sub('?', shape)
+    return _IN_LIST_RE.sub('IN (...)', shape)
+
+
+def _preview(statement):
+    statement = _WHITESPACE_RE.sub(' ', statement).strip()
+    return statement if len(statement) <= STATEMENT_PREVIEW else statement[:STATEMENT_PREVIEW] + '…'
+
+
+class SQLTracer:
+    """Instrumenta um engine: contagem, tempo total e instruções mais lentas por requisição.
+
+    Só instruções executadas dentro de uma requisição Flask são contadas (a fila
+    write-behind e o warm-up rodam fora dela). Os agregados por endpoint entram
+    em ``metrics`` como coletor ``sql``.
+    """
+
+    def __init__(self, request_ms=SLOW_SQL_REQUEST_MS, statement_ms=SLOW_SQL_STATEMENT_MS,
+                 n_plus_one_min=SQL_N_PLUS_ONE_MIN, log_path=SLOW_QUERY_LOG):
+        self.request_ms = request_ms
+        self.statement_ms = statement_ms
+        self.n_plus_one_min = n_plus_one_min
+        self.log_path = log_path
+        self.slow = deque(maxlen=SLOW_QUERY_MEMORY)
+        self.endpoints = {}    # endpoint -> agregados
+        self._lock = threading.Lock()
+
+    # ---------- eventos do engine ----------
+
+    def attach(self, engine):
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+        event.listen(engine, 'handle_error', self._on_error)
+
+    @staticmethod
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_kb_sql_started', []).append(time.perf_counter())
+
+    @staticmethod
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('_kb_sql_started')
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        if has_request_context():
+            statements = g.get('_kb_sql')
+            if statements is not None:
+                statements.append((statement, elapsed))
+
+    @staticmethod
+    def _on_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get('_kb_sql_started'):
+            conn.info['_kb_sql_started'].pop()
+
+    # ---------- resumo por requisição ----------
+
+    def summarize(self, statements):
+        total = sum(seconds for _, seconds in statements)
+        shapes = {}
+        for statement, seconds in statements:
+            shape = statement_shape(statement)
+            count, shape_total = shapes.get(shape, (0, 0.0))
+            shapes[shape] = (count + 1, shape_total + seconds)
+        slowest = sorted(statements, key=lambda s: s[1], reverse=True)[:SLOWEST_PER_REQUEST]
+        return {
+            'statements': len(statements),
+            'total_ms': round(total * 1000, 3),
+            'slowest': [{'ms': round(seconds * 1000, 3), 'sql': _preview(statement)} for statement, seconds in slowest],
+            'n_plus_one': [
+                {'shape': _preview(shape), 'count': count, 'total_ms': round(shape_total * 1000, 3)}
+                for shape, (count, shape_total) in sorted(shapes.items(), key=lambda kv: kv[1][0], reverse=True)
+                if count >= self.n_plus_one_min
+            ],
+        }
+
+    def record(self, endpoint, summary):
+        with self._lock:
+            entry = self.endpoints.get(endpoint)
+            if entry is None:
+                entry = self.endpoints[endpoint] = {
+                    'requests': 0, 'statements': 0, 'total_ms': 0.0,
+                    'max_statements': 0, 'max_ms': 0.0, 'slow_requests': 0, 'n_plus_one': {},
+                }
+            entry['requests'] += 1
+            entry['statements'] += summary['statements']
+            entry['total_ms'] += summary['total_ms']
+            entry['max_statements'] = max(entry['max_statements'], summary['statements'])
+            entry['max_ms'] = max(entry['max_ms'], summary['total_ms'])
+            for item in summary['n_plus_one']:
+                entry['n_plus_one'][item['shape']] = entry['n_plus_one'].get(item['shape'], 0) + 1
+
+    def is_slow(self, summary):
+        if summary['total_ms'] >= self.request_ms:
+            return True
+        return bool(summary['slowest']) and summary['slowest'][0]['ms'] >= self.statement_ms
+
+    def log_slow(self, endpoint, path, summary):
+        entry = {'created_at': datetime.utcnow().isoformat(), 'endpoint': endpoint, 'path': path,
+                 'pid': os.getpid(), **summary}
+        with self._lock:
+            if endpoint in self.endpoints:
+                self.endpoints[endpoint]['slow_requests'] += 1
+            self.slow.append(entry)
+        print(f"🐢 SQL lento em {endpoint}: {summary['statements']} instruções, {summary['total_ms']:.1f}ms")
+        if self.log_path:
+            try:
+                with open(self.log_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            except OSError as e:
+                print(f"⚠️ Erro ao gravar log de SQL lento: {e}")
+
+    # ---------- exposição (coletor do MetricsRegistry) ----------
+
+    def reset(self):
+        with self._lock:
+            self.endpoints.clear()
+            self.slow.clear()
+
+    def snapshot(self):
+        with self._lock:
+            endpoints = {}
+            for endpoint, entry in sorted(self.endpoints.items()):
+                requests = entry['requests']
+                endpoints[endpoint] = {
+                    'requests': requests,
+                    'statements_per_request': round(entry['statements'] / requests, 2),
+                    'mean_ms': round(entry['total_ms'] / requests, 3),
+                    'max_statements': entry['max_statements'],
+                    'max_ms': round(entry['max_ms'], 3),
+                    'slow_requests': entry['slow_requests'],
+                    'n_plus_one': [
+                        {'shape': shape, 'requests': count}
+                        for shape, count in sorted(entry['n_plus_one'].items(), key=lambda kv: kv[1], reverse=True)
+                    ],
+                }
+            return {
+                'thresholds': {'request_ms': self.request_ms, 'statement_ms': self.statement_ms,
+                               'n_plus_one_min': self.n_plus_one_min},
+                'endpoints': endpoints,
+                'slow': list(self.slow)[-20:][::-1],
+            }
+
+    def prometheus(self, prefix):
+        lines = [
+            f'# HELP {prefix}_sql_statements_total Instruções SQL executadas por endpoint',
+            f'# TYPE {prefix}_sql_statements_total counter',
+        ]
+        with self._lock:
+            items = sorted(self.endpoints.items())
+            for endpoint, entry in items:
+                lines.append(f'{prefix}_sql_statements_total{{endpoint="{escape_label(endpoint)}"}} {entry["statements"]}')
+            lines.append(f'# HELP {prefix}_sql_duration_seconds_total Tempo total em SQL por endpoint')
+            lines.append(f'# TYPE {prefix}_sql_duration_seconds_total counter')
+            for endpoint, entry in items:
+                lines.append(f'{prefix}_sql_duration_seconds_total{{endpoint="{escape_label(endpoint)}"}} {entry["total_ms"] / 1000:.6f}')
+            lines.append(f'# HELP {prefix}_sql_slow_requests_total Requisições no log de SQL lento')
+            lines.append(f'# TYPE {prefix}_sql_slow_requests_total counter')
+            for endpoint, entry in items:
+                lines.append(f'{prefix}_sql_slow_requests_total{{endpoint="{escape_label(endpoint)}"}} {entry["slow_requests"]}')
+            lines.append(f'# HELP {prefix}_sql_n_plus_one_total Requisições com padrão N+1 detectado')
+            lines.append(f'# TYPE {prefix}_sql_n_plus_one_total counter')
+            for endpoint, entry in items:
+                lines.append(f'{prefix}_sql_n_plus_one_total{{endpoint="{escape_label(endpoint)}"}} {sum(entry["n_plus_one"].values())}')
+        return lines
+
+
+def init_sql_tracing(app, engine, registry, tracer=None):
+    """Registra os eventos do engine e o resumo por requisição.
+
+    Chamar depois de ``init_metrics``: o ``after_request`` daqui roda antes do
+    dele e acrescenta o estágio ``sql`` aos estágios da requisição.
+    """
+    tracer = tracer or SQLTracer()
+    tracer.attach(engine)
+    registry.add_collector('sql', tracer.snapshot, tracer.prometheus, tracer.reset)
+
+    @app.before_request
+    def _start_sql_trace():
+        g._kb_sql = []
+
+    @app.after_request
+    def _finish_sql_trace(response):
+        statements = g.pop('_kb_sql', None)
+        if statements is None:
+            return response
+        summary = tracer.summarize(statements)
+        if hasattr(g, '_kb_stages') and statements:
+            g._kb_stages.append(('sql', summary['total_ms'] / 1000))
+        rule = request.url_rule.rule if request.url_rule else 'unmatched'
+        endpoint = f"{request.method} {rule}"
+        tracer.record(endpoint, summary)
+        if tracer.is_slow(summary):
+            tracer.log_slow(endpoint, request.full_path.rstrip('?'), summary)
+        return response
+
+    return tracer
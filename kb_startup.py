@@ -0,0 +1,171 @@
+"""Fases de inicialização: import rápido, warm-up opcional e perfil de import.
+
+Uso (perfil de import):
+    python kb_startup.py --profile-imports [--module kb_app] [--budget 2.0] [--top 15]
+"""
+import os
+import re
+import sys
+import time
+import argparse
+import threading
+import subprocess
+
+# Orçamento (s) para o import de kb_app (cold start sem modelos)
+IMPORT_TIME_BUDGET = float(os.getenv('IMPORT_TIME_BUDGET', 2.0))
+
+WARMUP_STATE = {
+    'status': 'cold',        # cold -> loading -> ready | error
+    'started_at': None,
+    'finished_at': None,
+    'steps': {},             # nome -> {'status', 'seconds', 'error'}
+    'error': None,
+}
+_warmup_lock = threading.Lock()
+# Livre quando nenhum warm-up está em andamento (wait_for_warmup)
+_warmup_idle = threading.Event()
+_warmup_idle.set()
+
+# Modos fixados pelo launcher (kb_serve, kb_asgi) antes de importar o kb_app. Valem
+# mais que o ambiente: o kb_app recarrega o .env com override=True e um
+# KB_WARMUP/EMBEDDINGS_SYNC copiado do .env.example desfaria a escolha do launcher.
+LAUNCHER_SETTINGS = {}
+
+
+def launcher_setting(name, default=None):
+    """Valor fixado pelo launcher ou, sem ele, o do ambiente/.env."""
+    value = LAUNCHER_SETTINGS.get(name)
+    return value if value is not None else os.getenv(name, default)
+
+
+def run_warmup(steps, force=False):
+    """Executa os passos de warm-up em ordem (lista de ``(nome, função)``).
+
+    Um passo com erro não impede os demais; o estado final é ``error`` se algum falhou.
+    ``force`` refaz um warm-up já concluído (recarga do servidor pre-fork).
+    """
+    with _warmup_lock:
+        if WARMUP_STATE['status'] == 'loading' or (WARMUP_STATE['status'] == 'ready' and not force):
+            return WARMUP_STATE
+        WARMUP_STATE.update(status='loading', started_at=time.time(), finished_at=None, error=None)
+        _warmup_idle.clear()
+
+    try:
+        return _run_steps(steps)
+    finally:
+        _warmup_idle.set()
+
+
+def _run_steps(steps):
+    failed = False
+    for name, fn in steps:
+        WARMUP_STATE['steps'][name] = {'status': 'loading', 'seconds': None, 'error': None}
+        started = time.time()
+        try:
+            fn()
+            WARMUP_STATE['steps'][name].update(status='ready', seconds=round(time.time() - started, 3))
+        except Exception as e:
+            failed = True
+            WARMUP_STATE['steps'][name].update(status='error', seconds=round(time.time() - started, 3), error=str(e))
+            print(f"⚠️ Warm-up '{name}' falhou: {e}")
+
+    WARMUP_STATE['finished_at'] = time.time()
+    WARMUP_STATE['status'] = 'error' if failed else 'ready'
+    if failed:
+        WARMUP_STATE['error'] = 'Um ou mais passos de warm-up falharam'
+    total = WARMUP_STATE['finished_at'] - WARMUP_STATE['started_at']
+    print(f"🔥 Warm-up concluído ({WARMUP_STATE['status']}) em {total:.1f}s")
+    return WARMUP_STATE
+
+
+def wait_for_warmup(timeout=None):
+    """Espera um warm-up em andamento (ex.: a thread de background) terminar."""
+    _warmup_idle.wait(timeout)
+    return WARMUP_STATE
+
+
+def start_background_warmup(steps):
+    """Executa o warm-up numa thread daemon (o servidor já pode aceitar conexões)."""
+    thread = threading.Thread(target=run_warmup, args=(steps,), name='warmup', daemon=True)
+    thread.start()
+    return thread
+
+
+def readiness():
+    """Estado de prontidão para o endpoint /api/ready."""
+    state = dict(WARMUP_STATE)
+    state['steps'] = {k: dict(v) for k, v in WARMUP_STATE['steps'].items()}
+    if state['started_at'] and not state['finished_at']:
+        state['elapsed'] = round(time.time() - state['started_at'], 3)
+    return state
+
+
+IMPORTTIME_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def profile_imports(module='kb_app', top=15):
+    """Mede o import de ``module`` num processo novo (``python -X importtime``).
+
+    Retorna ``{'module', 'total_seconds', 'top': [(módulo, segundos cumulativos), ...]}``.
+    """
+    basedir = os.path.abspath(os.path.dirname(__file__))
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=basedir, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Falha ao importar {module}:\n{proc.stderr[-2000:]}")
+
+    # O importtime lista os filhos antes do pai; a indentação indica a profundidade
+    entries = []
+    total_us = 0
+    pending = []
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        cumulative_us, depth, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        if name == module:
+            total_us = cumulative_us
+            # Dependências diretas: linhas desde o último import do mesmo nível, um nível abaixo
+            for n, us, d in reversed(pending):
+                if d <= depth:
+                    break
+                if d == depth + 2:
+                    entries.append((n, us))
+            break
+        pending.append((name, cumulative_us, depth))
+
+    entries.sort(key=lambda e: e[1], reverse=True)
+    return {
+        'module': module,
+        'total_seconds': round(total_us / 1e6, 3),
+        'top': [(name, round(us / 1e6, 3)) for name, us in entries[:top]],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Perfil de inicialização da Base de Conhecimento')
+    parser.add_argument('--profile-imports', action='store_true', help='mede o tempo de import do módulo')
+    parser.add_argument('--module', default='kb_app')
+    parser.add_argument('--budget', type=float, default=IMPORT_TIME_BUDGET, help='orçamento em segundos')
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    if not args.profile_imports:
+        parser.print_help()
+        return 0
+
+    report = profile_imports(args.module, top=args.top)
+    print(f"⏱️  import {report['module']}: {report['total_seconds']:.3f}s (orçamento {args.budget:.3f}s)")
+    for name, seconds in report['top']:
+        print(f"   {seconds:8.3f}s  {name}")
+    if report['total_seconds'] > args.budget:
+        print("❌ Cold start acima do orçamento")
+        return 1
+    print("✅ Dentro do orçamento")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,57 @@
+import os
+
+from kb_vectors import article_text
+
+# Abaixo desta confiança a sugestão local cede lugar ao LLM
+TAG_SUGGEST_MIN_CONFIDENCE = float(os.getenv('TAG_SUGGEST_MIN_CONFIDENCE', 0.35))
+
+
+class TagSuggester:
+    """Sugestão de tags local: votação dos vizinhos mais próximos + palavras-chave TF-IDF.
+
+    Os vizinhos (artigos semelhantes) votam nas suas tags com peso igual à
+    similaridade. Se faltarem sugestões, completa com as palavras-chave mais
+    características do texto. A confiança combina a similaridade do melhor
+    vizinho com a concordância entre os vizinhos na tag mais votada.
+    """
+
+    def __init__(self, vector_index, neighbours=10):
+        self.index = vector_index
+        self.neighbours = neighbours
+
+    def suggest(self, title, content, existing_tags=None, limit=5, exclude_id=None):
+        """Retorna ``(tags, confiança)``."""
+        existing = {t.lower() for t in (existing_tags or [])}
+        text = article_text({'title': title, 'content': content})
+        vector = self.index.vectorize(text)
+        if not vector:
+            return [], 0.0
+
+        neighbours = self.index.nearest(vector, k=self.neighbours, exclude=exclude_id)
+        votes = {}
+        total_similarity = 0.0
+        for article_id, similarity in neighbours:
+            total_similarity += similarity
+            for tag in self.index.meta.get(article_id, {}).get('tags', []):
+                key = tag.lower()
+                if key in existing:
+                    continue
+                votes[key] = votes.get(key, 0.0) + similarity
+
+        ranked = sorted(votes.items(), key=lambda kv: kv[1], reverse=True)
+        suggestions = [tag for tag, _ in ranked[:limit]]
+
+        confidence = 0.0
+        if ranked and total_similarity > 0:
+            best_similarity = neighbours[0][1]
+            agreement = ranked[0][1] / total_similarity
+            confidence = round(min(1.0, best_similarity * (0.5 + agreement)), 3)
+
+        if len(suggestions) < limit:
+            for keyword in self.index.keywords(text, k=limit * 2):
+                if keyword not in existing and keyword not in suggestions:
+                    suggestions.append(keyword)
+                if len(suggestions) >= limit:
+                    break
+
+        return suggestions, confidence
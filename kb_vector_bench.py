@@ -0,0 +1,140 @@
+"""Benchmark de recall × memória do armazenamento quantizado (kb_vector_store).
+
+Uso:
+    python kb_vector_bench.py [--vectors 20000] [--dim 384] [--queries 200] [--k 10]
+    python kb_vector_bench.py --embeddings embeddings.npy   # vetores reais (N × dim)
+
+Compara a busca exata em float32 (referência) com:
+  - int8 sem rescoring (só os códigos)
+  - int8 + rescoring exato via mmap, para vários fatores de candidatos
+
+Também confere a persistência: após upserts/remoções, reabrir o store do
+disco precisa devolver os mesmos ids e os mesmos resultados.
+
+O store é um protótipo isolado: nem o kb_app nem o AIService o usam. As
+variáveis dele valem só aqui:
+    VECTOR_RESCORE_FACTOR=4        candidatos por resultado no rescoring exato (k × fator)
+    VECTOR_LOG_COMPACT_LINES=1024  linhas do log (linha -> id) antes de compactar no snapshot
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+from kb_vector_store import QuantizedVectorStore, normalize
+
+
+def synthetic_embeddings(n, dim, clusters=64, seed=42):
+    """Vetores agrupados (parecidos com embeddings de artigos de poucas categorias)."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    return normalize(centers[labels] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32))
+
+
+def recall_at_k(results, truth):
+    return np.mean([len(set(r) & set(t)) / len(t) for r, t in zip(results, truth)])
+
+
+def check_reopen(path, vectors, queries, k, rng):
+    """Upsert (novo id, id existente, linha reaproveitada) + remoção e reabre do disco."""
+    n, dim = vectors.shape
+    store = QuantizedVectorStore(path, dim)
+    store.remove(0)
+    store.remove(1)
+    store.upsert('novo-1', rng.normal(size=dim))   # reaproveita uma linha livre
+    store.upsert('novo-2', rng.normal(size=dim))   # reaproveita a outra
+    store.upsert('novo-3', rng.normal(size=dim))   # linha nova no fim
+    store.upsert(2, rng.normal(size=dim))          # sobrescreve um id existente
+    before = [store.search(q, k=k) for q in queries[:20]]
+
+    reopened = QuantizedVectorStore(path, dim)
+    after = [reopened.search(q, k=k) for q in queries[:20]]
+    return (reopened.rows == store.rows and reopened.ids == store.ids
+            and np.array_equal(reopened.codes, store.codes) and before == after
+            and 0 not in reopened.rows and 'novo-3' in reopened.rows)
+
+
+def run(vectors, queries, k, factors):
+    n, dim = vectors.shape
+    exact_scores = queries @ vectors.T
+    truth = [list(np.argsort(-row)[:k]) for row in exact_scores]
+
+    started = time.perf_counter()
+    for q in queries:
+        np.argsort(-(vectors @ q))[:k]
+    float32_ms = (time.perf_counter() - started) * 1000 / len(queries)
+
+    report = {
+        'vectors': n, 'dim': dim, 'k': k, 'queries': len(queries),
+        'float32': {'resident_bytes': int(vectors.nbytes), 'recall': 1.0, 'ms_per_query': round(float32_ms, 3)},
+        'int8': [],
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = QuantizedVectorStore(os.path.join(tmp, 'bench'), dim)
+        store.build(list(range(n)), vectors)
+        memory = store.memory_report()
+
+        configs = [(False, 1)] + [(True, f) for f in factors]
+        for rescore, factor in configs:
+            store.rescore_factor = factor
+            started = time.perf_counter()
+            results = [[article_id for article_id, _ in store.search(q, k=k, rescore=rescore)] for q in queries]
+            elapsed_ms = (time.perf_counter() - started) * 1000 / len(queries)
+            report['int8'].append({
+                'rescore': rescore,
+                'rescore_factor': factor if rescore else None,
+                'recall': round(float(recall_at_k(results, truth)), 4),
+                'ms_per_query': round(elapsed_ms, 3),
+                'resident_bytes': memory['resident_bytes'],
+                'disk_bytes': memory['disk_bytes'] if rescore else 0,
+            })
+        report['reopen_ok'] = bool(check_reopen(store.path, vectors, queries, k, np.random.default_rng(3)))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recall × memória: float32 vs int8 + rescoring')
+    parser.add_argument('--vectors', type=int, default=20000)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--factors', default='1,2,4,8', help='fatores de candidatos para o rescoring')
+    parser.add_argument('--embeddings', help='arquivo .npy com embeddings reais (N × dim)')
+    parser.add_argument('--json', action='store_true', help='imprime o relatório em JSON')
+    args = parser.parse_args()
+
+    if args.embeddings:
+        vectors = normalize(np.load(args.embeddings))
+    else:
+        vectors = synthetic_embeddings(args.vectors, args.dim)
+    rng = np.random.default_rng(7)
+    # Consultas: vetores da base com ruído (como uma pergunta próxima de um artigo)
+    picks = rng.integers(0, len(vectors), size=args.queries)
+    queries = normalize(vectors[picks] + 0.3 * rng.normal(size=(args.queries, vectors.shape[1])).astype(np.float32))
+
+    report = run(vectors, queries, args.k, [int(f) for f in args.factors.split(',')])
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0 if report['reopen_ok'] else 1
+
+    mb = lambda b: f"{b / 1024 / 1024:8.2f} MB"
+    print(f"📐 {report['vectors']} vetores × {report['dim']} dims, k={report['k']}, {report['queries']} consultas\n")
+    print(f"{'modo':<24}{'RAM':>12}{'disco':>12}{'recall@k':>10}{'ms/consulta':>13}")
+    f32 = report['float32']
+    print(f"{'float32 (exato)':<24}{mb(f32['resident_bytes']):>12}{mb(0):>12}{f32['recall']:>10.4f}{f32['ms_per_query']:>13.3f}")
+    for row in report['int8']:
+        name = f"int8 + rescore ×{row['rescore_factor']}" if row['rescore'] else 'int8 (sem rescore)'
+        print(f"{name:<24}{mb(row['resident_bytes']):>12}{mb(row['disk_bytes']):>12}{row['recall']:>10.4f}{row['ms_per_query']:>13.3f}")
+    print(f"\n{'✅' if report['reopen_ok'] else '❌'} Reabertura do disco após upsert/remoção: "
+          f"{'mesmo estado' if report['reopen_ok'] else 'estado divergente'}")
+    return 0 if report['reopen_ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,260 @@
+"""Protótipo isolado de armazenamento de embeddings em int8 (medido por kb_vector_bench).
+
+Ainda não está ligado ao caminho de embeddings do app nem do AIService.
+"""
+import os
+import json
+import threading
+
+import numpy as np
+
+# Candidatos por resultado levados ao rescoring exato (k × fator)
+VECTOR_RESCORE_FACTOR = int(os.getenv('VECTOR_RESCORE_FACTOR', 4))
+# Linhas por bloco na varredura dos códigos int8 (limita o buffer temporário em float32)
+SCAN_BLOCK_ROWS = 4096
+# Linhas no log de mutações antes de compactar no snapshot (mínimo; cresce com a base)
+VECTOR_LOG_COMPACT_LINES = int(os.getenv('VECTOR_LOG_COMPACT_LINES', 1024))
+
+
+def quantize(vectors):
+    """Quantização escalar simétrica por vetor: ``(códigos int8, escalas float32)``."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        norm = np.linalg.norm(vectors)
+        return vectors / norm if norm > 0 else vectors
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class QuantizedVectorStore:
+    """Armazenamento de embeddings em int8 com rescoring exato.
+
+    - Em RAM ficam só os códigos int8 (1 byte por dimensão) e uma escala por vetor.
+    - Os vetores float32 completos ficam em disco (``<path>.f32``) e são lidos via
+      mmap: só as páginas dos candidatos finais são tocadas.
+    - A busca varre os códigos, separa ``k × rescore_factor`` candidatos e
+      reordena esses candidatos pelo cosseno exato.
+
+    Os vetores são normalizados na entrada (similaridade = produto interno).
+    Remoções deixam a linha livre para reaproveitamento.
+
+    Persistência: códigos e escalas também ficam em arquivos brutos
+    (``.i8``/``.scale``), regravados só na linha alterada; o mapa linha -> id
+    é um snapshot (``.json``) mais um log append-only (``.log``) de
+    ``[linha, id]``, compactado no snapshot quando cresce. Toda mutação chega
+    ao disco antes de retornar, então reabrir o store devolve o mesmo estado.
+    """
+
+    def __init__(self, path, dim, rescore_factor=VECTOR_RESCORE_FACTOR):
+        self.path = path
+        self.dim = dim
+        self.rescore_factor = rescore_factor
+        self._lock = threading.RLock()
+        self.ids = []            # linha -> id do artigo (None = livre)
+        self.rows = {}           # id -> linha
+        self._free = []          # linhas liberadas por remoções
+        self.codes = np.zeros((0, dim), dtype=np.int8)
+        self.scales = np.zeros(0, dtype=np.float32)
+        self._full = None
+        self._log_lines = 0
+        if os.path.exists(self._meta_path):
+            self.load()
+
+    @property
+    def _full_path(self):
+        return f"{self.path}.f32"
+
+    @property
+    def _meta_path(self):
+        return f"{self.path}.json"
+
+    @property
+    def _codes_path(self):
+        return f"{self.path}.i8"
+
+    @property
+    def _scales_path(self):
+        return f"{self.path}.scale"
+
+    @property
+    def _log_path(self):
+        return f"{self.path}.log"
+
+    def __len__(self):
+        return len(self.rows)
+
+    # ---------- construção e persistência ----------
+
+    def build(self, ids, vectors):
+        """Substitui todo o conteúdo (usado na sincronização inicial)."""
+        vectors = normalize(vectors).reshape(-1, self.dim)
+        with self._lock:
+            self._close_full()
+            vectors.tofile(self._full_path)
+            self.codes, self.scales = quantize(vectors) if len(vectors) else (self.codes[:0], self.scales[:0])
+            self.ids = list(ids)
+            self.rows = {article_id: row for row, article_id in enumerate(self.ids)}
+            self._free = []
+            self.save()
+
+    def save(self):
+        """Snapshot completo (códigos, escalas e mapa de linhas) e zera o log."""
+        with self._lock:
+            self.codes.tofile(self._codes_path)
+            self.scales.tofile(self._scales_path)
+            tmp = f"{self._meta_path}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'dim': self.dim, 'ids': self.ids}, f)
+            os.replace(tmp, self._meta_path)
+            # Depois do snapshot: se cair antes daqui, reaplicar o log dá o mesmo estado
+            open(self._log_path, 'w').close()
+            self._log_lines = 0
+
+    def load(self):
+        with self._lock:
+            with open(self._meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta['dim'] != self.dim:
+                raise ValueError(f"Dimensão incompatível: {meta['dim']} != {self.dim}")
+            ids = meta['ids']
+            self._log_lines = 0
+            if os.path.exists(self._log_path):
+                with open(self._log_path, encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            row, article_id = json.loads(line)
+                        except ValueError:
+                            break  # linha incompleta (queda no meio do append)
+                        ids.extend([None] * (row + 1 - len(ids)))
+                        ids[row] = article_id
+                        self._log_lines += 1
+            n = len(ids)
+            codes = np.fromfile(self._codes_path, dtype=np.int8)
+            scales = np.fromfile(self._scales_path, dtype=np.float32)
+            if codes.size < n * self.dim or scales.size < n:
+                raise ValueError(f"Arquivos de códigos incompletos para {n} linhas: {self.path}")
+            self.codes = codes[:n * self.dim].reshape(n, self.dim)
+            self.scales = scales[:n]
+            self.ids = ids
+            self.rows = {article_id: row for row, article_id in enumerate(self.ids) if article_id is not None}
+            self._free = [row for row, article_id in enumerate(self.ids) if article_id is None]
+            self._close_full()
+
+    def _write_row(self, row):
+        """Grava código e escala de uma linha no lugar (ou no fim, para linha nova)."""
+        for path, data in ((self._codes_path, self.codes[row]), (self._scales_path, self.scales[row:row + 1])):
+            with open(path, 'r+b' if os.path.exists(path) else 'w+b') as f:
+                f.seek(row * data.nbytes)
+                f.write(data.tobytes())
+
+    def _log(self, row, article_id):
+        """Registra a mudança no mapa de linhas; compacta quando o log passa do limite."""
+        with open(self._log_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps([row, article_id]) + '\n')
+        self._log_lines += 1
+        if self._log_lines > max(VECTOR_LOG_COMPACT_LINES, len(self.ids)):
+            self.save()
+
+    def _open_full(self):
+        if self._full is None and self.ids:
+            self._full = np.memmap(self._full_path, dtype=np.float32, mode='r+', shape=(len(self.ids), self.dim))
+        return self._full
+
+    def _close_full(self):
+        if self._full is not None:
+            self._full.flush()
+            self._full = None
+
+    # ---------- atualização incremental ----------
+
+    def upsert(self, article_id, vector):
+        vector = normalize(vector).reshape(self.dim)
+        code, scale = quantize(vector[None, :])
+        with self._lock:
+            row = self.rows.get(article_id)
+            if row is None and self._free:
+                row = self._free.pop()
+            if row is None:
+                # Nova linha: estende o arquivo float32 e os códigos
+                self._close_full()
+                with open(self._full_path, 'ab') as f:
+                    f.write(vector.tobytes())
+                self.ids.append(article_id)
+                row = len(self.ids) - 1
+                self.codes = np.vstack([self.codes, code])
+                self.scales = np.append(self.scales, scale)
+            else:
+                self.ids[row] = article_id
+                self.codes[row] = code[0]
+                self.scales[row] = scale[0]
+                full = self._open_full()
+                full[row] = vector
+                full.flush()
+            self.rows[article_id] = row
+            # Dados da linha primeiro; a entrada no log é o que a torna visível ao reabrir
+            self._write_row(row)
+            self._log(row, article_id)
+
+    def remove(self, article_id):
+        with self._lock:
+            row = self.rows.pop(article_id, None)
+            if row is None:
+                return
+            self.ids[row] = None
+            self.codes[row] = 0
+            self.scales[row] = 0.0
+            self._free.append(row)
+            self._write_row(row)
+            self._log(row, None)
+
+    # ---------- busca ----------
+
+    def _approximate_scores(self, query):
+        scores = np.empty(len(self.ids), dtype=np.float32)
+        for start in range(0, len(self.ids), SCAN_BLOCK_ROWS):
+            block = self.codes[start:start + SCAN_BLOCK_ROWS].astype(np.float32)
+            scores[start:start + len(block)] = (block @ query) * self.scales[start:start + len(block)]
+        # Linhas livres nunca entram no resultado
+        scores[self.scales == 0] = -np.inf
+        return scores
+
+    def search(self, query, k=10, rescore=True, exclude=None):
+        """``[(article_id, similaridade), ...]`` (cosseno) em ordem decrescente."""
+        query = normalize(query).reshape(self.dim)
+        with self._lock:
+            if not self.rows:
+                return []
+            scores = self._approximate_scores(query)
+            if exclude is not None and exclude in self.rows:
+                scores[self.rows[exclude]] = -np.inf
+            n_candidates = min(len(scores), k * self.rescore_factor if rescore else k)
+            candidates = np.argpartition(-scores, n_candidates - 1)[:n_candidates]
+            candidates = candidates[np.isfinite(scores[candidates])]
+            if rescore and len(candidates):
+                # Releitura exata só dos candidatos (mmap: páginas sob demanda)
+                candidates.sort()
+                exact = np.asarray(self._open_full()[candidates]) @ query
+                order = np.argsort(-exact)[:k]
+                return [(self.ids[candidates[i]], float(exact[i])) for i in order]
+            order = candidates[np.argsort(-scores[candidates])][:k]
+            return [(self.ids[row], float(scores[row])) for row in order]
+
+    def memory_report(self):
+        """Bytes residentes (códigos + escalas) vs. o equivalente em float32."""
+        n = len(self.ids)
+        return {
+            'vectors': len(self.rows),
+            'dim': self.dim,
+            'resident_bytes': int(self.codes.nbytes + self.scales.nbytes),
+            'float32_bytes': n * self.dim * 4,
+            'disk_bytes': os.path.getsize(self._full_path) if os.path.exists(self._full_path) else 0,
+        }
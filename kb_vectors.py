@@ -0,0 +1,176 @@
+import os
+import re
+import math
+import heapq
+from collections import Counter
+
+from kb_indexes import ArticleIndex
+
+WORD_RE = re.compile(r"[^\W\d_]{3,40}", re.UNICODE)
+# Palavras inteiras da busca por substring (inclui números, códigos e palavras curtas)
+SEARCH_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Termos mantidos por artigo (os de maior peso) - limita memória em bases grandes
+VECTOR_MAX_TERMS = int(os.getenv('VECTOR_MAX_TERMS', 32))
+
+STOPWORDS = set("""
+a o e é de do da dos das em no na nos nas um uma uns umas por para pelo pela pelos pelas com sem
+que se ao aos à às ou mas mais menos como quando onde qual quais quem seu sua seus suas meu minha
+nosso nossa ele ela eles elas eu tu você vocês nós isso isto esse essa este esta aquele aquela
+ser são foi era está estão estar ter tem têm tinha há pode podem deve devem muito muita muitos
+também já não sim até entre sobre após antes depois então assim cada todo toda todos todas
+the and for with from this that http https www com static uploads imagem importada
+""".split())
+
+
+def tokenize(text):
+    """Tokens normalizados (minúsculas, sem stopwords)."""
+    return [w for w in WORD_RE.findall((text or '').lower()) if w not in STOPWORDS]
+
+
+def search_words(text):
+    """Palavras do texto que ``tokenize`` descarta (``2024``, ``e404``, ``ti``, stopwords)."""
+    return {w for w in SEARCH_WORD_RE.findall((text or '').lower()) if not WORD_RE.fullmatch(w) or w in STOPWORDS}
+
+
+def article_text(article):
+    """Texto de um artigo para vetorização (título pesa em dobro)."""
+    title = article.get('title') or ''
+    return f"{title} {title} {article.get('content') or ''}"
+
+
+def cosine(a, b):
+    """Similaridade entre dois vetores esparsos já normalizados."""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(w * b.get(t, 0.0) for t, w in a.items())
+
+
+class TfidfArticleIndex(ArticleIndex):
+    """Vetores TF-IDF esparsos dos artigos com índice invertido para vizinhos.
+
+    Serve de espaço vetorial local (rápido, sem modelo) para sugestão de tags,
+    classificação e vizinhos semelhantes. O IDF de cada vetor é o do momento
+    da inserção; a reconstrução periódica (INDEX_MAX_AGE) o atualiza.
+    """
+
+    def __init__(self, max_terms=VECTOR_MAX_TERMS):
+        super().__init__()
+        self.max_terms = max_terms
+        self._clear()
+
+    def _clear(self):
+        self.df = Counter()       # termo -> nº de artigos (sobre os termos completos)
+        self.doc_terms = {}       # article_id -> frozenset de termos (para decrementar df)
+        self.vectors = {}         # article_id -> {termo: peso} (top max_terms, normalizado)
+        self.postings = {}        # termo -> {article_id: peso}
+        self.meta = {}            # article_id -> {'title', 'tags', 'category_id', 'category_name', 'status'}
+        # Palavras fora do vocabulário TF-IDF, só para a busca (``matching_articles``)
+        self.other_df = Counter()
+        self.other_terms = {}     # article_id -> frozenset
+
+    @property
+    def n_docs(self):
+        return len(self.doc_terms)
+
+    def idf(self, term):
+        return math.log((1 + self.n_docs) / (1 + self.df.get(term, 0))) + 1.0
+
+    def vectorize(self, text, max_terms=None):
+        """Vetor TF-IDF normalizado de um texto qualquer."""
+        tf = Counter(tokenize(text))
+        if not tf:
+            return {}
+        weights = {t: (1 + math.log(c)) * self.idf(t) for t, c in tf.items()}
+        limit = max_terms or self.max_terms
+        if len(weights) > limit:
+            weights = dict(heapq.nlargest(limit, weights.items(), key=lambda kv: kv[1]))
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        return {t: w / norm for t, w in weights.items()}
+
+    def _add(self, article):
+        article_id = article['id']
+        text = article_text(article)
+        terms = frozenset(tokenize(text))
+        self.doc_terms[article_id] = terms
+        for t in terms:
+            self.df[t] += 1
+        others = frozenset(search_words(text))
+        self.other_terms[article_id] = others
+        for t in others:
+            self.other_df[t] += 1
+        vector = self.vectorize(text)
+        self.vectors[article_id] = vector
+        for t, w in vector.items():
+            self.postings.setdefault(t, {})[article_id] = w
+        self.meta[article_id] = {
+            'title': article.get('title'),
+            'tags': [t.strip() for t in (article.get('tags') or []) if t and t.strip()],
+            'category_id': article.get('category_id'),
+            'category_name': article.get('category_name'),
+            'status': article.get('status'),
+        }
+
+    def _remove(self, article_id):
+        terms = self.doc_terms.pop(article_id, None)
+        if terms is None:
+            return
+        for t in terms:
+            self.df[t] -= 1
+            if self.df[t] <= 0:
+                del self.df[t]
+        for t in self.other_terms.pop(article_id, ()):
+            self.other_df[t] -= 1
+            if self.other_df[t] <= 0:
+                del self.other_df[t]
+        for t in self.vectors.pop(article_id, {}):
+            bucket = self.postings.get(t)
+            if bucket is not None:
+                bucket.pop(article_id, None)
+                if not bucket:
+                    del self.postings[t]
+        self.meta.pop(article_id, None)
+
+    def nearest(self, vector, k=10, exclude=None, status=None):
+        """Top-k artigos por cosseno, acumulando pelo índice invertido.
+
+        Retorna ``[(article_id, similaridade), ...]`` em ordem decrescente.
+        """
+        scores = {}
+        with self._lock:
+            for t, w in vector.items():
+                for article_id, aw in self.postings.get(t, {}).items():
+                    scores[article_id] = scores.get(article_id, 0.0) + w * aw
+            if exclude is not None:
+                scores.pop(exclude, None)
+            if status:
+                scores = {a: s for a, s in scores.items() if self.meta.get(a, {}).get('status') == status}
+        return heapq.nlargest(k, scores.items(), key=lambda kv: kv[1])
+
+    def matching_articles(self, text):
+        """Artigos que contêm todas as palavras do texto (como parte de alguma palavra).
+
+        Equivale ao ``ILIKE '%termo%'`` por palavra, sobre os termos completos de
+        cada artigo e as palavras que o TF-IDF ignora (números, códigos, palavras
+        de 1-2 letras, stopwords) — usado na busca quando o corpo está comprimido
+        no banco.
+        """
+        query_words = set(SEARCH_WORD_RE.findall((text or '').lower()))
+        if not query_words:
+            return set()
+        with self._lock:
+            result = None
+            for q in query_words:
+                vocabulary = {t for t in self.df if q in t}
+                others = {t for t in self.other_df if q in t}
+                candidates = self.doc_terms if result is None else result
+                result = {a for a in candidates
+                          if not vocabulary.isdisjoint(self.doc_terms[a]) or not others.isdisjoint(self.other_terms[a])}
+                if not result:
+                    break
+            return result
+
+    def keywords(self, text, k=5):
+        """Termos mais característicos do texto (maior TF-IDF)."""
+        vector = self.vectorize(text, max_terms=k)
+        return [t for t, _ in sorted(vector.items(), key=lambda kv: kv[1], reverse=True)]
@@ -0,0 +1,226 @@
+import os
+import json
+import time
+import atexit
+import sqlite3
+import threading
+
+
+class WriteBehindQueue:
+    """Fila durável (SQLite) com um escritor em background.
+
+    - ``submit`` grava o item na fila em disco e retorna imediatamente.
+    - Uma thread consome os itens em ordem FIFO (por id) e chama o handler do tipo.
+    - Itens pendentes (queda/restart) são reprocessados no próximo ``start``.
+    - ``flush`` espera a fila esvaziar; ``stop`` faz flush e é chamado no atexit.
+    - Com vários processos, cada item é reservado por lease para um único consumidor;
+      o lease do lote é renovado a cada item, então um lote lento não é retomado
+      por outro processo no meio.
+    """
+
+    def __init__(self, path, batch_size=50, lease_seconds=60, max_attempts=5, enabled=True):
+        self.path = path
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.enabled = enabled
+        self.handlers = {}
+        self.owner = f"{os.getpid()}-{id(self)}"
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._idle = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._start_lock = threading.Lock()
+        if self.enabled:
+            self._init_schema()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        """No processo filho (pre-fork): lease, conexões e thread próprios."""
+        self.owner = f"{os.getpid()}-{id(self)}"
+        self._local = threading.local()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=FULL')
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS write_queue ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, payload TEXT NOT NULL, '
+            'created_at REAL NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, '
+            'claimed_by TEXT, claimed_at REAL, last_error TEXT)'
+        )
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS write_queue_failed ('
+            'id INTEGER PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, '
+            'created_at REAL NOT NULL, attempts INTEGER NOT NULL, last_error TEXT, failed_at REAL NOT NULL)'
+        )
+
+    def register(self, kind, handler):
+        """Registra a função que persiste itens do tipo ``kind``: ``handler(payload)``."""
+        self.handlers[kind] = handler
+
+    def submit(self, kind, payload):
+        """Enfileira um item (durável). Sem write-behind, executa na hora."""
+        if kind not in self.handlers:
+            raise KeyError(f"Tipo de escrita não registrado: {kind}")
+        if not self.enabled:
+            self.handlers[kind](payload)
+            return
+
+        self._connect().execute(
+            'INSERT INTO write_queue (kind, payload, created_at) VALUES (?, ?, ?)',
+            (kind, json.dumps(payload, ensure_ascii=False), time.time())
+        )
+        self.start()
+        self._idle.clear()
+        self._wakeup.set()
+
+    def start(self):
+        """Inicia o escritor (idempotente). Reprocessa pendências da fila."""
+        if not self.enabled or (self._thread and self._thread.is_alive()):
+            return
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._thread.start()
+            self._wakeup.set()
+
+    def _claim(self):
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                'UPDATE write_queue SET claimed_by = ?, claimed_at = ? WHERE id IN ('
+                'SELECT id FROM write_queue WHERE claimed_at IS NULL OR claimed_at < ? ORDER BY id LIMIT ?)',
+                (self.owner, now, now - self.lease_seconds, self.batch_size)
+            )
+            rows = conn.execute(
+                'SELECT id, kind, payload, attempts FROM write_queue WHERE claimed_by = ? ORDER BY id',
+                (self.owner,)
+            ).fetchall()
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return rows
+
+    def _renew_lease(self, item_id):
+        """Renova o lease dos itens ainda reservados; False se ``item_id`` foi retomado por outro."""
+        conn = self._connect()
+        conn.execute('UPDATE write_queue SET claimed_at = ? WHERE claimed_by = ?', (time.time(), self.owner))
+        row = conn.execute('SELECT claimed_by FROM write_queue WHERE id = ?', (item_id,)).fetchone()
+        return row is not None and row[0] == self.owner
+
+    def _process(self, row):
+        """Aplica um item. Retorna False se deve parar o lote (preserva a ordem)."""
+        conn = self._connect()
+        item_id, kind, payload, attempts = row
+        if not self._renew_lease(item_id):
+            print(f"⚠️ Write-behind: lease de {kind} #{item_id} expirou; item fica para quem o retomou.")
+            return False
+        try:
+            self.handlers[kind](json.loads(payload))
+            conn.execute('DELETE FROM write_queue WHERE id = ?', (item_id,))
+            return True
+        except Exception as e:
+            attempts += 1
+            print(f"⚠️ Write-behind: erro ao persistir {kind} #{item_id} (tentativa {attempts}): {e}")
+            if attempts >= self.max_attempts:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.execute(
+                    'INSERT INTO write_queue_failed (id, kind, payload, created_at, attempts, last_error, failed_at) '
+                    'SELECT id, kind, payload, created_at, ?, ?, ? FROM write_queue WHERE id = ?',
+                    (attempts, str(e), time.time(), item_id)
+                )
+                conn.execute('DELETE FROM write_queue WHERE id = ?', (item_id,))
+                conn.execute('COMMIT')
+                return True
+            conn.execute(
+                'UPDATE write_queue SET attempts = ?, last_error = ?, claimed_by = NULL, claimed_at = NULL WHERE id = ?',
+                (attempts, str(e), item_id)
+            )
+            return False
+
+    def _run(self):
+        backoff = 0.5
+        while True:
+            self._wakeup.clear()
+            try:
+                rows = self._claim()
+            except Exception as e:
+                print(f"⚠️ Write-behind: erro ao ler fila: {e}")
+                rows = []
+
+            completed = True
+            for row in rows:
+                if not self._process(row):
+                    completed = False
+                    # Libera o resto do lote para não furar a ordem
+                    self._connect().execute(
+                        'UPDATE write_queue SET claimed_by = NULL, claimed_at = NULL WHERE claimed_by = ?',
+                        (self.owner,)
+                    )
+                    break
+
+            if rows and completed:
+                backoff = 0.5
+                continue
+            if not rows:
+                self._idle.set()
+            if self._stopping and (not rows or not completed):
+                return
+            self._wakeup.wait(timeout=1.0 if completed else backoff)
+            if not completed:
+                backoff = min(backoff * 2, 30)
+
+    def pending(self):
+        """Quantidade de itens ainda não persistidos."""
+        if not self.enabled:
+            return 0
+        return self._connect().execute('SELECT COUNT(*) FROM write_queue').fetchone()[0]
+
+    def flush(self, timeout=10):
+        """Espera a fila esvaziar. Retorna True se esvaziou dentro do timeout."""
+        if not self.enabled or not self._thread:
+            return True
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.pending() == 0:
+                return True
+            self._wakeup.set()
+            self._idle.wait(timeout=0.05)
+        return self.pending() == 0
+
+    def stop(self, timeout=10):
+        """Flush + encerra o escritor (o que sobrar fica em disco para o próximo start)."""
+        if not self._thread:
+            return
+        flushed = self.flush(timeout)
+        self._stopping = True
+        self._wakeup.set()
+        self._thread.join(timeout=1)
+        if not flushed:
+            print(f"⚠️ Write-behind: {self.pending()} itens pendentes ficarão para o próximo start.")
+
+
+def create_write_queue(path):
+    """Cria a fila de escrita; WRITE_BEHIND=false desativa (escrita síncrona)."""
+    enabled = os.getenv('WRITE_BEHIND', 'true').lower() in ('true', '1', 't')
+    queue = WriteBehindQueue(path, enabled=enabled)
+    atexit.register(queue.stop)
+    return queue
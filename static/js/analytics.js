@@ -158,7 +158,13 @@ async function generateInsights() {
         btn.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Gerando...';
 
         const response = await fetch('/api/monitor/insights');
-        const data = await response.json();
+        let data = await response.json();
+
+        // Primeira geração da janela roda como job: aguardar o resultado
+        if (response.status === 202) {
+            const job = await pollJob(data.job_id);
+            data = job.status === 'succeeded' ? job.result : {};
+        }
 
         if (data.insights) {
             panel.style.display = 'block';
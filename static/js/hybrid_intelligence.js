@@ -411,7 +411,7 @@ async function applyHybridDecision() {
             }, 800);
 
             // 6. Send Training Feedback Log
-            await sendFeedbackLog(text, lastClassificationResult, "Confirmed by User");
+            await sendFeedbackLog(text, lastClassificationResult, "Confirmed by User", category, result.id);
 
         } else {
             const errData = await response.json().catch(() => ({}));
@@ -434,7 +434,7 @@ async function applyHybridDecision() {
     }
 }
 
-async function sendFeedbackLog(text, neuralOutput, userAction) {
+async function sendFeedbackLog(text, neuralOutput, userAction, category = null, articleId = null) {
     // Feedback is fire-and-forget, but good to have a short timeout too
     const controller = new AbortController();
     setTimeout(() => controller.abort(), 5000);
@@ -447,6 +447,8 @@ async function sendFeedbackLog(text, neuralOutput, userAction) {
                 text: text,
                 neural_output: neuralOutput,
                 final_decision: userAction,
+                category: category,
+                article_id: articleId,
                 user_correction: currentHybridMode === 'override' ? 'User Override' : 'Test'
             }),
             signal: controller.signal
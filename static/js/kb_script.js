@@ -18,6 +18,25 @@ const state = {
 // Globalizar appState para acesso do neural_network.js
 window.appState = state;
 
+// ==================== JOBS EM BACKGROUND ====================
+
+// Acompanha um job (/api/jobs/<id>) até terminar; onProgress recebe o job a cada consulta
+async function pollJob(jobId, onProgress, intervalMs = 1000) {
+    while (true) {
+        const response = await fetch(`${API_URL}/jobs/${jobId}`);
+        const job = await response.json();
+        if (!response.ok) {
+            throw new Error(job.error || 'Erro ao consultar job');
+        }
+        if (onProgress) onProgress(job);
+        if (['succeeded', 'failed', 'cancelled'].includes(job.status)) {
+            return job;
+        }
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+}
+window.pollJob = pollJob;
+
 // ==================== INICIALIZAÇÃO ====================
 
 document.addEventListener('DOMContentLoaded', () => {
@@ -295,7 +314,8 @@ function setupEventListeners() {
     const searchInput = document.getElementById('searchArticles');
     const categoryFilter = document.getElementById('categoryFilter');
 
-    searchInput.addEventListener('input', debounce(filterArticles, 300));
+    // Sugestões a cada tecla (/api/autocomplete); a busca completa só ao confirmar
+    initSearchAutocomplete(searchInput);
     categoryFilter.addEventListener('change', filterArticles);
 
     // Formulário de artigo
@@ -526,6 +546,12 @@ async function handleDeleteAllArticles() {
         const data = await response.json();
 
         if (response.ok) {
+            showNotification('Exclusão iniciada em segundo plano...', 'info');
+            const job = await pollJob(data.job_id);
+            if (job.status !== 'succeeded') {
+                showNotification(job.error || job.message || 'Exclusão interrompida', 'error');
+                return;
+            }
             showNotification('Todos os artigos foram excluídos!', 'success');
             // Atualizar interface
             await checkStatus();
@@ -876,6 +902,10 @@ async function sendMessage() {
             // Tocar som de sucesso se houver (opcional)
         }
 
+        if (data.corrected_question) {
+            showNotification(`Pergunta corrigida para: ${data.corrected_question}`, 'info');
+        }
+
         // Processar erros ortográficos (Aggressive AI & Redemption Arc)
         if (data.typo_count > 0) {
             updateTypoCounter(data.typo_count);
@@ -1126,6 +1156,12 @@ async function loadArticles(search = '', categoryId = '') {
         const response = await fetch(url);
         const articles = await response.json();
 
+        // Busca corrigida pelo servidor (correção ortográfica)
+        const correctedQuery = response.headers.get('X-Corrected-Query');
+        if (correctedQuery) {
+            showNotification(`Mostrando resultados para: ${decodeURIComponent(correctedQuery)}`, 'info');
+        }
+
         state.articles = articles;
         renderArticles(articles);
 
@@ -1172,6 +1208,110 @@ function filterArticles() {
     loadArticles(search, categoryId);
 }
 
+const SUGGESTION_LABELS = { title: 'artigo', tag: 'tag', category: 'categoria', search: 'busca' };
+
+function initSearchAutocomplete(searchInput) {
+    const list = document.getElementById('searchSuggestions');
+    let suggestions = [];
+    let active = -1;
+    let lastQuery = null;
+
+    const close = () => {
+        suggestions = [];
+        active = -1;
+        list.innerHTML = '';
+    };
+
+    const render = () => {
+        list.innerHTML = suggestions.map((s, i) => `
+            <li class="${i === active ? 'active' : ''}" data-index="${i}">
+                <span>${escapeHtml(s.text)}</span>
+                <span class="suggestion-type">${SUGGESTION_LABELS[s.type] || s.type}</span>
+            </li>
+        `).join('');
+    };
+
+    const choose = (suggestion) => {
+        close();
+        if (suggestion.type === 'title') {
+            loadArticleById(suggestion.article_id);
+        } else if (suggestion.type === 'tag') {
+            filterByTag(suggestion.text);
+        } else if (suggestion.type === 'category') {
+            const categoryFilter = document.getElementById('categoryFilter');
+            const option = Array.from(categoryFilter.options).find(o => o.textContent === suggestion.text);
+            searchInput.value = '';
+            if (option) categoryFilter.value = option.value;
+            filterArticles();
+        } else {
+            searchInput.value = suggestion.text;
+            filterArticles();
+        }
+    };
+
+    const fetchSuggestions = debounce(async () => {
+        const query = searchInput.value.trim();
+        if (query === lastQuery) return;
+        lastQuery = query;
+        if (!query) {
+            close();
+            return;
+        }
+        try {
+            const response = await fetch(`${API_URL}/autocomplete?q=${encodeURIComponent(query)}&limit=8`);
+            const data = await response.json();
+            // Resposta atrasada de uma tecla anterior
+            if (data.query.trim() !== searchInput.value.trim()) return;
+            suggestions = data.suggestions || [];
+            active = -1;
+            render();
+        } catch (error) {
+            console.error('Erro no autocomplete:', error);
+        }
+    }, 80);
+
+    searchInput.addEventListener('input', () => {
+        fetchSuggestions();
+        // Campo limpo: volta à lista completa
+        if (!searchInput.value.trim()) filterArticles();
+    });
+
+    searchInput.addEventListener('keydown', (e) => {
+        if (e.key === 'ArrowDown' && suggestions.length) {
+            e.preventDefault();
+            active = (active + 1) % suggestions.length;
+            render();
+        } else if (e.key === 'ArrowUp' && suggestions.length) {
+            e.preventDefault();
+            active = (active - 1 + suggestions.length) % suggestions.length;
+            render();
+        } else if (e.key === 'Enter') {
+            e.preventDefault();
+            if (active >= 0) {
+                choose(suggestions[active]);
+            } else {
+                close();
+                filterArticles();
+            }
+        } else if (e.key === 'Escape') {
+            close();
+        }
+    });
+
+    // mousedown (antes do blur) para a escolha não se perder ao fechar a lista
+    list.addEventListener('mousedown', (e) => {
+        const item = e.target.closest('li');
+        if (!item) return;
+        e.preventDefault();
+        choose(suggestions[Number(item.dataset.index)]);
+    });
+
+    searchInput.addEventListener('blur', () => {
+        close();
+        lastQuery = null;
+    });
+}
+
 function filterByTag(tagName) {
     const searchInput = document.getElementById('searchArticles');
     if (searchInput) {
@@ -1226,9 +1366,12 @@ function openArticleModal(articleId) {
         </div>
     `;
 
-    document.getElementById('modalContent').innerHTML = contentHtml + feedbackHtml;
+    const relatedHtml = `<div class="related-articles" id="relatedArticles-${article.id}"></div>`;
+
+    document.getElementById('modalContent').innerHTML = contentHtml + feedbackHtml + relatedHtml;
 
     document.getElementById('articleModal').classList.add('active');
+    loadRelatedArticles(article.id);
 
     // Log View
     if (window.logInteraction) {
@@ -1239,6 +1382,28 @@ function openArticleModal(articleId) {
 // Globalizar função para acesso externo
 window.loadArticleById = loadArticleById;
 
+async function loadRelatedArticles(articleId) {
+    const container = document.getElementById(`relatedArticles-${articleId}`);
+    if (!container) return;
+    try {
+        const response = await fetch(`${API_URL}/articles/${articleId}/related`);
+        if (!response.ok) return;
+        const related = await response.json();
+        if (!related.length) return;
+        container.innerHTML = `
+            <span class="related-label">Artigos relacionados</span>
+            <ul class="related-list">
+                ${related.map(r => `
+                    <li><a href="#" onclick="event.preventDefault(); loadArticleById(${r.id})">${escapeHtml(r.title)}</a>
+                    ${r.category_name ? `<span class="category-badge">${escapeHtml(r.category_name)}</span>` : ''}</li>
+                `).join('')}
+            </ul>
+        `;
+    } catch (error) {
+        console.error('Erro ao carregar artigos relacionados:', error);
+    }
+}
+
 function closeModal() {
     document.getElementById('articleModal').classList.remove('active');
 }
@@ -1530,9 +1695,14 @@ async function saveArticle(e) {
         });
 
         if (response.ok) {
+            const saved = await response.json();
             resetArticleForm();
             await checkStatus();
             showNotification(id ? '✅ Artigo atualizado com sucesso!' : 'Artigo criado com sucesso!', 'success');
+            if (saved.near_duplicates && saved.near_duplicates.length > 0) {
+                const dup = saved.near_duplicates[0];
+                showNotification(`⚠️ Conteúdo muito parecido com "${dup.title}" (${Math.round(dup.similarity * 100)}%)`, 'warning');
+            }
         } else {
             const error = await response.json();
             showNotification('❌ Erro: ' + error.error, 'error');
@@ -1834,14 +2004,28 @@ async function handleImportWord(e) {
             body: formData
         });
 
-        const data = await response.json();
+        let data = await response.json();
 
         if (response.ok) {
+            // Processamento em background: barra acompanha o progresso do job
             progressBar.classList.remove('indeterminate');
+            const job = await pollJob(data.job_id, job => {
+                const percent = Math.round(job.progress * 100);
+                progressBar.style.width = `${percent}%`;
+                progressPercent.textContent = `${percent}%`;
+                if (job.message) progressText.textContent = job.message;
+            });
+            if (job.status !== 'succeeded') {
+                throw new Error(job.error || job.message || 'Importação interrompida');
+            }
+            data = job.result;
             progressBar.style.width = '100%';
             progressText.textContent = 'Concluído!';
 
             showNotification('✅ Documento importado com sucesso!', 'success');
+            if (data.skipped_duplicates && data.skipped_duplicates.length > 0) {
+                showNotification(`ℹ️ ${data.skipped_duplicates.length} fragmentos já existiam na base e foram ignorados.`, 'info');
+            }
 
             setTimeout(() => {
                 document.getElementById('modal-import').style.display = 'none';
@@ -1857,7 +2041,7 @@ async function handleImportWord(e) {
         }
     } catch (error) {
         console.error('Erro na importação:', error);
-        showNotification('❌ Erro de conexão com o servidor', 'error');
+        showNotification('❌ ' + (error.message || 'Erro de conexão com o servidor'), 'error');
         uploadProgress.style.display = 'none';
     } finally {
         if (uploadProgress.style.display === 'none') {
@@ -15,26 +15,6 @@ const NEURAL_CONFIG = {
         hybridDef: { background: '#a3ff00', border: '#020202', text: '#020202' },
         tag: { background: 'rgba(163, 255, 0, 0.1)', border: '#a3ff00', text: '#a3ff00' }
     },
-    PHYSICS: {
-        stabilization: {
-            enabled: true,
-            iterations: 200,
-            updateInterval: 50,
-            onlyDynamicEdges: false,
-            fit: true
-        },
-        barnesHut: {
-            gravitationalConstant: -25000,
-            centralGravity: 0.1,
-            springLength: 250,
-            springConstant: 0.04,
-            damping: 0.09,
-            avoidOverlap: 1
-        },
-        maxVelocity: 50,
-        minVelocity: 0.1,
-        solver: 'barnesHut'
-    },
     GROUPS: {
         hub_category: {
             shape: 'box',
@@ -89,12 +69,16 @@ class NeuralNetworkManager {
         this.categoryMap = {}; // Name -> ID
         this.isInitialized = false;
         this.saveTimeout = null;
+        this.pendingPositions = {};
+        this.focusCategory = null; // Categoria expandida (null = visão geral)
+        this.graphLevel = null;
     }
 
     /**
      * Initializes the neural network visualization.
+     * Layout comes precomputed from /api/graph: no client-side physics.
      */
-    init() {
+    async init(category = null) {
         console.log("🚀 Initializing Neural Network Manager...");
 
         // Safety Checks
@@ -110,27 +94,23 @@ class NeuralNetworkManager {
             this.network = null;
         }
 
-        if (!window.appState || !window.appState.articles) {
-            this.handleMissingData();
-            return;
-        }
-
-        if (window.appState.articles.length === 0) {
-            this.renderLoading("Sinal neural fraco. Nenhum dado encontrado.");
-            return;
-        }
+        this.focusCategory = category;
 
         try {
+            const graph = await this.fetchGraph(category);
+            if (!graph.nodes.length) {
+                this.renderLoading("Sinal neural fraco. Nenhum dado encontrado.");
+                return;
+            }
+
             this.clearData();
-            this.processData();
+            this.processData(graph);
             this.renderNetwork();
             this.updateHUD();
             this.setupEvents();
 
             this.isInitialized = true;
-            console.log("✅ Neural Network Initialized Successfully.");
-
-            this.loadPositions();
+            console.log(`✅ Neural Network Initialized (${graph.level}, v${graph.version}).`);
 
             // Start Pulse Effect after a short delay
             setTimeout(() => this.simulateActivity(), 2000);
@@ -143,6 +123,17 @@ class NeuralNetworkManager {
         }
     }
 
+    /**
+     * Fetches the graph (ETag/304 handled by the browser cache).
+     */
+    async fetchGraph(category) {
+        const params = new URLSearchParams({ level: 'auto' });
+        if (category) params.set('category', category);
+        const response = await fetch(`/api/graph?${params}`);
+        if (!response.ok) throw new Error(`Grafo indisponível (HTTP ${response.status})`);
+        return response.json();
+    }
+
     /**
      * Clears existing datasets.
      */
@@ -150,89 +141,124 @@ class NeuralNetworkManager {
         this.nodes.clear();
         this.edges.clear();
         this.categoryMap = {};
+        this.pendingPositions = {};
     }
 
     /**
-     * Processes appState data into Nodes and Edges.
+     * Converts the server graph into Nodes and Edges.
      */
-    processData() {
-        const { articles, learnedWords, tags } = window.appState;
-
-        // 1. Process Categories (Hubs)
-        const categories = new Set();
-        articles.forEach(art => {
-            const catName = art.category_name || 'Geral';
-            if (!categories.has(catName)) {
-                categories.add(catName);
-                const catId = `cat_${catName}`;
-                this.categoryMap[catName] = catId;
-
-                this.nodes.add({
-                    id: catId,
-                    label: catName,
-                    group: 'hub_category',
-                    value: 40,
-                    ...this.getGroupStyle('hub_category')
-                });
-            }
+    processData(graph) {
+        const { learnedWords } = window.appState || {};
+        this.graphLevel = graph.level;
+
+        // 1. Categories (Hubs) and collapsed clusters
+        graph.nodes.filter(n => n.type === 'category' || n.type === 'cluster').forEach(node => {
+            this.categoryMap[node.label] = node.id;
+            this.addCategoryNode(node);
         });
 
-        // 2. Process Articles (Synapses)
-        articles.forEach(art => this.addArticleNode(art));
+        // 2. Articles (Synapses)
+        graph.nodes.filter(n => n.type === 'article').forEach(node => this.addArticleNode(node));
 
-        // 3. Process Learned Words
-        if (learnedWords && learnedWords.length > 0) {
-            this.processLearnedWords(learnedWords);
-        }
+        // 3. Tags
+        graph.nodes.filter(n => n.type === 'tag').forEach(node => {
+            this.nodes.add({
+                id: node.id,
+                label: node.label,
+                title: this.createTooltip('[TAG]', node.label, `Artigos: ${node.count}`, 'color:#ff00dd'),
+                group: 'tag_node',
+                value: 10 + Math.min(node.count, 20),
+                x: node.x, y: node.y,
+                ...this.getGroupStyle('tag_node')
+            });
+        });
+
+        // 4. Edges (category/tag edges styled as before; similarity edges are new)
+        graph.edges.forEach(edge => this.addEdge(edge));
 
-        // 4. Process Tags
-        if (tags && tags.length > 0) {
-            this.processTags(tags, articles);
+        // 5. Learned Words (client-side, around the Aprendizado hub)
+        if (learnedWords && learnedWords.length > 0 && !this.focusCategory) {
+            this.processLearnedWords(learnedWords);
         }
     }
 
-    addArticleNode(art) {
-        const catName = art.category_name || 'Geral';
-        const catId = this.categoryMap[catName];
+    addCategoryNode(node) {
+        const isCluster = node.type === 'cluster';
+        this.nodes.add({
+            id: node.id,
+            label: isCluster ? `${node.label} (${node.count})` : node.label,
+            title: isCluster ? this.createTooltip('[CLUSTER]', node.label, `${node.count} artigos · clique para expandir`, 'color:#a3ff00') : undefined,
+            group: 'hub_category',
+            value: isCluster ? 40 + Math.min(node.count, 60) : 40,
+            x: node.x, y: node.y,
+            cluster: isCluster,
+            category: node.label,
+            ...this.getGroupStyle('hub_category')
+        });
+    }
 
-        // Concept Detection Logic
-        const tags = Array.isArray(art.tags) ? art.tags.join(' ') : (art.tags || '');
-        const isTagConcept = /conceito|definição|significado|glosário/i.test(tags);
-        const isCatConcept = /aprendizado|conceitos|glossário/i.test(catName);
-        const isConcept = isTagConcept || isCatConcept;
-        const isHybrid = tags.includes('hybrid_auto');
+    addArticleNode(node) {
+        if (node.concept) {
+            this.createConceptNode(node, node.hybrid);
+        } else {
+            this.createStandardNode(node, node.hybrid);
+        }
+    }
 
-        if (isConcept) {
-            this.createConceptNode(art, catId, catName, isHybrid);
+    addEdge(edge) {
+        if (edge.type === 'category') {
+            const node = this.nodes.get(edge.from);
+            this.edges.add(node && node.concept ? {
+                from: edge.from,
+                to: edge.to,
+                color: { color: NEURAL_CONFIG.COLORS.concept.text, inherit: false, opacity: 0.6 },
+                width: 3
+            } : {
+                from: edge.from,
+                to: edge.to,
+                color: { color: 'rgba(0, 243, 255, 0.15)', inherit: false },
+                width: 1
+            });
+        } else if (edge.type === 'tag') {
+            this.edges.add({
+                from: edge.from,
+                to: edge.to,
+                color: { color: 'rgba(255, 0, 221, 0.15)', inherit: false },
+                width: 1,
+                dashes: true
+            });
         } else {
-            this.createStandardNode(art, catId, catName, isHybrid);
+            // Similaridade entre artigos (ou entre clusters: weight = pares semelhantes)
+            const weight = edge.weight || 0;
+            this.edges.add({
+                from: edge.from,
+                to: edge.to,
+                title: Number.isInteger(weight) ? `${weight} pares semelhantes` : `similaridade ${weight}`,
+                color: { color: 'rgba(163, 255, 0, 0.25)', inherit: false },
+                width: Number.isInteger(weight) ? 1 + Math.min(weight, 8) : 1 + weight * 3
+            });
         }
     }
 
-    createConceptNode(art, catId, catName, isHybrid) {
+    createConceptNode(node, isHybrid) {
         const tooltipStyle = isHybrid ? "color:#00f3ff" : "#FFD700";
         const originPrefix = isHybrid ? "[ORIGEM HÍBRIDA]" : "[CONCEITO CHAVE]";
         const group = isHybrid ? 'hybrid_knowledge' : 'concept_learned';
 
         this.nodes.add({
-            id: art.id,
-            label: art.title,
-            title: this.createTooltip(originPrefix, art.title, catName, tooltipStyle),
+            id: node.id,
+            label: node.label,
+            title: this.createTooltip(originPrefix, node.label, node.category, tooltipStyle),
             group: group,
             value: 25,
+            x: node.x, y: node.y,
+            concept: true,
             ...this.getGroupStyle(group)
         });
 
-        this.edges.add({
-            from: art.id,
-            to: catId,
-            color: { color: NEURAL_CONFIG.COLORS.concept.text, inherit: false, opacity: 0.6 },
-            width: 3
-        });
-
         // Definition Satellite
-        const defText = this.extractDefinition(art.content);
-        const defId = `${art.id}_def`;
+        const defText = node.definition || "Definição não identificada.";
+        const defId = `${node.id}_def`;
         const defGroup = isHybrid ? 'hybrid_definition' : 'concept_definition';
 
         this.nodes.add({
@@ -242,12 +268,12 @@ class NeuralNetworkManager {
                         <strong>Definição:</strong><br>${defText}
                     </div>`,
             group: defGroup,
-            x: 50, y: 50, // Hint for physics
+            x: node.x + 50, y: node.y + 50,
             ...this.getGroupStyle(defGroup)
         });
 
         this.edges.add({
-            from: art.id,
+            from: node.id,
             to: defId,
             color: { color: NEURAL_CONFIG.COLORS.concept.text, opacity: 0.5 },
             dashes: true,
@@ -256,26 +282,20 @@ class NeuralNetworkManager {
         });
     }
 
-    createStandardNode(art, catId, catName, isHybrid) {
+    createStandardNode(node, isHybrid) {
         const labelPrefix = isHybrid ? '[NÓ HÍBRIDO]' : '[NÓ DE CONHECIMENTO]';
         const color = isHybrid ? '#00f3ff' : '#bd00ff';
         const group = isHybrid ? 'hybrid_knowledge' : 'knowledge_article';
 
         this.nodes.add({
-            id: art.id,
+            id: node.id,
             label: ' ', // Keep clean
-            title: this.createTooltip(labelPrefix, art.title, `Módulo: ${catName}`, `color:${color}`),
+            title: this.createTooltip(labelPrefix, node.label, `Módulo: ${node.category}`, `color:${color}`),
             group: group,
             value: 15,
+            x: node.x, y: node.y,
             ...this.getGroupStyle(group)
         });
-
-        this.edges.add({
-            from: art.id,
-            to: catId,
-            color: { color: 'rgba(0, 243, 255, 0.15)', inherit: false },
-            width: 1
-        });
     }
 
     processLearnedWords(words) {
@@ -290,23 +310,25 @@ class NeuralNetworkManager {
                 ...this.getGroupStyle('hub_category')
             });
         }
+        const hub = this.nodes.get(learningCatId);
+        const existingLabels = new Set(this.nodes.map(n => n.label));
+        const fresh = words.filter(word => !existingLabels.has(word));
 
-        words.forEach(word => {
-            // Check existence by label (slow but necessary if IDs aren't consistent)
-            const existing = this.nodes.get({
-                filter: item => item.label === word
-            });
-            if (existing.length > 0) return;
-
+        // Ring around the hub (no physics to place them)
+        const radius = 120 + fresh.length * 4;
+        fresh.forEach((word, i) => {
             const nodeId = 'learned_' + word.replace(/\s+/g, '_');
             if (this.nodes.get(nodeId)) return;
 
+            const angle = (2 * Math.PI * i) / fresh.length;
             this.nodes.add({
                 id: nodeId,
                 label: word,
                 title: this.createTooltip('[VOCABULÁRIO APRENDIDO]', word, 'Dicionário do Sistema', 'color:#FFD700'),
                 group: 'concept_learned',
                 value: 20,
+                x: hub.x + radius * Math.cos(angle),
+                y: hub.y + radius * Math.sin(angle),
                 ...this.getGroupStyle('concept_learned')
             });
 
@@ -319,48 +341,7 @@ class NeuralNetworkManager {
         });
     }
 
-    processTags(tags, articles) {
-        tags.forEach(tag => {
-            const tagId = `tag_${tag.name}`;
-            if (!this.nodes.get(tagId)) {
-                this.nodes.add({
-                    id: tagId,
-                    label: tag.name,
-                    title: this.createTooltip('[TAG]', tag.name, `Artigos: ${tag.count}`, 'color:#ff00dd'),
-                    group: 'tag_node',
-                    value: 10 + Math.min(tag.count, 20),
-                    ...this.getGroupStyle('tag_node')
-                });
-            }
-        });
-
-        // Link Articles -> Tags
-        articles.forEach(art => {
-            if (!art.tags) return;
-
-            const artTags = this.parseTags(art.tags);
-            artTags.forEach(tagName => {
-                const tagId = `tag_${tagName}`;
-                if (this.nodes.get(tagId)) {
-                    this.edges.add({
-                        from: art.id,
-                        to: tagId,
-                        color: { color: 'rgba(255, 0, 221, 0.15)', inherit: false },
-                        width: 1,
-                        dashes: true,
-                        length: 250
-                    });
-                }
-            });
-        });
-    }
-
     renderNetwork() {
-        if (!NEURAL_CONFIG || !NEURAL_CONFIG.PHYSICS) {
-            console.error("🔥 Configuration Error: NEURAL_CONFIG is missing!");
-            return;
-        }
-
         const options = {
             nodes: {
                 borderWidth: 0,
@@ -368,18 +349,18 @@ class NeuralNetworkManager {
             },
             groups: this.buildGroupsConfig(),
             edges: {
-                smooth: { enabled: true, type: 'continuous', forceDirection: 'none' }
+                // Straight edges: 'continuous' smoothing costs a solve per edge on every redraw
+                smooth: false
             },
             layout: {
                 hierarchical: { enabled: false }
             },
-            physics: NEURAL_CONFIG.PHYSICS,
-            interaction: { hover: true, tooltipDelay: 100, zoomView: true },
+            // Positions come from the server layout
+            physics: false,
+            interaction: { hover: true, tooltipDelay: 100, zoomView: true, hideEdgesOnDrag: true },
             autoResize: true
         };
 
-        console.log("🕸️ Network Options constructed:", JSON.parse(JSON.stringify(options)));
-
         try {
             this.network = new vis.Network(this.container, { nodes: this.nodes, edges: this.edges }, options);
         } catch (e) {
@@ -410,17 +391,20 @@ class NeuralNetworkManager {
             }
         });
 
-        // Persistence events with debounce
-        this.network.on("dragEnd", () => this.debouncedSave());
-        this.network.on("stabilized", () => this.debouncedSave());
+        // Persistence: dragged nodes are pinned on the server (debounced)
+        this.network.on("dragEnd", (params) => {
+            if (params.nodes.length > 0) this.debouncedSave(params.nodes);
+        });
     }
 
     /**
      * Debounced save wrapper.
      */
-    debouncedSave() {
+    debouncedSave(nodeIds) {
         // Permission check: Only Super Admin can save layout
         if (window.appState && window.appState.user && window.appState.user.role === 'super_admin') {
+            const positions = this.network.getPositions(nodeIds.filter(id => this.isServerNode(id)));
+            Object.assign(this.pendingPositions, positions);
             if (this.saveTimeout) clearTimeout(this.saveTimeout);
             this.saveTimeout = setTimeout(() => {
                 this.savePositions();
@@ -428,9 +412,24 @@ class NeuralNetworkManager {
         }
     }
 
+    isServerNode(nodeId) {
+        return typeof nodeId === 'number' || (typeof nodeId === 'string' && (nodeId.startsWith('cat_') || nodeId.startsWith('tag_')));
+    }
+
     handleNodeClick(nodeId) {
-        // IDs numeric = Article ID. Strings (except cat_, tag_, learned_) = Potentially Legacy.
-        // Simplified check: If it looks like an article ID (numeric or simple string not starting with prefixes)
+        const node = this.nodes.get(nodeId);
+
+        // Collapsed cluster: expand that category
+        if (node && node.cluster) {
+            this.init(node.category);
+            return;
+        }
+        // Expanded hub while focused: back to the overview
+        if (node && this.focusCategory && nodeId === `cat_${this.focusCategory}`) {
+            this.init(null);
+            return;
+        }
+
         const isSpecialNode = typeof nodeId === 'string' && (nodeId.startsWith('cat_') || nodeId.includes('_def') || nodeId.startsWith('tag_') || nodeId.startsWith('learned_'));
 
         if (!isSpecialNode) {
@@ -453,18 +452,35 @@ class NeuralNetworkManager {
         const newId = 'learned_' + Date.now();
         const group = 'hybrid_knowledge';
 
-        // 1. Add Main Node
+        // 1. Connect to Category (hub position anchors the new node)
+        const catId = `cat_${categoryName}`;
+        if (!this.nodes.get(catId)) {
+            this.nodes.add({
+                id: catId,
+                label: categoryName,
+                group: 'hub_category',
+                value: 50,
+                x: -200, y: -200,
+                ...this.getGroupStyle('hub_category')
+            });
+        }
+        const hub = this.nodes.get(catId);
+        const angle = Math.random() * 2 * Math.PI;
+        const x = hub.x + 150 * Math.cos(angle);
+        const y = hub.y + 150 * Math.sin(angle);
+
+        // 2. Add Main Node
         this.nodes.add({
             id: newId,
             label: label,
             title: this.createTooltip('[SÍNAPSE HÍBRIDA]', label, `Categoria: ${categoryName}`, 'color:#00f3ff'),
             group: group,
             value: 30,
-            x: 0, y: 0,
+            x: x, y: y,
             ...this.getGroupStyle(group)
         });
 
-        // 2. Add Definition Node if exists
+        // 3. Add Definition Node if exists
         if (definitionText) {
             const defId = newId + '_def';
             this.nodes.add({
@@ -474,7 +490,7 @@ class NeuralNetworkManager {
                             <strong>Definição:</strong><br>${definitionText}
                         </div>`,
                 group: 'hybrid_definition',
-                x: 50, y: 50,
+                x: x + 50, y: y + 50,
                 ...this.getGroupStyle('hybrid_definition')
             });
 
@@ -487,19 +503,6 @@ class NeuralNetworkManager {
             });
         }
 
-        // 3. Connect to Category
-        const catId = `cat_${categoryName}`;
-        if (!this.nodes.get(catId)) {
-            this.nodes.add({
-                id: catId,
-                label: categoryName,
-                group: 'hub_category',
-                value: 50,
-                x: -200, y: -200,
-                ...this.getGroupStyle('hub_category')
-            });
-        }
-
         this.edges.add({
             from: newId,
             to: catId,
@@ -565,76 +568,23 @@ class NeuralNetworkManager {
     }
 
     /**
-     * Generates a simple hash for the current dataset to identify changes.
-     * @returns {string} hash
-     */
-    getDatasetHash() {
-        const ids = this.nodes.getIds().sort();
-        return ids.length + '_' + (ids.length > 0 ? ids[0] : 'empty') + '_' + (ids.length > 0 ? ids[ids.length - 1] : 'empty');
-    }
-
-    /**
-     * Persist positions to LocalStorage
-     */
-    savePositions() {
-        if (!this.network) return;
-
-        const positions = this.network.getPositions();
-        const data = {
-            timestamp: Date.now(),
-            hash: this.getDatasetHash(), // Version control
-            positions: positions
-        };
-        localStorage.setItem('neural_network_positions', JSON.stringify(data));
-        console.log("💾 Neural positions saved (Debounced).");
-
-        // Visual feedback (optional)
-        // this.showToast("Layout da rede salvo.");
-    }
-
-    /**
-     * Load positions from LocalStorage
+     * Pin dragged positions on the server (shared by every user and worker).
      */
-    loadPositions() {
-        const raw = localStorage.getItem('neural_network_positions');
-        if (!raw) return;
+    async savePositions() {
+        const positions = this.pendingPositions;
+        this.pendingPositions = {};
+        if (!Object.keys(positions).length) return;
 
         try {
-            const data = JSON.parse(raw);
-            const currentHash = this.getDatasetHash();
-
-            // Validate dataset version
-            if (data.hash !== currentHash) {
-                console.warn("⚠️ Saved layout matches a different dataset version. Resetting persistence.");
-                this.resetLayout(); // Clear invalid data
-                return;
-            }
-
-            const positions = data.positions;
-
-            // Only apply to existing nodes
-            const updates = [];
-            Object.keys(positions).forEach(id => {
-                if (this.nodes.get(id)) {
-                    updates.push({
-                        id: id,
-                        x: positions[id].x,
-                        y: positions[id].y
-                    });
-                }
+            const response = await fetch('/api/graph/positions', {
+                method: 'PUT',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ positions })
             });
-
-            if (updates.length > 0) {
-                console.log(`📂 Loading positions for ${updates.length} nodes...`);
-                this.nodes.update(updates);
-
-                // Stabilize after loading positions to let physics settle slightly
-                this.network.stabilize(50);
-                this.network.fit();
-                this.showToast("Layout restaurado.");
-            }
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            console.log("💾 Neural positions saved (Debounced).");
         } catch (e) {
-            console.warn("Error loading positions:", e);
+            console.warn("Error saving positions:", e);
         }
     }
 
@@ -644,16 +594,18 @@ class NeuralNetworkManager {
     }
 
     /**
-     * Reset layout by clearing localStorage and stabilizing.
+     * Reset layout: the server discards saved positions and recomputes.
      */
-    resetLayout() {
-        localStorage.removeItem('neural_network_positions');
-        console.log("🧹 Layout reset.");
-        if (this.network) {
-            this.network.stabilize(100);
-            this.network.fit();
+    async resetLayout() {
+        try {
+            const response = await fetch('/api/graph/layout', { method: 'POST' });
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            console.log("🧹 Layout reset.");
+            await this.init(this.focusCategory);
+            this.showToast("Layout redefinido.");
+        } catch (e) {
+            console.warn("Error resetting layout:", e);
         }
-        this.showToast("Layout redefinido.");
     }
 
     /**
@@ -748,20 +700,6 @@ class NeuralNetworkManager {
         return groups;
     }
 
-    handleMissingData() {
-        this.renderLoading("Iniciando protocolo de conexão neural...");
-        if (window.loadArticles) {
-            console.log("Fluxo Neural: Artigos vazios, forçando carregamento...");
-            window.loadArticles().then(() => {
-                if (window.appState.articles && window.appState.articles.length > 0) {
-                    this.init();
-                } else {
-                    this.renderLoading("Sinal neural fraco. Nenhum dado encontrado.");
-                }
-            });
-        }
-    }
-
     renderLoading(msg) {
         if (this.container) {
             this.container.innerHTML = `<div class="loading">${msg}</div>`;
@@ -776,24 +714,6 @@ class NeuralNetworkManager {
                 </div>`;
     }
 
-    extractDefinition(content) {
-        const parts = content.split(/\n\s*\n/);
-        for (let part of parts) {
-            if (!part.startsWith('#') && part.length > 20) {
-                return part.length > 100 ? part.substring(0, 100) + '...' : part;
-            }
-        }
-        return "Definição não identificada.";
-    }
-
-    parseTags(tagsInput) {
-        if (Array.isArray(tagsInput)) return tagsInput;
-        if (typeof tagsInput === 'string') {
-            return tagsInput.split(',').map(t => t.trim()).filter(t => t);
-        }
-        return [];
-    }
-
     animateValue(obj, start, end, duration) {
         let startTimestamp = null;
         const step = (timestamp) => {
@@ -1,6 +1,9 @@
 (function () {
     // Configuração
     const KB_API_URL = document.currentScript.src.replace('/static/js/widget.js', ''); // Detecta URL base automaticamente
+    // Sessão de chat própria do widget (contexto individual, sem depender de cookie cross-origin)
+    const KB_SESSION_ID = sessionStorage.getItem('kb_widget_session') || (Date.now().toString(36) + Math.random().toString(36).slice(2));
+    sessionStorage.setItem('kb_widget_session', KB_SESSION_ID);
 
     // Injetar CSS
     const style = document.createElement('style');
@@ -166,7 +169,7 @@
             const response = await fetch(`${KB_API_URL}/api/chat`, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ question: text })
+                body: JSON.stringify({ question: text, session_id: KB_SESSION_ID })
             });
 
             const data = await response.json();